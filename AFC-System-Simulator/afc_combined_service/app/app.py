@@ -0,0 +1,72 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package app.py : Point of entry for the combined AFC simulator app
+
+Launches the AFC simulator (afc_simulator_service) and the AFC simulator for
+fixed client connected SP AP (afc_fc_ap_service) in one process: both
+blueprints are mounted in one Flask app served on the ports of both services,
+the test vector directories are indexed once and a /set-response of the AFC
+simulator configures both services.
+"""
+import argparse
+import sys
+import os
+from flask import Flask
+
+sys.path.append(os.path.abspath("./QuickTrack-Tool/Test-Services"))
+from commons.microservices_helper import MicroserviceHelper
+from afc_common.wsgi_server import add_server_arguments, serve
+
+service_names = {"simulator": "PY_AFC_SIMULATOR", "fc_ap": "PY_AFC_FC_AP"}
+
+def create_app():
+    """Returns the Flask app of both services
+
+    Called by the process serving the requests, a gunicorn worker imports the services after the fork.
+    """
+    # Both services name their package afc_simulator_service_api, import them by service
+    from afc_simulator_service.app.afc_simulator_service_api import afc_simulator_api_blueprint
+    from afc_fc_ap_service.app.afc_simulator_service_api import afc_simulator_api_blueprint as afc_fc_ap_api_blueprint
+
+    app = Flask(__name__)
+    app.config["ENV"] = os.environ.get("ENV_MODE")
+    app.config.swagger_ui_doc_expansion = "list"  # Initial expansion state
+    app.register_blueprint(afc_simulator_api_blueprint)
+    app.register_blueprint(afc_fc_ap_api_blueprint)
+    return app
+
+def run_app():
+    """Start the AFC simulator microservices
+
+    Starts a local flask server on the ports of both services and loads both AFC simulator apps
+    """
+    parser = argparse.ArgumentParser(description="AFC simulator and fixed client AFC simulator services")
+    add_server_arguments(parser, 5000)
+    parser.add_argument("--fc-ap-port", type=int, default=5001, help="listening port of the fixed client service, 5001 by default")
+    args = parser.parse_args()
+
+    #To hide warning message "Do not use the development server in a production environment"
+    cli = sys.modules['flask.cli']
+    cli.show_server_banner = lambda *x: None
+
+    MicroserviceHelper(service_names["simulator"], args.port)
+    MicroserviceHelper(service_names["fc_ap"], args.fc_ap_port)
+    serve(create_app, "0.0.0.0", args.port, args.server, args.workers, args.threads,
+          args.tls_cert, args.tls_key, args.tls_tickets, extra_ports=[args.fc_ap_port])
+
+
+if __name__ == "__main__":
+    run_app()
@@ -0,0 +1,134 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package channel_coverage.py : Coverage of the inquired spectrum by the channels of each bandwidth.
+
+The inquired spectrum is kept as an integer bitmask over the 20 MHz channels of
+the 6 GHz band, bit i being the 20 MHz channel 1 + 4 * i. An inquired frequency
+range sets a run of bits with two shifts, whatever its width. The footprint of
+a channel is the run of bits of its 20 MHz channels, and the channel is covered
+when all of them are inquired. Covered channels of every bandwidth are found
+from a run mask: bit i of the run mask of n channels is set when the 20 MHz
+channels i to i + n - 1 are all inquired, computed with a few shift-AND
+operations, after which testing a channel is a single bit test.
+
+The CFIs of a bandwidth are kept the same way, as a bitmask over the CFIs of
+the bandwidth, to intersect inquired channels with the channels of a ruleset.
+"""
+from afc_common.channel_plan import all_cfis, country_plans, freq_to_channel
+
+num_chan_bw20 = len(all_cfis[20])
+# bandwidth -> {CFI: bit of the CFI in the CFI masks of the bandwidth}
+cfi_bits = {bw: {cfi: bit for bit, cfi in enumerate(cfis)} for bw, cfis in all_cfis.items()}
+
+
+def chan_to_bit(chan):
+    """Returns the bit of a 20 MHz channel"""
+    return (chan - 1) // 4
+
+
+def first_chan_bit(cfi, bw):
+    """Returns the bit of the lowest 20 MHz channel of the bw MHz channel cfi"""
+    return chan_to_bit(cfi - (bw // 10 - 2))
+
+
+def channel_range_mask(low_chan, high_chan):
+    """Returns the mask of the 20 MHz channels from low_chan to high_chan (included)"""
+    # Lowest bit at or above low_chan, highest bit at or below high_chan
+    first = max(-((1 - low_chan) // 4), 0)
+    last = min((high_chan - 1) // 4, num_chan_bw20 - 1)
+    if last < first:
+        return 0
+    return ((1 << (last + 1)) - 1) ^ ((1 << first) - 1)
+
+
+def run_mask(mask, length):
+    """Returns the mask of the bits starting a run of length set bits of mask"""
+    run = mask
+    width = 1
+    while width < length:
+        shift = min(width, length - width)
+        run &= run >> shift
+        width += shift
+    return run
+
+
+def mask_bits(mask):
+    """Yields the set bits of a mask in increasing order"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class InquiredSpectrum:
+    """20 MHz channels of the inquired frequency ranges"""
+
+    def __init__(self, freq_ranges=()):
+        self.mask = 0
+        # bandwidth -> run mask of the bandwidth
+        self._runs = {}
+        for freq in freq_ranges:
+            self.add_range(freq["lowFrequency"], freq["highFrequency"])
+
+    def add_range(self, low_freq, high_freq):
+        """Adds the 20 MHz channels between the channels of two frequencies (MHz)"""
+        self.mask |= channel_range_mask(freq_to_channel(low_freq), freq_to_channel(high_freq))
+        self._runs = {}
+
+    def channels(self):
+        """Returns the inquired 20 MHz channels"""
+        return [1 + 4 * bit for bit in mask_bits(self.mask)]
+
+    def covers(self, cfi, bw):
+        """Returns True when all the 20 MHz channels of the bw MHz channel cfi are inquired"""
+        run = self._runs.get(bw)
+        if run is None:
+            run = self._runs[bw] = run_mask(self.mask, bw // 20)
+        bit = first_chan_bit(cfi, bw)
+        return bit >= 0 and bool(run >> bit & 1)
+
+    def covered_cfis(self, cfis, bw):
+        """Returns the channels of cfis of bw MHz covered by the inquired spectrum"""
+        return [cfi for cfi in cfis if self.covers(cfi, bw)]
+
+
+def cfi_mask(cfis, bw):
+    """Returns the mask of the bw MHz channels cfis over the CFIs of the bandwidth, ignoring invalid CFIs"""
+    bits = cfi_bits[bw]
+    mask = 0
+    for cfi in cfis:
+        bit = bits.get(cfi)
+        if bit is not None:
+            mask |= 1 << bit
+    return mask
+
+
+def mask_cfis(mask, bw):
+    """Returns the sorted bw MHz channels of a CFI mask"""
+    cfis = all_cfis[bw]
+    return [cfis[index] for index in mask_bits(mask)]
+
+
+# country code -> bandwidth -> CFI mask of the channels of the ruleset
+country_cfi_masks = {
+    country_code: {bw: cfi_mask(cfis, bw) for bw, cfis in plan.channels.items()}
+    for country_code, plan in country_plans.items()
+}
+
+
+def inquired_cfis(country_code, cfis, bw):
+    """Returns the sorted bw MHz channels of cfis in the ruleset of the country"""
+    return mask_cfis(country_cfi_masks[country_code][bw] & cfi_mask(cfis, bw), bw)
@@ -0,0 +1,152 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package channel_plan.py : 6 GHz channel plan and power conversions.
+
+Lookup tables of the 6 GHz band computed once at import: the channel center
+frequency index (CFI) of a 20 MHz operating channel for each bandwidth, the
+bandwidth of a CFI, the 20 MHz subchannels of a CFI, and the channels of each
+AFC ruleset. Shared by the AFC simulator services and the AFC DUT test scripts.
+
+channel = (frequency - 5950) / 5, 20 MHz channels 1 to 233.
+EIRP (dBm) = PSD (dBm/MHz) + 10 * log10(bandwidth), at most 36 dBm for
+Standard Power devices.
+"""
+import math
+
+start_freq = 5950
+max_eirp_limit = 36.0
+
+bandwidths = (20, 40, 80, 160, 320)
+
+# CFIs of each bandwidth in the 6 GHz band
+all_cfis = {
+    20: tuple(range(1, 234, 4)),
+    40: tuple(range(3, 228, 8)),
+    80: tuple(range(7, 216, 16)),
+    160: tuple(range(15, 208, 32)),
+    320: tuple(range(31, 192, 32)),
+}
+
+bw_to_op_class = {
+    20: 131,
+    40: 132,
+    80: 133,
+    160: 134,
+    320: 137,
+}
+op_class_to_bw = {
+    131: 20,
+    132: 40,
+    133: 80,
+    134: 160,
+    136: 20,
+    137: 320,
+}
+
+_bw_db = {bw: 10 * math.log10(bw) for bw in bandwidths}
+
+
+def _subchannels(cfi, bw):
+    return tuple(range(cfi - (bw // 10 - 2), cfi + (bw // 10 - 2) + 1, 4))
+
+
+# CFI -> bandwidth
+cfi_to_bw = {cfi: bw for bw in bandwidths for cfi in all_cfis[bw]}
+# (CFI, bandwidth) -> 20 MHz channels of the channel
+cfi_subchannels = {(cfi, bw): _subchannels(cfi, bw) for bw in bandwidths for cfi in all_cfis[bw]}
+# bandwidth -> {20 MHz channel: CFI of the lowest bw MHz channel containing it}
+op_channel_to_cfi = {bw: {} for bw in bandwidths}
+for _bw in bandwidths:
+    for _cfi in all_cfis[_bw]:
+        for _ch in cfi_subchannels[(_cfi, _bw)]:
+            op_channel_to_cfi[_bw].setdefault(_ch, _cfi)
+
+
+def get_bw_from_cfi(cfi):
+    """Returns the bandwidth of a channel center frequency index, 20 for an unknown index"""
+    return cfi_to_bw.get(cfi, 20)
+
+
+def get_cfi_from_op_channel(op_channel, bw):
+    """Returns the CFI of the bw MHz channel of a 20 MHz operating channel, 0 when there is none"""
+    return op_channel_to_cfi[bw].get(op_channel, 0)
+
+
+def get_subchannels(cfi, bw):
+    """Returns the 20 MHz channels of the bw MHz channel cfi"""
+    subchannels = cfi_subchannels.get((cfi, bw))
+    return subchannels if subchannels is not None else _subchannels(cfi, bw)
+
+
+def channel_to_freq(channel):
+    """Returns the center frequency (MHz) of a channel"""
+    return int(start_freq + channel * 5)
+
+
+def freq_to_channel(freq):
+    """Returns the channel of a frequency (MHz), truncated to the channel below"""
+    return int((freq - start_freq) / 5)
+
+
+def psd_to_eirp(psd, bw, limit=max_eirp_limit):
+    """Returns the EIRP (dBm) of a PSD (dBm/MHz) over bw MHz, capped at limit if any"""
+    eirp = psd + _bw_db[bw]
+    return eirp if limit is None or eirp <= limit else limit
+
+
+def eirp_to_psd(eirp, bw):
+    """Returns the PSD (dBm/MHz) of an EIRP (dBm) over bw MHz"""
+    return eirp - _bw_db[bw]
+
+
+class RulesetPlan:
+    """Channels available for AFC testing under a ruleset"""
+
+    def __init__(self, ruleset_id, country_code, certification, channels):
+        self.ruleset_id = ruleset_id
+        self.country_code = country_code
+        self.certification = certification
+        # bandwidth -> list of CFIs
+        self.channels = channels
+        self.channel_sets = {bw: frozenset(cfis) for bw, cfis in channels.items()}
+
+    def has_channel(self, cfi, bw):
+        return cfi in self.channel_sets[bw]
+
+
+rulesets = {
+    "US_47_CFR_PART_15_SUBPART_E": RulesetPlan("US_47_CFR_PART_15_SUBPART_E", "US", "FCC", {
+        20: [1, 5, 9, 13, 17, 21, 25, 29, 33, 37, 41, 45, 49, 53, 57, 61, 65, 69, 73, 77, 81, 85, 89, 93, 117, 121, 125, 129, 133, 137, 141, 145, 149, 153, 157, 161, 165, 169, 173, 177, 181],
+        40: [3, 11, 19, 27, 35, 43, 51, 59, 67, 75, 83, 91, 123, 131, 139, 147, 155, 163, 171, 179],
+        80: [7, 23, 39, 55, 71, 87, 135, 151, 167],
+        160: [15, 47, 79, 143],
+        320: [31, 63],
+    }),
+    "CA_RES_DBS-06": RulesetPlan("CA_RES_DBS-06", "CA", "ISED", {
+        20: [1, 5, 9, 13, 17, 21, 25, 29, 33, 37, 41, 45, 49, 53, 57, 61, 65, 69, 73, 77, 81, 85, 89, 93, 97, 101, 105, 109, 113, 117, 121, 125, 129, 133, 137, 141, 145, 149, 153, 157, 161, 165, 169, 173, 177, 181],
+        40: [3, 11, 19, 27, 35, 43, 51, 59, 67, 75, 83, 91, 99, 107, 115, 123, 131, 139, 147, 155, 163, 171, 179],
+        80: [7, 23, 39, 55, 71, 87, 103, 119, 135, 151, 167],
+        160: [15, 47, 79, 111, 143],
+        320: [31, 63, 95, 127],
+    }),
+}
+country_plans = {plan.country_code: plan for plan in rulesets.values()}
+
+
+def ruleset_to_country(ruleset_id):
+    """Returns the country code of a rulesetId (case insensitive) or None"""
+    plan = rulesets.get(ruleset_id.upper())
+    return plan.country_code if plan else None
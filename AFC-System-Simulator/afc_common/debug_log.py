@@ -0,0 +1,181 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package debug_log.py : Level-aware logging with lazily formatted messages.
+
+A CategoryLogger logs the messages of a category (e.g. "inquiry", "control")
+to a sink, the QuickTrack Logger by default, when the level of the message is
+at or above the level of the category. The messages are formatted only when
+they are logged:
+    log.debug("Received request %s", pretty_json(body))   # %-formatting of args
+    log.debug(lambda: f"picks {sorted(picks)}")           # callable message
+
+The level of each category, the default level for the other categories and the
+size of the ring buffer of recent events are set by environment variables:
+    AFC_LOG_LEVEL=ERROR
+    AFC_LOG_LEVELS=inquiry=DEBUG,control=ERROR
+    AFC_DEBUG_EVENTS=1000
+and can be changed at runtime with set_levels. The ring buffer keeps the
+formatted text (at most max_event_length characters) of the recent events
+logged by all categories, returned by recent_events. The messages below the
+level of their category are neither formatted nor kept.
+"""
+import os
+import threading
+import time
+from collections import deque
+from commons.logger import Logger
+from commons.shared_enums import (
+    LogCategory,
+)
+from afc_common import json_codec
+
+DEBUG = 10
+ERROR = 40
+OFF = 100
+level_names = {"DEBUG": DEBUG, "ERROR": ERROR, "OFF": OFF}
+
+
+def parse_level(name):
+    """Returns the level of a level name (case insensitive), raises ValueError when unknown"""
+    try:
+        return level_names[str(name).upper()]
+    except KeyError:
+        raise ValueError(f"log level should be one of {tuple(level_names)}, not {name}") from None
+
+
+def level_name(level):
+    return next(name for name, value in level_names.items() if value == level)
+
+
+def _parse_category_levels(value):
+    levels = {}
+    for item in value.split(","):
+        if "=" in item:
+            category, name = item.split("=", 1)
+            levels[category.strip()] = parse_level(name.strip())
+    return levels
+
+
+default_level = parse_level(os.environ.get("AFC_LOG_LEVEL", "DEBUG"))
+category_levels = _parse_category_levels(os.environ.get("AFC_LOG_LEVELS", ""))
+_levels_lock = threading.Lock()
+
+# (time, category, level, text) of the recent logged events
+_events = deque(maxlen=int(os.environ.get("AFC_DEBUG_EVENTS", "1000")))
+# Characters of the text of an event kept in the ring buffer
+max_event_length = 4096
+
+
+def logger_sink(level, message):
+    """Logs a message with the QuickTrack Logger"""
+    Logger.log(LogCategory.ERROR if level >= ERROR else LogCategory.DEBUG, message)
+
+
+def format_message(message, args):
+    """Returns the text of a lazy message"""
+    if callable(message):
+        message = message()
+    if args:
+        message = message % args
+    return message
+
+
+class pretty_json:
+    """JSON encoding of an object, indented, computed when formatted"""
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self):
+        obj = json_codec.loads(self.obj) if isinstance(self.obj, bytes) else self.obj
+        return json_codec.dumps(obj, pretty=True)
+
+
+class CategoryLogger:
+    """Logger of a category"""
+
+    def __init__(self, category, sink=logger_sink):
+        self.category = category
+        self.sink = sink
+
+    @property
+    def level(self):
+        return category_levels.get(self.category, default_level)
+
+    def is_enabled(self, level=DEBUG):
+        return level >= self.level
+
+    def debug(self, message, *args):
+        self.log(DEBUG, message, *args)
+
+    def error(self, message, *args):
+        self.log(ERROR, message, *args)
+
+    def log(self, level, message, *args):
+        if level < category_levels.get(self.category, default_level):
+            return
+        try:
+            text = format_message(message, args)
+            _events.append((time.time(), self.category, level, text[:max_event_length]))
+            self.sink(level, text)
+        except Exception as err:
+            Logger.log(LogCategory.ERROR, f"Failed to log a {self.category} message: {err}")
+
+
+_loggers = {}
+
+
+def get_logger(category, sink=None):
+    """Returns the logger of a category, created with sink (the QuickTrack Logger by default) if needed"""
+    log = _loggers.get(category)
+    if log is None:
+        log = _loggers.setdefault(category, CategoryLogger(category, sink or logger_sink))
+    return log
+
+
+def get_levels():
+    """Returns the default level and the levels of the categories by name"""
+    return {
+        "default": level_name(default_level),
+        "categories": {category: level_name(category_levels.get(category, default_level))
+                       for category in sorted(set(_loggers) | set(category_levels))},
+    }
+
+
+def set_levels(categories=None, default=None):
+    """Sets the levels (by name) of categories and the default level, raises ValueError for an unknown level"""
+    global default_level, category_levels
+    new_levels = {category: parse_level(name) for category, name in (categories or {}).items()}
+    new_default = default_level if default is None else parse_level(default)
+    with _levels_lock:
+        # Replace the dict so the loggers never see it being updated
+        category_levels = dict(category_levels, **new_levels)
+        default_level = new_default
+
+
+def recent_events(count=100, category=None, level=DEBUG):
+    """Returns the most recent logged events, oldest first"""
+    events = [event for event in list(_events)
+              if event[2] >= level and (category is None or event[1] == category)]
+    result = []
+    for timestamp, event_category, event_level, text in events[-count:] if count else []:
+        result.append({
+            "time": time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(timestamp)) + f".{int(timestamp % 1 * 1000):03d}Z",
+            "category": event_category,
+            "level": level_name(event_level),
+            "message": text,
+        })
+    return result
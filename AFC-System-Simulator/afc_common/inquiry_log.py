@@ -0,0 +1,181 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package inquiry_log.py : Background writer of the inquiry log files.
+
+The AFC simulator services log every exchanged Available Spectrum Inquiry
+Request and Response to the inquiry file of the test case. The messages are
+queued by the request threads and written by a single writer thread, which
+keeps the inquiry files open and writes the queued messages in batches, so
+serving a request never waits for the disk.
+
+Two formats are supported:
+    text  : the messages pretty-printed between timestamp borders
+    jsonl : one JSON object per line with timestamp, requestId and message
+"""
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+from commons.logger import Logger
+from commons.shared_enums import (
+    LogCategory,
+)
+from afc_common import json_codec
+from afc_common.metrics import registry
+
+inquiry_file_formats = ("text", "jsonl")
+
+# Maximum number of messages written between two flushes of the files
+max_batch_size = 256
+
+write_seconds = registry.histogram("afc_inquiry_log_write_seconds", "Time to format and write a batch of inquiry log messages")
+queued_messages = registry.gauge("afc_inquiry_log_queued_messages", "Inquiry log messages waiting for the writer thread")
+
+
+def get_request_id(json_data):
+    """Returns the requestId of an inquiry request, response or received request record"""
+    if "body" in json_data:
+        json_data = json_data["body"]
+    for field in ("availableSpectrumInquiryRequests", "availableSpectrumInquiryResponses"):
+        try:
+            return json_data[field][0]["requestId"]
+        except (KeyError, IndexError, TypeError):
+            continue
+    return None
+
+
+class InquiryLog:
+    """Queue of the inquiry log messages and its writer thread"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._files = {}
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def append(self, path, json_data, file_format="text"):
+        """Queues a message (dict or encoded JSON) to be appended to the inquiry file"""
+        if not path:
+            return
+        if isinstance(json_data, dict):
+            # The caller may update the top level of the message after it is queued
+            json_data = dict(json_data)
+        self.__start()
+        queued_messages.inc()
+        self._queue.put((path, file_format, datetime.utcnow(), json_data))
+
+    def flush(self, path=None):
+        """Waits until the queued messages are written, then closes the file of path if any"""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put((path, None, None, done))
+        done.wait()
+
+    def close(self):
+        """Writes the queued messages and closes all the files"""
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+
+    def __start(self):
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.__run, name="inquiry-log-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def __run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < max_batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            start = time.perf_counter()
+            messages = 0
+            written = set()
+            for item in batch:
+                if item is None:
+                    self.__close_files()
+                    return
+                path, file_format, timestamp, json_data = item
+                if file_format is None:
+                    # flush request, json_data is the event to set once written
+                    self.__flush_files(written)
+                    written = set()
+                    if path:
+                        self.__close_files([path])
+                    json_data.set()
+                    continue
+                queued_messages.dec()
+                messages += 1
+                try:
+                    f = self.__get_file(path)
+                    f.write(self.__format(file_format, timestamp, json_data))
+                    written.add(path)
+                except Exception as err:
+                    Logger.log(LogCategory.ERROR, f"Failed to write inquiry file {path}: {err}")
+            self.__flush_files(written)
+            if messages:
+                write_seconds.observe(time.perf_counter() - start)
+
+    def __get_file(self, path):
+        f = self._files.get(path)
+        if f is None:
+            f = self._files[path] = open(path, "a")
+        return f
+
+    def __flush_files(self, paths):
+        for path in paths:
+            try:
+                self._files[path].flush()
+            except Exception as err:
+                Logger.log(LogCategory.ERROR, f"Failed to write inquiry file {path}: {err}")
+
+    def __close_files(self, paths=None):
+        for path in list(self._files if paths is None else paths):
+            f = self._files.pop(path, None)
+            if f is None:
+                continue
+            try:
+                f.close()
+            except Exception as err:
+                Logger.log(LogCategory.ERROR, f"Failed to close inquiry file {path}: {err}")
+
+    @staticmethod
+    def __format(file_format, timestamp, json_data):
+        if isinstance(json_data, bytes):
+            json_data = json_codec.loads(json_data)
+        if file_format == "jsonl":
+            record = {
+                "timestamp": timestamp.isoformat(timespec="milliseconds") + "Z",
+                "requestId": get_request_id(json_data),
+                "message": json_data,
+            }
+            return json_codec.dumps(record) + '\n'
+        border = "###########################"
+        timestamp = "   " + timestamp.strftime('%Y-%m-%dT%H:%M:%SZ') + "   "
+        return border + timestamp + border + '\n' + json_codec.dumps(json_data, pretty=True) + '\n\n'
+
+
+# Writer shared by the services of the process
+inquiry_log = InquiryLog()
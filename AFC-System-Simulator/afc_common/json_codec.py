@@ -0,0 +1,80 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package json_codec.py : JSON encoding and decoding with an optional fast backend.
+
+The simulator services and the AFC test scripts encode and decode JSON through
+this module. orjson is used when it is installed, else the standard json
+module. Each call site selects compact output, for the messages exchanged with
+the DUT, or pretty output, for logs and reports read by people. The pretty
+output is always encoded with the json module (indented by 4 spaces), so the
+inquiry logs and reports have the same format whatever the backend.
+
+Objects orjson can't encode (e.g. integers above 64 bits) are encoded with the
+json module.
+
+The messages assembled from encoded fragments (response_template) join them
+with item_separator and key_separator, the separators of the compact encoding
+of the backend, so that they are formatted as the messages encoded at once.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+backend = "orjson" if orjson is not None else "json"
+# Separators of the compact encoding: {"a":1,"b":2} with orjson, {"a": 1, "b": 2} with json
+item_separator, key_separator = (b",", b":") if orjson is not None else (b", ", b": ")
+
+if orjson is not None:
+    _compact_option = orjson.OPT_NON_STR_KEYS
+
+
+def _stdlib_dumps(obj, pretty):
+    return json.dumps(obj, indent=4) if pretty else json.dumps(obj)
+
+
+def dumpb(obj, pretty=False):
+    """Returns the JSON encoding of obj as bytes"""
+    if orjson is not None and not pretty:
+        try:
+            return orjson.dumps(obj, option=_compact_option)
+        except TypeError:
+            pass
+    return _stdlib_dumps(obj, pretty).encode()
+
+
+def dumps(obj, pretty=False):
+    """Returns the JSON encoding of obj as str"""
+    if orjson is not None and not pretty:
+        try:
+            return orjson.dumps(obj, option=_compact_option).decode()
+        except TypeError:
+            pass
+    return _stdlib_dumps(obj, pretty)
+
+
+def loads(data):
+    """Returns the object of a JSON document (str or bytes)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load(f):
+    """Returns the object of the JSON document of a file"""
+    return loads(f.read())
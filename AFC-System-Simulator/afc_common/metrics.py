@@ -0,0 +1,191 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package metrics.py : Counters, gauges and histograms in the Prometheus text format.
+
+The metrics of a process are registered in a Registry by name, with the names of
+their labels, and are updated with the label values:
+    requests = registry.counter("afc_http_requests_total", "HTTP requests", ("route", "status"))
+    latency = registry.histogram("afc_http_request_duration_seconds", "HTTP request latency", ("route",))
+    requests.inc("/reset", 200)
+    with latency.time("/reset"):
+        ...
+registry.render() returns all the metrics in the Prometheus text exposition
+format 0.0.4, served by the /metrics endpoint of the AFC simulator.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets (seconds) from sub-millisecond handling to held responses
+default_buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape_help(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape(value):
+    return _escape_help(value).replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Values of a metric by label values"""
+
+    metric_type = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, label_values):
+        if len(label_values) != len(self.labels):
+            raise ValueError(f"{self.name} expects the labels {self.labels}, not {label_values}")
+        return tuple(str(value) for value in label_values)
+
+    def _label_text(self, key, extra=()):
+        pairs = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, key)]
+        pairs.extend(f'{label}="{_escape(value)}"' for label, value in extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self):
+        lines = [f"# HELP {self.name} {_escape_help(self.documentation)}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{self._label_text(key)} {_format_value(value)}"]
+
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def inc(self, *label_values, amount=1):
+        key = self._key(label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    metric_type = "gauge"
+
+    def set(self, value, *label_values):
+        key = self._key(label_values)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *label_values, amount=1):
+        key = self._key(label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram(Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=default_buckets):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        key = self._key(label_values)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per bucket (not cumulative) counts, +Inf last, then count and sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            state[0][index] += 1
+            state[1] += 1
+            state[2] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        """Observes the duration of the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def _render_value(self, key, value):
+        counts, count, total = value[0][:], value[1], value[2]
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            lines.append(f"{self.name}_bucket{self._label_text(key, (('le', _format_value(bound)),))} {cumulative}")
+        lines.append(f"{self.name}_count{self._label_text(key)} {count}")
+        lines.append(f"{self.name}_sum{self._label_text(key)} {_format_value(total)}")
+        return lines
+
+
+class Registry:
+    """Metrics of a process by name"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def __register(self, metric_class, name, documentation, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, documentation, labels, **kwargs)
+            elif not isinstance(metric, metric_class) or metric.labels != tuple(labels):
+                raise ValueError(f"metric {name} is already registered with another type or labels")
+            return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.__register(Counter, name, documentation, labels)
+
+    def gauge(self, name, documentation, labels=()):
+        return self.__register(Gauge, name, documentation, labels)
+
+    def histogram(self, name, documentation, labels=(), buckets=default_buckets):
+        return self.__register(Histogram, name, documentation, labels, buckets=buckets)
+
+    def render(self):
+        """Returns the metrics in the Prometheus text format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Registry of the metrics of the process
+registry = Registry()
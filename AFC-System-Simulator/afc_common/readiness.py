@@ -0,0 +1,80 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package readiness.py : Readiness of the services of a process.
+
+The components warmed up in the background at startup (the test vector
+indexes) are registered as pending and marked done when warm. The /ready
+endpoint of the services returns the status, with the time to ready measured
+from the process start, so that the test scripts wait for a restarted service
+instead of sleeping.
+"""
+import os
+import threading
+import time
+
+
+def _process_start_time():
+    """Returns the start time of the process (Linux), else the current time"""
+    try:
+        with open("/proc/self/stat") as f:
+            # starttime, in clock ticks after the boot, is the 22nd field
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - (uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+class Readiness:
+    """Startup time of the pending and warm components of the process"""
+
+    def __init__(self):
+        self.started = _process_start_time()
+        self._components = {}
+        self._lock = threading.Lock()
+
+    def pending(self, name):
+        with self._lock:
+            self._components.setdefault(name, None)
+
+    def done(self, name):
+        with self._lock:
+            if self._components.get(name) is None:
+                self._components[name] = time.time()
+
+    @property
+    def ready(self):
+        with self._lock:
+            return all(done is not None for done in self._components.values())
+
+    def status(self):
+        """Returns {"ready", "timeToReady", "components"} with the seconds from the process start"""
+        with self._lock:
+            components = dict(self._components)
+        ready = all(done is not None for done in components.values())
+        done_times = [done for done in components.values() if done is not None]
+        return {
+            "ready": ready,
+            "timeToReady": round(max(done_times, default=self.started) - self.started, 3) if ready else None,
+            "uptime": round(time.time() - self.started, 3),
+            "components": {name: None if done is None else round(done - self.started, 3)
+                           for name, done in sorted(components.items())},
+        }
+
+
+# Readiness of the process
+readiness = Readiness()
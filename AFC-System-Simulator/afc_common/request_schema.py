@@ -0,0 +1,272 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package request_schema.py : Validation of the Available Spectrum Inquiry Request v1.4.
+
+The schema of the request message is compiled once at import into a tree of
+check functions. Validating a request walks the message once, without raising,
+and collects all the missing and invalid parameters, reported by field name in
+the missingParams and invalidParams supplemental information of the response.
+
+Response codes of a request which fails validation:
+    100 : version not supported
+    102 : missing parameters (invalid parameters are reported as well)
+    103 : invalid parameters
+"""
+
+# Schema of the AvailableSpectrumInquiryRequestMessage v1.4, as read by the AFC simulator services.
+# A node is an object with required and optional properties, an array of items or a value type.
+_point = {
+    "type": "object",
+    "required": {"latitude": {"type": "number"}, "longitude": {"type": "number"}},
+}
+_points = {"type": "array", "items": _point}
+
+_request_schema = {
+    "type": "object",
+    "required": {
+        "requestId": {"type": "any"},
+        "deviceDescriptor": {
+            "type": "object",
+            "required": {
+                "serialNumber": {"type": "any"},
+                "certificationId": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "required": {"rulesetId": {"type": "string"}, "id": {"type": "any"}},
+                    },
+                },
+            },
+        },
+    },
+    "optional": {
+        # The number of location objects is checked by the services
+        "location": {
+            "type": "object",
+            "optional": {
+                "ellipse": {"type": "object", "required": {"center": _point}},
+                "linearPolygon": {"type": "object", "required": {"outerBoundary": _points}},
+                "radialPolygon": {
+                    "type": "object",
+                    "required": {
+                        "center": _point,
+                        "outerBoundary": {"type": "array", "items": {"type": "object"}},
+                    },
+                },
+            },
+        },
+        "inquiredFrequencyRange": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": {"lowFrequency": {"type": "number"}, "highFrequency": {"type": "number"}},
+            },
+        },
+        "inquiredChannels": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": {"globalOperatingClass": {"type": "integer"}},
+                "optional": {"channelCfi": {"type": "array", "items": {"type": "integer"}}},
+            },
+        },
+    },
+}
+
+supported_versions = ("1.4",)
+
+
+class ValidationResult:
+    """Missing and invalid parameters of a request, by field name"""
+
+    def __init__(self):
+        self.missing_params = []
+        self.invalid_params = []
+
+    def missing(self, name):
+        if name not in self.missing_params:
+            self.missing_params.append(name)
+
+    def invalid(self, name):
+        if name not in self.invalid_params:
+            self.invalid_params.append(name)
+
+    @property
+    def ok(self):
+        return not self.missing_params and not self.invalid_params
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_integer(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+_type_checks = {
+    "string": lambda value: isinstance(value, str),
+    "number": _is_number,
+    "integer": _is_integer,
+    "any": lambda value: True,
+}
+
+
+def _compile(node, name):
+    """Returns the check function of a schema node: check(value, result)"""
+    node_type = node["type"]
+    if node_type == "object":
+        required = [(prop, _compile(sub, prop)) for prop, sub in node.get("required", {}).items()]
+        optional = [(prop, _compile(sub, prop)) for prop, sub in node.get("optional", {}).items()]
+
+        def check_object(value, result):
+            if not isinstance(value, dict):
+                result.invalid(name)
+                return
+            for prop, check in required:
+                if prop in value:
+                    check(value[prop], result)
+                else:
+                    result.missing(prop)
+            for prop, check in optional:
+                if prop in value:
+                    check(value[prop], result)
+        return check_object
+
+    if node_type == "array":
+        check_item = _compile(node["items"], name) if "items" in node else None
+
+        def check_array(value, result):
+            if not isinstance(value, list):
+                result.invalid(name)
+                return
+            if check_item is not None:
+                for item in value:
+                    check_item(item, result)
+        return check_array
+
+    type_check = _type_checks[node_type]
+
+    def check_value(value, result):
+        if not type_check(value):
+            result.invalid(name)
+    return check_value
+
+
+_check_request = _compile(_request_schema, "availableSpectrumInquiryRequests")
+
+
+def validate_request(req):
+    """Returns the ValidationResult of an AvailableSpectrumInquiryRequest"""
+    result = ValidationResult()
+    _check_request(req, result)
+    return result
+
+
+class InquiryValidation(ValidationResult):
+    """Validation of an AvailableSpectrumInquiryRequestMessage
+
+    The missing and invalid parameters of the message fields are kept by the
+    InquiryValidation, the ones of each request in request_results.
+    """
+
+    def __init__(self, body):
+        super().__init__()
+        self.version = ""
+        self.requests = []
+        self.request = None
+        self.request_id = 0
+        self.request_results = []
+
+        if not isinstance(body, dict):
+            self.missing("version")
+            self.missing("availableSpectrumInquiryRequests")
+            return
+        if "version" in body:
+            self.version = body["version"]
+        else:
+            self.missing("version")
+
+        requests = body.get("availableSpectrumInquiryRequests")
+        if requests is None:
+            self.missing("availableSpectrumInquiryRequests")
+        elif not isinstance(requests, list) or not requests:
+            self.invalid("availableSpectrumInquiryRequests")
+        else:
+            self.requests = requests
+            self.request = requests[0]
+            if isinstance(self.request, dict):
+                self.request_id = self.request.get("requestId", 0)
+            self.request_results = [validate_request(req) for req in requests]
+
+    def message_error(self):
+        """Returns (responseCode, shortDescription, supplementalInfo) of the failed validation of the message fields
+
+        Returns None when the version and the availableSpectrumInquiryRequests are valid.
+        """
+        return _error(self.version, self)
+
+    def error(self, index=0):
+        """Returns (responseCode, shortDescription, supplementalInfo) of the failed validation of the
+        message fields and of the request at index, None when valid"""
+        result = ValidationResult()
+        for source in [self] + self.request_results[index:index + 1]:
+            for name in source.missing_params:
+                result.missing(name)
+            for name in source.invalid_params:
+                result.invalid(name)
+        return _error(self.version, result)
+
+
+def _error(version, result):
+    if "version" in result.missing_params:
+        return 102, "Missing Param.", _supplemental_info(result)
+    if version not in supported_versions:
+        return 100, "version not supported", None
+    if result.missing_params:
+        return 102, "Missing Param.", _supplemental_info(result)
+    if result.invalid_params:
+        return 103, "One or more fields have an invalid value.", {"invalidParams": result.invalid_params}
+    return None
+
+
+def _supplemental_info(result):
+    info = {"missingParams": result.missing_params}
+    if result.invalid_params:
+        info["invalidParams"] = result.invalid_params
+    return info
+
+
+def validate_inquiry(body):
+    """Returns the InquiryValidation of a received AvailableSpectrumInquiryRequestMessage"""
+    return InquiryValidation(body)
+
+
+def location_count(req):
+    """Returns the number of location objects (ellipse, linearPolygon, radialPolygon) of a request"""
+    location = req.get("location") or {}
+    return sum(shape in location for shape in ("ellipse", "linearPolygon", "radialPolygon"))
+
+
+def inquired_channels(req):
+    """Returns the inquired {globalOperatingClass: channelCfi or None} of a request"""
+    return {item["globalOperatingClass"]: item["channelCfi"] if "channelCfi" in item else None
+            for item in req.get("inquiredChannels", [])}
+
+
+def inquired_frequency_ranges(req):
+    """Returns the inquired (lowFrequency, highFrequency) ranges of a request"""
+    return [(item["lowFrequency"], item["highFrequency"]) for item in req.get("inquiredFrequencyRange", [])]
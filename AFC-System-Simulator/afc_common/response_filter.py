@@ -0,0 +1,122 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package response_filter.py : Filtering of a test vector response by the inquired spectrum.
+
+An Available Spectrum Inquiry Response only contains the availableFrequencyInfo items
+within the inquired frequency ranges and the availableChannelInfo channels of the
+inquired global operating classes and channels. ResponseFilter precomputes, once per
+test vector, the sorted frequency intervals and the channelCfi to index maps of the
+response, so filtering an inquiry is a sweep over sorted intervals and a few dictionary
+lookups instead of scanning every inquired range for every response item.
+"""
+from operator import itemgetter
+
+
+class ResponseFilter:
+    """Filter index of an availableSpectrumInquiryResponses item"""
+
+    def __init__(self, inquiry_response):
+        self.freq_info = inquiry_response.get("availableFrequencyInfo")
+        self.chan_info = inquiry_response.get("availableChannelInfo")
+
+        # (lowFrequency, highFrequency, item index) sorted by lowFrequency
+        self._freq_intervals = []
+        if self.freq_info:
+            self._freq_intervals = sorted(
+                ((item["frequencyRange"]["lowFrequency"], item["frequencyRange"]["highFrequency"], idx)
+                 for idx, item in enumerate(self.freq_info)),
+                key=itemgetter(0))
+
+        # For each availableChannelInfo item: channelCfi -> indexes in channelCfi
+        self._cfi_indexes = []
+        for item in self.chan_info or []:
+            cfi_indexes = {}
+            for idx, cfi in enumerate(item["channelCfi"]):
+                cfi_indexes.setdefault(cfi, []).append(idx)
+            self._cfi_indexes.append(cfi_indexes)
+
+    def frequency_info(self, freq_range_list):
+        """Returns the availableFrequencyInfo items within one of the inquired (low, high) frequency ranges
+
+        Returns None when the response has no availableFrequencyInfo or when all its items are inquired.
+        """
+        if self.freq_info is None:
+            return None
+        inquired = sorted(freq_range_list)
+        kept = [False] * len(self.freq_info)
+        kept_num = 0
+        # Sweep both interval lists by lowFrequency, keeping the highest highFrequency of
+        # the inquired ranges starting at or below the current item
+        pos = 0
+        max_high = None
+        for low, high, idx in self._freq_intervals:
+            while pos < len(inquired) and inquired[pos][0] <= low:
+                if max_high is None or inquired[pos][1] > max_high:
+                    max_high = inquired[pos][1]
+                pos += 1
+            if max_high is not None and high <= max_high:
+                kept[idx] = True
+                kept_num += 1
+
+        if kept_num == len(self.freq_info):
+            return None
+        return [item for idx, item in enumerate(self.freq_info) if kept[idx]]
+
+    def channel_info(self, oper_class_dict):
+        """Returns the availableChannelInfo items overlaid with the inquired {globalOperatingClass: channelCfi}
+
+        An inquired operating class without channelCfi keeps all the channels of the class.
+        Returns None when the response has no availableChannelInfo or when the overlay
+        doesn't change it. The items of the test vector are never modified.
+        """
+        if self.chan_info is None:
+            return None
+        filtered = []
+        changed = False
+        for item, cfi_indexes in zip(self.chan_info, self._cfi_indexes):
+            if item["globalOperatingClass"] not in oper_class_dict:
+                changed = True
+                continue
+            req_chans_list = oper_class_dict[item["globalOperatingClass"]]
+            if not req_chans_list:
+                filtered.append(item)
+                continue
+            indexes = sorted(idx for cfi in set(req_chans_list) for idx in cfi_indexes.get(cfi, ()))
+            if len(indexes) == len(item["channelCfi"]):
+                filtered.append(item)
+                continue
+            changed = True
+            if indexes:
+                channel_cfi = item["channelCfi"]
+                max_eirp = item["maxEirp"]
+                filtered.append(dict(item, channelCfi=[channel_cfi[idx] for idx in indexes],
+                                     maxEirp=[max_eirp[idx] for idx in indexes]))
+
+        return filtered if changed else None
+
+    def overlay(self, oper_class_dict, freq_range_list):
+        """Returns the {availableChannelInfo, availableFrequencyInfo} fields of the response changed by an inquiry
+
+        An empty dict means the test vector response is sent as is.
+        """
+        fields = {}
+        items = self.channel_info(oper_class_dict)
+        if items is not None:
+            fields["availableChannelInfo"] = items
+        items = self.frequency_info(freq_range_list)
+        if items is not None:
+            fields["availableFrequencyInfo"] = items
+        return fields
@@ -0,0 +1,66 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package response_template.py : Pre-encoded Available Spectrum Inquiry Responses.
+
+The response of a test vector only differs between two inquiries by the version,
+requestId, availabilityExpireTime and rulesetId fields. The template keeps the
+rest of the response as encoded byte fragments and splices in those fields, so
+sending a response doesn't copy and re-serialize the whole test vector.
+"""
+from afc_common import json_codec
+from afc_common.json_codec import item_separator, key_separator
+
+# Fields of the first availableSpectrumInquiryResponses item set for every inquiry
+per_request_fields = ("requestId", "availabilityExpireTime", "rulesetId")
+
+
+class ResponseTemplate:
+    """Encoded "responses" object of a test vector"""
+
+    def __init__(self, responses):
+        inquiry_responses = responses["availableSpectrumInquiryResponses"]
+        first = {k: v for k, v in inquiry_responses[0].items() if k not in per_request_fields}
+        # '{"response": {...}, "availableFrequencyInfo": [...]' + ', ' then the per request fields
+        self._element_head = json_codec.dumpb(first)[:-1] + (item_separator if first else b"")
+        self._element_tail = b"".join(item_separator + json_codec.dumpb(item) for item in inquiry_responses[1:])
+        others = {k: v for k, v in responses.items() if k not in ("availableSpectrumInquiryResponses", "version")}
+        self._others = json_codec.dumpb(others)[1:-1] + item_separator if others else b""
+
+    def render_element(self, req_id, expire_time, ruleset_id):
+        """Returns the encoded availableSpectrumInquiryResponses items of an inquiry"""
+        return b"".join((
+            self._element_head,
+            b'"requestId"', key_separator, json_codec.dumpb(req_id), item_separator,
+            b'"availabilityExpireTime"', key_separator, json_codec.dumpb(expire_time), item_separator,
+            b'"rulesetId"', key_separator, json_codec.dumpb(ruleset_id), b"}",
+            self._element_tail,
+        ))
+
+    def render(self, version, req_id, expire_time, ruleset_id):
+        """Returns the encoded Available Spectrum Inquiry Response of an inquiry"""
+        return encode_response([self.render_element(req_id, expire_time, ruleset_id)], version, self._others)
+
+    def encode(self, elements, version):
+        """Returns the encoded Available Spectrum Inquiry Response of the encoded items of several inquiries"""
+        return encode_response(elements, version, self._others)
+
+
+def encode_response(elements, version, others=b""):
+    """Returns the encoded response message of encoded availableSpectrumInquiryResponses items"""
+    return b"".join((
+        b'{"availableSpectrumInquiryResponses"', key_separator, b"[", item_separator.join(elements), b"]", item_separator,
+        others, b'"version"', key_separator, json_codec.dumpb(version), b"}",
+    ))
@@ -0,0 +1,54 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package service_links.py : Test case settings shared by the services hosted in one process.
+
+When the AFC simulator and the AFC simulator for fixed client connected SP AP
+run in one process (afc_combined_service), the fixed client service links
+itself to the test case settings of the AFC simulator: a /set-response of the
+AFC simulator configures both services, and its response lists the linked
+services in linkedServices so that the test scripts skip their own request to
+the linked service.
+"""
+import threading
+
+
+class ServiceLinks:
+    """Handlers of the test case settings by linked service name"""
+
+    def __init__(self):
+        self._handlers = {}
+        self._lock = threading.Lock()
+
+    def link(self, name, handler):
+        """Calls handler(setting) with each /set-response setting of the AFC simulator"""
+        with self._lock:
+            self._handlers[name] = handler
+
+    def unlink(self, name):
+        with self._lock:
+            self._handlers.pop(name, None)
+
+    def configure(self, setting):
+        """Passes a test case setting to the linked services, returns the names of the configured ones"""
+        with self._lock:
+            handlers = list(self._handlers.items())
+        for name, handler in handlers:
+            handler(setting)
+        return [name for name, _ in handlers]
+
+
+# Links between the services of the process
+service_links = ServiceLinks()
@@ -0,0 +1,69 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package spectrum_mask.py : Spectrum mask of the randomized test vectors.
+
+A spectrum mask is the maximum PSD of each 20 MHz channel of the 6 GHz band,
+kept as a NumPy array indexed by 20 MHz channel (channel 1 + 4 * index). The
+maximum PSD of a wider channel is the minimum over its 20 MHz channels, which
+is computed for all the channels of a bandwidth at once with a sliding window
+minimum. A channel with an unavailable 20 MHz channel is unavailable. The
+maximum EIRP of a channel is its maximum PSD + 10 * log10(bandwidth), capped
+at 36 dBm.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from afc_common.channel_plan import all_cfis, max_eirp_limit
+
+num_chan_bw20 = len(all_cfis[20])
+
+
+def chan_to_index(chan):
+    """Returns the 20 MHz channel index of a 20 MHz channel"""
+    return (chan - 1) // 4
+
+
+def psd_to_eirp(psd, bw, limit=max_eirp_limit):
+    """Returns the maximum EIRP array of a maximum PSD array of bw MHz channels, capped at limit if any"""
+    eirp = np.round(psd + 10 * np.log10(bw), 1)
+    return eirp if limit is None else np.minimum(eirp, limit)
+
+
+class SpectrumMask:
+    """Maximum PSD of the 20 MHz channels"""
+
+    def __init__(self, psd_by_chan):
+        """psd_by_chan: {20 MHz channel: maxPsd} of the available 20 MHz channels"""
+        self.psd = np.full(num_chan_bw20, np.nan)
+        if psd_by_chan:
+            chans = np.fromiter(psd_by_chan.keys(), dtype=np.int64, count=len(psd_by_chan))
+            self.psd[chan_to_index(chans)] = np.fromiter(psd_by_chan.values(), dtype=np.float64, count=len(psd_by_chan))
+
+    def channel_psd(self, cfis, bw):
+        """Returns the maximum PSD array of the bw MHz channels cfis, NaN for the unavailable channels"""
+        num_chans = bw // 20
+        cfis = np.asarray(cfis, dtype=np.int64)
+        # Lowest 20 MHz channel of each channel
+        first = chan_to_index(cfis - (bw // 10 - 2))
+        # np.min propagates NaN, a window with an unavailable channel is NaN
+        window_min = sliding_window_view(self.psd, num_chans).min(axis=1)
+        return window_min[first]
+
+    def channel_max_eirp(self, cfis, bw, limit=max_eirp_limit):
+        """Returns the available bw MHz channels of cfis and their maximum EIRP as lists"""
+        cfis = np.asarray(cfis, dtype=np.int64)
+        psd = self.channel_psd(cfis, bw)
+        available = ~np.isnan(psd)
+        return cfis[available].tolist(), psd_to_eirp(psd[available], bw, limit).tolist()
@@ -0,0 +1,147 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package traffic_recorder.py : Append-only recording of the HTTP exchanges of a service.
+
+In recording mode every exchange handled by the AFC simulator, the Available
+Spectrum Inquiries of the DUT and the requests of the test scripts configuring
+the simulator, is appended to a recording file as one JSON object per line:
+    {"seq": 12, "start": 1667222400.123456, "duration": 0.0021,
+     "method": "POST", "path": "/availableSpectrumInquiry", "query": "",
+     "headers": {...}, "request": "...", "status": 200, "response": "..."}
+with the request and response bodies as sent. A file name ending with .gz is
+gzip compressed. The records are queued by the request threads and written by
+a writer thread, started by the first exchange recorded by the process: a
+recording started before a fork (gunicorn master) is written by the writer
+thread of the forked process.
+
+tools/replay.py sends the recorded requests again to a simulator and compares
+the responses.
+"""
+import atexit
+import gzip
+import os
+import queue
+import threading
+from commons.logger import Logger
+from commons.shared_enums import (
+    LogCategory,
+)
+from afc_common import json_codec
+
+
+def open_recording(path, mode):
+    """Opens a recording file in binary mode, gzip compressed when its name ends with .gz"""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+class TrafficRecorder:
+    """Recording file of the exchanges and its writer thread"""
+
+    def __init__(self):
+        self.path = None
+        self.records = 0
+        self._queue = None
+        self._thread = None
+        # Process of the writer thread
+        self._pid = None
+        # Writer threads of the parent process, not running in a forked process
+        self._forked_writers = []
+        self._lock = threading.Lock()
+
+    @property
+    def recording(self):
+        return self.path is not None
+
+    def start(self, path):
+        """Appends the next exchanges to the recording file of path, stops the current recording if any"""
+        with self._lock:
+            self.__stop()
+            # Fail now if the file can't be written
+            open(path, "ab").close()
+            self.path = path
+            self.records = 0
+
+    def stop(self):
+        """Writes the queued records and closes the recording file"""
+        with self._lock:
+            self.__stop()
+
+    def record(self, start, duration, method, path, query, headers, request_body, status, response_body):
+        """Queues an exchange, request_body and response_body being bytes"""
+        with self._lock:
+            if self.path is None:
+                return
+            if self._pid != os.getpid():
+                self.__start_writer()
+            self.records += 1
+            self._queue.put({
+                "seq": self.records,
+                "start": round(start, 6),
+                "duration": round(duration, 6),
+                "method": method,
+                "path": path,
+                "query": query,
+                "headers": headers,
+                "request": request_body.decode("utf-8", "replace"),
+                "status": status,
+                "response": response_body.decode("utf-8", "replace"),
+            })
+
+    def status(self):
+        return {"file": self.path, "records": self.records}
+
+    def __start_writer(self):
+        if self._thread is not None:
+            # Writer of the parent process: closing its copy of the file would write the parent buffers again
+            self._forked_writers.append(self._thread)
+        f = open_recording(self.path, "ab")
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self.__run, args=(f, self._queue), name="traffic-recorder", daemon=True)
+        self._thread.start()
+        self._pid = os.getpid()
+
+    def __stop(self):
+        if self._thread is not None:
+            if self._pid == os.getpid():
+                self._queue.put(None)
+                self._thread.join()
+            else:
+                self._forked_writers.append(self._thread)
+        self._queue = self._thread = self._pid = self.path = None
+
+    def __run(self, f, records):
+        with f:
+            while True:
+                batch = [records.get()]
+                while True:
+                    try:
+                        batch.append(records.get_nowait())
+                    except queue.Empty:
+                        break
+                try:
+                    f.write(b"".join(json_codec.dumpb(record) + b"\n" for record in batch if record is not None))
+                    f.flush()
+                except Exception as err:
+                    Logger.log(LogCategory.ERROR, f"Failed to write recording file: {err}")
+                if batch[-1] is None:
+                    return
+
+
+# Recorder shared by the services of the process
+traffic_recorder = TrafficRecorder()
+atexit.register(traffic_recorder.stop)
@@ -0,0 +1,245 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package vector_bundle.py : Compiled bundle of the test vector files of a directory.
+
+tools/compile_vectors.py validates every test vector file of a test vector
+directory and writes them to a single bundle file in that directory:
+    b"AFCVBND1", index length (8 bytes, little endian), index, file contents
+the index being a JSON object {"version": 1, "files": [{"file": "US/AFCD_USA_1.json",
+"size": ..., "mtime": ..., "sha256": ..., "offset": ..., "length": ...}]} with the
+offsets from the start of the file contents.
+
+The VectorIndex memory-maps the bundle of its directory and parses a test vector
+from the mapped pages on first use, instead of reading and parsing every file at
+startup. The processes serving the same directory share the mapped pages. A file
+changed after the compilation (other size, or other modification time and content)
+is read from the file itself.
+"""
+import hashlib
+import mmap
+import os
+import re
+import struct
+from afc_common import json_codec
+
+bundle_filename = "vectors.bundle"
+bundle_magic = b"AFCVBND1"
+bundle_version = 1
+_header = struct.Struct("<8sQ")
+
+# AFCD_UAU_1_phase1.json, AFCD_USA_2.json
+vector_filename_pattern = re.compile(r"^(?P<prefix>.+)_(?P<vec>\d+)(?:_phase(?P<phase>\d+))?\.json$")
+# default.json, default_US.json
+default_filename_pattern = re.compile(r"^default(?:_(?P<country>[A-Z]{2}))?\.json$")
+
+
+def parse_vector_filename(filename, country=None):
+    """Returns the index key (country, prefix, vector, phase) of a test vector file name
+
+    Returns None when the file name does not follow the test vector naming convention.
+    """
+    match = default_filename_pattern.match(filename)
+    if match:
+        return (match.group("country") or country, "default", None, None)
+    match = vector_filename_pattern.match(filename)
+    if match:
+        phase = match.group("phase")
+        return (country, match.group("prefix"), int(match.group("vec")), int(phase) if phase else None)
+    return None
+
+
+def vector_key(data, country=None):
+    """Returns the index key (country, prefix, vector, phase) of the testCaseID of a parsed test vector
+
+    Returns None when the test vector has no valid testCaseID.
+    """
+    test_case = data.get("testCaseID") if isinstance(data, dict) else None
+    if not isinstance(test_case, dict) or not isinstance(test_case.get("testVector"), int) \
+            or not test_case.get("unitUnderTest") or not test_case.get("purpose"):
+        return None
+    phase = test_case.get("phase")
+    return (country, f"{test_case['unitUnderTest']}_{test_case['purpose']}", test_case["testVector"],
+            phase if isinstance(phase, int) and phase else None)
+
+
+def key_name(key):
+    """Returns the file name of an index key without extension, e.g. US/AFCD_UAU_1_phase1"""
+    country, prefix, vec, phase = key
+    name = prefix if vec is None else f"{prefix}_{vec}"
+    if phase:
+        name += f"_phase{phase}"
+    return f"{country}/{name}" if country else name
+
+
+def list_vector_files(root_dir):
+    """Yields (path, country) of the files of a test vector directory and of its country sub-directories"""
+    if not os.path.isdir(root_dir):
+        return
+    for entry in os.scandir(root_dir):
+        if entry.is_file():
+            yield entry.path, None
+        elif entry.is_dir():
+            for sub_entry in os.scandir(entry.path):
+                if sub_entry.is_file():
+                    yield sub_entry.path, entry.name
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_vector(data, key=None):
+    """Returns the errors of a parsed test vector, an empty list when it is valid
+
+    key is the (country, prefix, vector, phase) of the file name, checked against
+    the testCaseID of the test vector when it has one.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("responses"), dict):
+        return ["missing responses object"]
+    items = data["responses"].get("availableSpectrumInquiryResponses")
+    if not isinstance(items, list) or not items:
+        return ["missing responses/availableSpectrumInquiryResponses items"]
+
+    errors = []
+    for index, item in enumerate(items):
+        path = f"availableSpectrumInquiryResponses/{index}"
+        if not isinstance(item, dict):
+            errors.append(f"{path} is not an object")
+            continue
+        response = item.get("response")
+        if not isinstance(response, dict) or not isinstance(response.get("responseCode"), int):
+            errors.append(f"{path}/response/responseCode is missing or not an integer")
+        freq_info = item.get("availableFrequencyInfo", [])
+        if not isinstance(freq_info, list):
+            errors.append(f"{path}/availableFrequencyInfo is not an array")
+            freq_info = []
+        for freq_index, freq in enumerate(freq_info):
+            freq_path = f"{path}/availableFrequencyInfo/{freq_index}"
+            freq_range = freq.get("frequencyRange") if isinstance(freq, dict) else None
+            if not isinstance(freq_range, dict) or not _is_number(freq_range.get("lowFrequency")) \
+                    or not _is_number(freq_range.get("highFrequency")):
+                errors.append(f"{freq_path}/frequencyRange is missing or invalid")
+            elif freq_range["lowFrequency"] >= freq_range["highFrequency"]:
+                errors.append(f"{freq_path}/frequencyRange lowFrequency {freq_range['lowFrequency']} "
+                              f"is not below highFrequency {freq_range['highFrequency']}")
+            if isinstance(freq, dict) and not _is_number(freq.get("maxPsd")):
+                errors.append(f"{freq_path}/maxPsd is missing or not a number")
+        chan_info = item.get("availableChannelInfo", [])
+        if not isinstance(chan_info, list):
+            errors.append(f"{path}/availableChannelInfo is not an array")
+            chan_info = []
+        for chan_index, chan in enumerate(chan_info):
+            chan_path = f"{path}/availableChannelInfo/{chan_index}"
+            if not isinstance(chan, dict) or not isinstance(chan.get("globalOperatingClass"), int):
+                errors.append(f"{chan_path}/globalOperatingClass is missing or not an integer")
+                continue
+            cfis, eirps = chan.get("channelCfi"), chan.get("maxEirp")
+            if not isinstance(cfis, list) or not all(isinstance(cfi, int) for cfi in cfis):
+                errors.append(f"{chan_path}/channelCfi is missing or not an array of integers")
+            elif not isinstance(eirps, list) or not all(_is_number(eirp) for eirp in eirps):
+                errors.append(f"{chan_path}/maxEirp is missing or not an array of numbers")
+            elif len(cfis) != len(eirps):
+                errors.append(f"{chan_path} has {len(cfis)} channelCfi and {len(eirps)} maxEirp")
+
+    test_case = data.get("testCaseID")
+    if key is not None and key[1] != "default" and isinstance(test_case, dict):
+        prefix = f"{test_case.get('unitUnderTest')}_{test_case.get('purpose')}"
+        if prefix != key[1] or test_case.get("testVector") != key[2]:
+            errors.append(f"testCaseID {prefix} {test_case.get('testVector')} doesn't match the file name")
+    return errors
+
+
+def file_digest(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def write_bundle(path, files):
+    """Writes the bundle of [(relative file name, os.stat_result, content)] to path, atomically"""
+    entries = []
+    offset = 0
+    for name, stat, content in files:
+        entries.append({"file": name, "size": stat.st_size, "mtime": stat.st_mtime,
+                        "sha256": file_digest(content), "offset": offset, "length": len(content)})
+        offset += len(content)
+    index = json_codec.dumpb({"version": bundle_version, "files": entries})
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_header.pack(bundle_magic, len(index)))
+        f.write(index)
+        for _, _, content in files:
+            f.write(content)
+    # Replacing the file keeps the pages mapped by the running services valid
+    os.replace(tmp_path, path)
+
+
+def _read_index(buffer, source):
+    """Returns the {file: entry} index of a bundle buffer and the offset of its file contents"""
+    if len(buffer) < _header.size:
+        raise ValueError(f"{source} is not a test vector bundle")
+    magic, index_length = _header.unpack_from(buffer, 0)
+    if magic != bundle_magic:
+        raise ValueError(f"{source} is not a test vector bundle")
+    index = json_codec.loads(buffer[_header.size:_header.size + index_length])
+    if index.get("version") != bundle_version:
+        raise ValueError(f"{source} has the unsupported bundle version {index.get('version')}")
+    return {entry["file"]: entry for entry in index["files"]}, _header.size + index_length
+
+
+def read_bundle(content, source="bundle"):
+    """Returns the [(relative file name, content)] of the bytes of a bundle, e.g. an uploaded one"""
+    files, data_offset = _read_index(content, source)
+    contents = []
+    for name, entry in files.items():
+        start = data_offset + entry["offset"]
+        data = content[start:start + entry["length"]]
+        if len(data) != entry["length"] or file_digest(data) != entry["sha256"]:
+            raise ValueError(f"{source} is truncated or corrupted at {name}")
+        contents.append((name, data))
+    return contents
+
+
+class VectorBundle:
+    """Memory-mapped bundle of a test vector directory"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mtime = os.fstat(f.fileno()).st_mtime
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.files, self._data_offset = _read_index(self._map, path)
+
+    def entry(self, name, stat):
+        """Returns the bundle entry of a file when the bundled content is the current one, else None"""
+        entry = self.files.get(name)
+        if entry is None or entry["size"] != stat.st_size:
+            return None
+        if entry["mtime"] != stat.st_mtime:
+            # Copied or touched after the compilation
+            try:
+                with open(os.path.join(os.path.dirname(self.path), name), "rb") as f:
+                    if file_digest(f.read()) != entry["sha256"]:
+                        return None
+            except OSError:
+                return None
+        return entry
+
+    def content(self, entry):
+        start = self._data_offset + entry["offset"]
+        return self._map[start:start + entry["length"]]
+
+    def load(self, entry):
+        """Returns the parsed test vector of a bundle entry"""
+        return json_codec.loads(self.content(entry))
@@ -0,0 +1,335 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package vector_index.py : In-memory index of the AFC test vectors.
+
+Loads every test vector file of a test vector directory once and keeps the parsed
+vectors keyed by (country, unitUnderTest_purpose, test vector, phase), so that an
+Available Spectrum Inquiry is answered with a single dictionary lookup instead of
+a file lookup and a JSON parse. A watcher thread reloads the files whose
+modification time changed.
+
+When the directory has a compiled bundle (tools/compile_vectors.py), the vectors
+are parsed from the memory-mapped bundle on first use instead of being read and
+parsed at load.
+
+The services hosted by a process get the index of their test vector directory
+with shared_vector_index, so a directory is loaded and watched once per process.
+The shared indexes are loaded by a background thread while the service starts,
+the lookups made before the end of the first load wait for it (at most
+load_wait_timeout seconds, then they load the index themselves). A process
+forked from the process of an index (gunicorn preload) starts the loader and
+watcher threads of the index again, the threads of the parent not being forked.
+
+Test vectors uploaded to a service (/vectors) are installed in the index as a
+named overlay: the vectors of the overlays are looked up before the files, the
+last installed overlay first, and are kept across the reloads of the files.
+"""
+import os
+import threading
+from commons.logger import Logger
+from commons.shared_enums import (
+    LogCategory,
+)
+from afc_common.response_filter import ResponseFilter
+from afc_common.response_template import ResponseTemplate
+from afc_common import json_codec
+from afc_common.metrics import registry
+from afc_common.readiness import readiness
+from afc_common.vector_bundle import (
+    bundle_filename,
+    key_name,
+    list_vector_files,
+    parse_vector_filename,
+    validate_vector,
+    VectorBundle,
+)
+
+vector_load_seconds = registry.histogram("afc_vector_load_seconds", "Time to read and parse a test vector file")
+
+# Seconds a lookup waits for the background load before loading the index itself
+load_wait_timeout = 30
+
+
+class TestVector:
+    """A parsed test vector file
+
+    A test vector of a bundle is parsed by loader() on first use.
+    """
+
+    def __init__(self, key, path, mtime, data, loader=None):
+        self.key = key
+        self.path = path
+        self.mtime = mtime
+        self._data = data
+        self._loader = loader
+        self._template = None
+        self._response_filter = None
+
+    @property
+    def loaded(self):
+        return self._data is not None
+
+    @property
+    def data(self):
+        if self._data is None:
+            with vector_load_seconds.time():
+                self._data = self._loader()
+        return self._data
+
+    @property
+    def template(self):
+        """ResponseTemplate of the test vector responses, built on first use"""
+        if self._template is None:
+            self._template = ResponseTemplate(self.data["responses"])
+        return self._template
+
+    @property
+    def response_filter(self):
+        """ResponseFilter of the first availableSpectrumInquiryResponses item, built on first use"""
+        if self._response_filter is None:
+            self._response_filter = ResponseFilter(self.data["responses"]["availableSpectrumInquiryResponses"][0])
+        return self._response_filter
+
+
+class VectorIndex:
+    """Test vectors of a test vector directory, indexed by
+    (country, unitUnderTest_purpose, test vector, phase)
+
+    Files directly under the directory are indexed without country (unless the
+    country is part of the name, e.g. default_US.json), files under a country
+    sub-directory (US/, CA/) are indexed with that country.
+    """
+
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+        self._vectors = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._bundle = None
+        # Watch interval of prewarm(), None when the index isn't prewarmed
+        self._watch_interval = None
+        # Overlay name -> {key: TestVector}, in installation order
+        self._overlays = {}
+        # Vectors of all the overlays, the last installed overlay overriding the others
+        self._overlay_vectors = {}
+        # Set by the end of the first load
+        self._loaded = threading.Event()
+
+    def get(self, country, prefix, vec=None, phase=None):
+        """Returns the TestVector of the key or None, waits for the first load"""
+        if not self._loaded.is_set() and not self._loaded.wait(load_wait_timeout):
+            # The background load didn't complete, e.g. its thread was lost in a fork
+            Logger.log(LogCategory.ERROR, f"Test vectors of {self.root_dir} not loaded after {load_wait_timeout} seconds, loading them")
+            self.load()
+            readiness.done(self.__readiness_name())
+        key = (country, prefix, vec, phase or None)
+        vector = self._overlay_vectors.get(key)
+        return vector if vector is not None else self._vectors.get(key)
+
+    def __len__(self):
+        return len(self._vectors)
+
+    def load(self):
+        """(Re)loads the files of the test vector directory whose modification time changed
+
+        Returns the number of added, updated or removed test vectors.
+        """
+        with self._lock:
+            current = self._vectors
+            by_path = {vector.path: vector for vector in current.values()}
+            vectors = {}
+            changes = 0
+            bundle = self.__open_bundle()
+            for path, country in list_vector_files(self.root_dir):
+                key = parse_vector_filename(os.path.basename(path), country)
+                if key is None:
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                mtime = stat.st_mtime
+                vector = by_path.get(path)
+                if vector is None or vector.mtime != mtime:
+                    name = os.path.relpath(path, self.root_dir).replace(os.sep, "/")
+                    entry = bundle.entry(name, stat) if bundle else None
+                    try:
+                        if entry is not None:
+                            vector = TestVector(key, path, mtime, None, lambda bundle=bundle, entry=entry: bundle.load(entry))
+                        else:
+                            with vector_load_seconds.time(), open(path, "rb") as f:
+                                vector = TestVector(key, path, mtime, json_codec.load(f))
+                        changes += 1
+                    except (OSError, ValueError) as err:
+                        # Keep the previous copy (if any), the file may be being written
+                        Logger.log(LogCategory.ERROR, f"Failed to load test vector {path}: {err}")
+                        if vector is None:
+                            continue
+                vectors[key] = vector
+
+            changes += len(set(current) - set(vectors))
+            if changes:
+                # Replace the whole index at once, readers never see a partial reload
+                self._vectors = vectors
+            self._loaded.set()
+            return changes
+
+    def install_overlay(self, name, vectors):
+        """Installs [(key, data, source)] test vectors as the overlay name, replacing the previous one
+
+        The test vectors are validated and their responses encoded before the
+        installation: when one of them is invalid nothing is installed and
+        ValueError lists the errors with the source of each test vector.
+        Returns the number of installed test vectors.
+        """
+        overlay, errors = {}, []
+        for key, data, source in vectors:
+            vector_errors = validate_vector(data, key)
+            if key in overlay:
+                vector_errors.append(f"same test vector {key_name(key)} as {overlay[key].path}")
+            if not vector_errors:
+                vector = TestVector(key, source, None, data)
+                try:
+                    vector.template
+                    vector.response_filter
+                    overlay[key] = vector
+                except (KeyError, IndexError, TypeError, ValueError) as err:
+                    vector_errors.append(f"response can't be encoded: {type(err).__name__}: {err}")
+            errors.extend(f"{source}: {error}" for error in vector_errors)
+        if errors:
+            raise ValueError("; ".join(errors))
+        if not overlay:
+            raise ValueError("no test vector to install")
+        with self._lock:
+            overlays = {key: value for key, value in self._overlays.items() if key != name}
+            overlays[name] = overlay
+            self.__set_overlays(overlays)
+        return len(overlay)
+
+    def remove_overlay(self, name):
+        """Removes the overlay name, returns False when there is no such overlay"""
+        with self._lock:
+            if name not in self._overlays:
+                return False
+            self.__set_overlays({key: value for key, value in self._overlays.items() if key != name})
+            return True
+
+    def overlays(self):
+        """Returns the test vector names of each overlay, in installation order"""
+        return {name: [key_name(key) for key in overlay] for name, overlay in self._overlays.items()}
+
+    def __set_overlays(self, overlays):
+        merged = {}
+        for overlay in overlays.values():
+            merged.update(overlay)
+        # Replaced at once, the lookups never see a partial installation
+        self._overlays = overlays
+        self._overlay_vectors = merged
+
+    def prewarm(self, watch_interval=2):
+        """Loads the test vector directory in a background thread, then starts the watcher"""
+        name = self.__readiness_name()
+        self._watch_interval = watch_interval
+        readiness.pending(name)
+
+        def run():
+            try:
+                self.load()
+                # Build the response templates and filters before the first inquiries,
+                # the vectors of a bundle are left to be parsed on first use
+                for vector in list(self._vectors.values()):
+                    if not vector.loaded:
+                        continue
+                    try:
+                        vector.template
+                        vector.response_filter
+                    except (KeyError, IndexError, TypeError, ValueError) as err:
+                        Logger.log(LogCategory.ERROR, f"Invalid test vector {vector.path}: {err}")
+            except Exception as err:
+                Logger.log(LogCategory.ERROR, f"Failed to load the test vectors of {self.root_dir}: {err}")
+            finally:
+                # Don't block the lookups after a failed load, the watcher retries it
+                self._loaded.set()
+                readiness.done(name)
+            self.start_watcher(watch_interval)
+
+        threading.Thread(target=run, name="vector-index-prewarm", daemon=True).start()
+
+    def after_fork(self):
+        """Starts the threads of a prewarmed index again in a forked child process"""
+        # A lock held by a thread of the parent is never released in the child
+        self._lock = threading.Lock()
+        self._watcher = None
+        if self._watch_interval is None:
+            return
+        if self._loaded.is_set():
+            self.start_watcher(self._watch_interval)
+        else:
+            self.prewarm(self._watch_interval)
+
+    def start_watcher(self, interval=2):
+        """Starts a daemon thread reloading the changed test vector files every interval seconds"""
+        if self._watcher:
+            return
+        self._watcher = threading.Thread(target=self.__watch, args=(interval,),
+                                         name="vector-index-watcher", daemon=True)
+        self._watcher.start()
+
+    def __watch(self, interval):
+        event = threading.Event()
+        while not event.wait(interval):
+            try:
+                changes = self.load()
+                if changes:
+                    Logger.log(LogCategory.DEBUG, f"Reloaded {changes} test vector(s) from {self.root_dir}")
+            except Exception as err:
+                Logger.log(LogCategory.ERROR, f"Test vector watcher exception: {err}")
+
+    def __readiness_name(self):
+        return f"vectors:{self.root_dir}"
+
+    def __open_bundle(self):
+        """Returns the VectorBundle of the directory, mapped again when the bundle file changed"""
+        path = os.path.join(self.root_dir, bundle_filename)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            self._bundle = None
+            return None
+        if self._bundle is None or self._bundle.mtime != mtime:
+            try:
+                self._bundle = VectorBundle(path)
+            except (OSError, ValueError) as err:
+                Logger.log(LogCategory.ERROR, f"Failed to map test vector bundle {path}: {err}")
+                self._bundle = None
+        return self._bundle
+
+
+# VectorIndex of each test vector directory of the process
+_shared_indexes = {}
+_shared_indexes_lock = threading.Lock()
+
+
+def shared_vector_index(root_dir, watch_interval=2):
+    """Returns the VectorIndex of a test vector directory, prewarmed and watched on first use"""
+    root_dir = os.path.abspath(root_dir)
+    with _shared_indexes_lock:
+        index = _shared_indexes.get(root_dir)
+        if index is None:
+            index = _shared_indexes[root_dir] = VectorIndex(root_dir)
+            index.prewarm(watch_interval)
+            os.register_at_fork(after_in_child=index.after_fork)
+        return index
@@ -0,0 +1,183 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package wsgi_server.py : WSGI servers of the AFC simulator services.
+
+The services run on the Flask development server by default. The production
+servers (waitress, a multi-threaded server, or gunicorn, a pre-forked server
+with threaded workers) are optional packages, the service falls back to the
+development server when the selected one is not installed.
+
+The simulator state is kept in memory per process: a test session must be
+served by a single process, so gunicorn is run with one worker and several
+threads, whatever the number of workers requested.
+
+With --tls-cert and --tls-key (a certificate issued by the AFC CA, afc_ca.pem,
+and its key) the development server and gunicorn terminate TLS themselves and
+resume the TLS sessions of the returning clients with session tickets
+(--tls-tickets, 0 for full handshakes only). The connections are kept alive by
+gunicorn, and by the development server of the Werkzeug versions before 2.1
+(the later versions close every connection). tls_stats returns the handshake
+and resumption counts.
+
+A process hosting several services (afc_combined_service) serves the same app
+on the port of each service (extra_ports).
+
+The app is built by the create_app function of the service in the process
+serving the requests: gunicorn calls it in each worker after the fork, so the
+threads started by the import of the service (test vector loading and watcher,
+traffic recorder writer) run in the worker and not in the master process.
+"""
+import ssl
+import threading
+from commons.logger import Logger
+from commons.shared_enums import (
+    LogCategory,
+)
+
+servers = ("dev", "waitress", "gunicorn")
+
+# Idle time (seconds) before a kept-alive connection is closed
+keep_alive_timeout = 75
+
+# SSLContext of the TLS server of the process, None when serving plain HTTP
+tls_context = None
+
+
+def add_server_arguments(parser, port):
+    """Adds the server selection options to an argparse parser"""
+    parser.add_argument("--server", choices=servers, default="dev",
+                        help="WSGI server, the Flask development server by default")
+    parser.add_argument("--port", type=int, default=port, help=f"listening port, {port} by default")
+    parser.add_argument("--workers", type=int, default=1, help="number of gunicorn worker processes, only 1 is supported")
+    parser.add_argument("--threads", type=int, default=8, help="number of request threads per process")
+    parser.add_argument("--tls-cert", help="certificate chain (PEM) of the server, serves HTTPS when set")
+    parser.add_argument("--tls-key", help="private key (PEM) of the TLS certificate")
+    parser.add_argument("--tls-tickets", type=int, default=2,
+                        help="number of TLS 1.3 session tickets per handshake, 0 disables the session resumption")
+
+
+def create_tls_context(cert_file, key_file, tickets=2):
+    """Returns the server SSLContext of a certificate, resuming the sessions with session tickets"""
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.minimum_version = ssl.TLSVersion.TLSv1_2
+    context.load_cert_chain(cert_file, key_file)
+    context.num_tickets = tickets
+    if tickets == 0:
+        context.options |= ssl.OP_NO_TICKET
+    return context
+
+
+def tls_stats():
+    """Returns the handshake and session resumption counts of the TLS server"""
+    if tls_context is None:
+        return {"enabled": False}
+    stats = tls_context.session_stats()
+    return {
+        "enabled": True,
+        "handshakes": stats["accept_good"],
+        "resumedHandshakes": stats["hits"],
+        "fullHandshakes": stats["accept_good"] - stats["hits"],
+        "failedHandshakes": stats["accept"] - stats["accept_good"],
+        "sessionTickets": tls_context.num_tickets,
+    }
+
+
+def serve(create_app, host, port, server="dev", workers=1, threads=8, tls_cert=None, tls_key=None, tls_tickets=2, extra_ports=()):
+    """Serves the Flask app returned by create_app() with the selected WSGI server until interrupted,
+    over TLS when tls_cert is set
+
+    The app is also served on each of extra_ports.
+    """
+    global tls_context
+    ports = [port] + list(extra_ports)
+    addresses = " ".join(f"{host}:{p}" for p in ports)
+    if tls_cert:
+        tls_context = create_tls_context(tls_cert, tls_key, tls_tickets)
+        if server == "waitress":
+            Logger.log(LogCategory.ERROR, "waitress doesn't support TLS, using the development server")
+            server = "dev"
+
+    if server == "waitress":
+        try:
+            import waitress
+        except ImportError:
+            Logger.log(LogCategory.ERROR, "waitress is not installed, using the development server")
+        else:
+            Logger.log(LogCategory.DEBUG, f"Serving on {addresses} with waitress, {threads} threads")
+            waitress.serve(create_app(), listen=addresses, threads=threads)
+            return
+    elif server == "gunicorn":
+        try:
+            from gunicorn.app.base import BaseApplication
+        except ImportError:
+            Logger.log(LogCategory.ERROR, "gunicorn is not installed, using the development server")
+        else:
+            if workers > 1:
+                Logger.log(LogCategory.ERROR, f"{workers} gunicorn workers don't share the simulator state, "
+                           "using a single worker")
+                workers = 1
+            Logger.log(LogCategory.DEBUG, f"Serving on {addresses} with gunicorn, {workers} workers of {threads} threads")
+            options = {
+                "bind": addresses.split(),
+                "workers": workers,
+                "threads": threads,
+                "worker_class": "gthread",
+                # Held and delayed responses last longer than the default 30 seconds
+                "timeout": 0,
+            }
+            if tls_context is not None:
+                options.update({
+                    "certfile": tls_cert,
+                    "keyfile": tls_key,
+                    "keepalive": keep_alive_timeout,
+                    # gunicorn 21 and later, the handshake counts of older versions are not available
+                    "ssl_context": lambda config, default_ssl_context_factory: tls_context,
+                })
+
+            class GunicornApplication(BaseApplication):
+                def load_config(self):
+                    for key, value in options.items():
+                        if key in self.cfg.settings:
+                            self.cfg.set(key, value)
+                        else:
+                            Logger.log(LogCategory.ERROR, f"gunicorn doesn't support the {key} setting")
+
+                def load(self):
+                    # Called in the worker, after the fork (no preload_app)
+                    return create_app()
+
+            GunicornApplication().run()
+            return
+
+    app = create_app()
+    options = {}
+    if tls_context is not None:
+        from werkzeug.serving import WSGIRequestHandler
+
+        class KeepAliveRequestHandler(WSGIRequestHandler):
+            protocol_version = "HTTP/1.1"
+            timeout = keep_alive_timeout
+
+        Logger.log(LogCategory.DEBUG, f"Serving HTTPS on {addresses} with the development server")
+        options = {"ssl_context": tls_context, "request_handler": KeepAliveRequestHandler}
+    if extra_ports:
+        from werkzeug.serving import make_server
+
+        for extra_port in extra_ports:
+            extra_server = make_server(host, extra_port, app, threaded=True, **options)
+            threading.Thread(target=extra_server.serve_forever, name=f"server-{extra_port}", daemon=True).start()
+    app.run(host=host, port=port, threaded=True, **options)
+
@@ -16,23 +16,36 @@
 """@package routes.py : AFC Simulator APIs for fixed client connected SP AP.
 
 Contains all the routes that are exposed by the AFC simulator service.
+
+The module state (the configured test vector, the last received request and
+sent response, and the response timing control) is only accessed with
+state_lock held. A held or delayed response waits on state_changed, which
+releases the lock, so the test script can still query and control the service
+meanwhile.
 """
-import json
 import os
-import copy
+import threading
+import time
 from datetime import datetime, timedelta
-from time import sleep
 from flask import request, Response, request_finished
 from . import afc_simulator_api_blueprint
 from flask_restplus import Api, Resource, fields
-from commons.logger import Logger
-from commons.shared_enums import (
-    LogCategory,
-)
+from afc_common.channel_plan import country_plans, ruleset_to_country
+from afc_common import json_codec
+from afc_common.request_schema import validate_inquiry, location_count, inquired_channels, inquired_frequency_ranges
+from afc_common.vector_index import shared_vector_index
+from afc_common.readiness import readiness
+from afc_common.service_links import service_links
+from afc_common.inquiry_log import inquiry_log, inquiry_file_formats
+from afc_common.debug_log import get_logger, pretty_json
 import traceback
 
+log = get_logger("fc_ap")
+
 json_dir_path = os.path.abspath("./QuickTrack-Tool/Test-Services/afc_fc_ap_service/app/test_vectors/")
+vector_index = shared_vector_index(json_dir_path)
 vectors = {}
+current_vector = None
 recv_request = {"headers": {}, "body": {}}
 valid_request = False
 sent_response = {}
@@ -40,25 +53,18 @@ resp_wait_time = 0
 phase = None
 filename_prefix = "default"
 hold_response = False
+state_lock = threading.RLock()
+# Notified when the response timing control changes
+state_changed = threading.Condition(state_lock)
 script_test_vector = 0
 inquiry_file = None
+inquiry_file_format = "text"
 country_code = 'US'
 
 def rulesetId_to_countrycode(rulesetId):
-    map = {
-        'US_47_CFR_PART_15_SUBPART_E':'US',
-        'CA_RES_DBS-06':'CA'
-    }
-    rulesetId = rulesetId.upper()
-    if rulesetId in map:
-        return map[rulesetId]
-    else:
-        return None
+    return ruleset_to_country(rulesetId)
 
-certification = {
-    'US' : 'FCC',
-    'CA' : 'ISED',
-}
+certification = {country_code: plan.certification for country_code, plan in country_plans.items()}
 
 api = Api(
     app=afc_simulator_api_blueprint,
@@ -82,13 +88,6 @@ test_case_control = api.model(
     },
 )
 
-def is_inquired_freq_range(freq_range, inquired_list):
-    l, h = freq_range
-    for low, high in inquired_list:
-        if l >= low and h <= high:
-            return True
-    return False
-
 def gen_err_resp(req_id, resp_code, short_desc, version, supp_info=None):
     global sent_response
     response_dict = {
@@ -110,13 +109,15 @@ def gen_err_resp(req_id, resp_code, short_desc, version, supp_info=None):
     return sent_response
 
 def append_to_inquiry_file(json_data):
-    if inquiry_file:
-        if not os.path.exists(inquiry_file):
-            open(inquiry_file, 'a').close()
-        border = "###########################"
-        timestamp = "   " + datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ') + "   "
-        with open(inquiry_file, 'a') as f:
-            f.write(border + timestamp + border + '\n' + json.dumps(json_data, indent=4) + '\n\n')
+    inquiry_log.append(inquiry_file, json_data, inquiry_file_format)
+
+def wait_response_time(seconds):
+    """Waits for seconds without holding state_lock, state_lock must be held"""
+    deadline = time.monotonic() + seconds
+    remaining = seconds
+    while remaining > 0:
+        state_changed.wait(remaining)
+        remaining = deadline - time.monotonic()
 
 # API for DUT
 @api.route('/availableSpectrumInquiry')
@@ -124,7 +125,12 @@ class AvailableSpectrum(Resource):
     @api.response(200, "Success")
     @api.response(400, "Bad Request")
     def post(self):
+        with state_lock:
+            return self.__handle_inquiry()
+
+    def __handle_inquiry(self):
         global vectors
+        global current_vector
         global recv_request
         global sent_response
         global resp_wait_time
@@ -134,7 +140,6 @@ class AvailableSpectrum(Resource):
         global valid_request
         has_channel = False
         has_freq_range = False
-        valid_location_num = 0
 
         try:
             # Handling request
@@ -149,102 +154,74 @@ class AvailableSpectrum(Resource):
                 recv_request["body"] = request.json
             else:
                 recv_request["body"] = {}        
-                return Response(json.dumps({"message": f"Content-Type {content_type} not supported! Please use application/json."}), mimetype="application/json", status=400)
+                return Response(json_codec.dumpb({"message": f"Content-Type {content_type} not supported! Please use application/json."}), mimetype="application/json", status=400)
 
-            Logger.log(LogCategory.DEBUG, f"[afc-fc-ap-api] Received request from fixed client connected SP AP {json.dumps(recv_request, indent=4)}")
+            log.debug("[afc-fc-ap-api] Received request from fixed client connected SP AP %s", pretty_json(dict(recv_request)))
 
-            version = recv_request["body"]['version']
-            req = recv_request["body"]['availableSpectrumInquiryRequests'][0]
-            req_id = req["requestId"]
+            validation = validate_inquiry(recv_request["body"])
+            version = validation.version
+            req_id = validation.request_id
             # --- ---
 
             if filename_prefix == "":
-                Logger.log(LogCategory.ERROR, f'test vector is not configured')
-                return Response(json.dumps(gen_err_resp(req_id, -1, "General Failure", version)),
+                log.error('test vector is not configured')
+                return Response(json_codec.dumpb(gen_err_resp(req_id, -1, "General Failure", version)),
                                 mimetype="application/json", status=200)
 
-            Logger.log(LogCategory.DEBUG, f"version {version} requestId {req_id}")
-            dev_desc = req['deviceDescriptor']
-            Logger.log(LogCategory.DEBUG, f"serialNumber {dev_desc['serialNumber']}")
-
-            if not isinstance(dev_desc['certificationId'], list):                        
-                Logger.log(LogCategory.ERROR, f'invalidParams certificationId: DATA TYPE should be array of object CertificationId')
-                return Response(json.dumps(gen_err_resp(req_id, 103, "One or more fields have an invalid value.", version, {"invalidParams": ["certificationId"]})),
+            error = validation.error()
+            if error is not None:
+                resp_code, short_desc, supp_info = error
+                log.error('%s %s in received Available Spectrum Request', short_desc, supp_info or "")
+                return Response(json_codec.dumpb(gen_err_resp(req_id, resp_code, short_desc, version, supp_info)),
                                 mimetype="application/json", status=200)
 
-            ruleset_ids = []
-            if version == "1.4":
-                for certId in dev_desc['certificationId']:
-                    rulesetId = certId['rulesetId']
-                    Logger.log(LogCategory.DEBUG, f"certificationId - rulesetId {rulesetId} id {certId['id']}")
-                    if isinstance(rulesetId, str):
-                        if rulesetId_to_countrycode(rulesetId) == country_code:
-                            ruleset_ids.append(rulesetId)
-                        else:
-                            err_str = f"invalid rulesetId {rulesetId} for {certification[country_code]} AFC DUT test"
-                            Logger.log(LogCategory.ERROR, err_str)
-                            return Response(json.dumps(gen_err_resp(req_id, -1, err_str, version)),
-                                mimetype="application/json", status=200)
-                    else:
-                        Logger.log(LogCategory.ERROR, f'invalidParams rulesetId: DATA TYPE should be string')
-                        return Response(json.dumps(gen_err_resp(req_id, 103, "One or more fields have an invalid value.", version, {"invalidParams": ["rulesetId"]})),
-                                        mimetype="application/json", status=200)
-
-            else:
-                return Response(json.dumps(gen_err_resp(req_id, 100, "version not supported", version)),
-                                mimetype="application/json", status=200)
-                # for certId in dev_desc['certificationId']:
-                #     Logger.log(LogCategory.DEBUG, f"certificationId - nra {certId['nra']} id {certId['id']}")
-                # ruleset_ids = dev_desc['rulesetIds']
-                # Logger.log(LogCategory.DEBUG, f"rulesetIds {ruleset_ids}")
-                # if not isinstance(ruleset_ids, list):                        
-                #     Logger.log(LogCategory.ERROR, f'invalidParams rulesetIds: DATA TYPE should be array of string')
-                #     return Response(json.dumps(gen_err_resp(req_id, 103, "One or more fields have an invalid value.", version, {"invalidParams": ["rulesetIds"]})),
-                #                 mimetype="application/json", status=200)
-
-            if "location" in req:
-                if 'ellipse' in req['location']:
-                    valid_location_num += 1
-                    center = req['location']['ellipse']['center']
-                    Logger.log(LogCategory.DEBUG, f"center {center['latitude']} {center['longitude']}")
-                if 'linearPolygon' in req['location']:
-                    valid_location_num += 1
-                    Logger.log(LogCategory.DEBUG, f"linearPolygon outerBoundary {req['location']['linearPolygon']['outerBoundary']}")
-                if 'radialPolygon' in req['location']:
-                    valid_location_num += 1
-                    center = req['location']['radialPolygon']['center']
-                    Logger.log(LogCategory.DEBUG, f"center {center['latitude']} {center['longitude']}")
-                    Logger.log(LogCategory.DEBUG, f"radialPolygon outerBoundary {req['location']['radialPolygon']['outerBoundary']}")
+            req = validation.request
+            log.debug("version %s requestId %s", version, req_id)
+            dev_desc = req['deviceDescriptor']
+            log.debug("serialNumber %s", dev_desc['serialNumber'])
 
+            ruleset_ids = []
+            for certId in dev_desc['certificationId']:
+                rulesetId = certId['rulesetId']
+                log.debug("certificationId - rulesetId %s id %s", rulesetId, certId['id'])
+                if rulesetId_to_countrycode(rulesetId) == country_code:
+                    ruleset_ids.append(rulesetId)
+                else:
+                    err_str = f"invalid rulesetId {rulesetId} for {certification[country_code]} AFC DUT test"
+                    log.error(err_str)
+                    return Response(json_codec.dumpb(gen_err_resp(req_id, -1, err_str, version)),
+                        mimetype="application/json", status=200)
+
+            valid_location_num = location_count(req)
             if valid_location_num != 1:
-                Logger.log(LogCategory.ERROR, f'Invalid location object number {valid_location_num}')
-                return Response(json.dumps(gen_err_resp(req_id, -1, "General Failure", version)),
+                log.error('Invalid location object number %s', valid_location_num)
+                return Response(json_codec.dumpb(gen_err_resp(req_id, -1, "General Failure", version)),
                                 mimetype="application/json", status=200)
 
             field = "inquiredChannels"
             oper_class_dict = {}
             if field in req:
-                oper_class_dict = {item["globalOperatingClass"]: item["channelCfi"] if "channelCfi" in item else None for item in req[field]}
-                Logger.log(LogCategory.DEBUG, f'Inquired globalOperatingClass list {oper_class_dict}')
+                oper_class_dict = inquired_channels(req)
+                log.debug('Inquired globalOperatingClass list %s', oper_class_dict)
                 if len(oper_class_dict) > 0:
                     has_channel = True
             field = "inquiredFrequencyRange"
             freq_range_list = []
             if field in req:
-                freq_range_list = [(item["lowFrequency"], item["highFrequency"]) for item in req[field]]
-                Logger.log(LogCategory.DEBUG, f'Inquired FrequencyRange list {freq_range_list}')
+                freq_range_list = inquired_frequency_ranges(req)
+                log.debug('Inquired FrequencyRange list %s', freq_range_list)
                 if len(freq_range_list) > 0:
                     has_freq_range = True
         except KeyError as err:
-            Logger.log(LogCategory.ERROR, f'Missing field {err} in received Available Spectrum Request')
-            return Response(json.dumps(gen_err_resp(req_id, 102, "Missing Param.", version,
+            log.error('Missing field %s in received Available Spectrum Request', err)
+            return Response(json_codec.dumpb(gen_err_resp(req_id, 102, "Missing Param.", version,
                                                     {"missingParams": [str(err)]})),
                             mimetype="application/json", status=200)
 
         except Exception as err:
             exception_str = traceback.format_exc()
-            Logger.log(LogCategory.ERROR, f'Response Exception\n {exception_str}')
-            return Response(json.dumps(gen_err_resp(req_id, -1, "General Failure", version)),
+            log.error('Response Exception\n %s', exception_str)
+            return Response(json_codec.dumpb(gen_err_resp(req_id, -1, "General Failure", version)),
                                 mimetype="application/json", status=200)
 
         valid_request = True
@@ -259,88 +236,92 @@ class AvailableSpectrum(Resource):
         elif has_freq_range:
             vec = "1"
 
-        Logger.log(LogCategory.DEBUG, f'test vector {vec} filename_prefix {filename_prefix}')
+        log.debug('test vector %s filename_prefix %s', vec, filename_prefix)
         if vec:
             if filename_prefix == "default":
-                filename = f"{filename_prefix}_{country_code}.json"
-            elif phase:
-                filename = filename_prefix + vec + f"_phase{phase}.json"
+                test_vector = vector_index.get(country_code, filename_prefix)
             else:
-                filename = filename_prefix + vec + ".json"
-            test_case_file = os.path.join(json_dir_path, filename)
-            Logger.log(LogCategory.DEBUG, f'test vector file path: {test_case_file}')
-            if os.path.exists(test_case_file):
-                with open(test_case_file, "r") as f:
-                    vectors = json.load(f)
+                test_vector = vector_index.get(None, filename_prefix, int(vec), phase)
+            if test_vector:
+                log.debug('test vector file path: %s', test_vector.path)
+                current_vector = test_vector
+                vectors = test_vector.data
             else:
-                Logger.log(LogCategory.ERROR, f"test vector {filename} is not found")
-                return Response(json.dumps(gen_err_resp(req_id, -1, "General Failure", version)),
+                log.error("test vector %s %s phase %s of %s is not found", filename_prefix, vec, phase, country_code)
+                return Response(json_codec.dumpb(gen_err_resp(req_id, -1, "General Failure", version)),
                                 mimetype="application/json", status=200)
 
         # Handling response
         if hold_response:
-            Logger.log(LogCategory.DEBUG, f"Hold an Available Spectrum Inquiry Response")
-            while hold_response:                    
-                sleep(1)
+            log.debug("Hold an Available Spectrum Inquiry Response")
+            state_changed.wait_for(lambda: not hold_response)
         if resp_wait_time > 0:
-            Logger.log(LogCategory.DEBUG, f"Waits for {resp_wait_time} seconds before sending an Available Spectrum Inquiry Response ")
-            sleep(resp_wait_time)
+            log.debug("Waits for %s seconds before sending an Available Spectrum Inquiry Response ", resp_wait_time)
+            wait_response_time(resp_wait_time)
         try:
-            if vectors:
-                sent_response = copy.deepcopy(vectors["responses"])
-                sent_response["version"] = version
-                resp = sent_response["availableSpectrumInquiryResponses"][0]
+            if vectors and current_vector is not None:
+                # Shallow copies of the shared test vector, its items are never modified
+                responses = vectors["responses"]
+                items = responses["availableSpectrumInquiryResponses"]
+                resp = dict(items[0], **current_vector.response_filter.overlay(oper_class_dict, freq_range_list))
                 resp["requestId"] = req_id
                 resp["availabilityExpireTime"] = (datetime.utcnow() + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%SZ')
                 resp["rulesetId"] = ruleset_ids[0]
-
-                field = "availableChannelInfo"
-                if field in resp:
-                    chan_info = resp[field]
-                    resp[field] = []
-                    for item in chan_info:
-                        if item["globalOperatingClass"] in oper_class_dict:
-                            resp_chans_list = item["channelCfi"]
-                            resp_chans_set = set(resp_chans_list)
-                            req_chans_list = oper_class_dict[item["globalOperatingClass"]]
-                            if req_chans_list:
-                                req_chans_set = set(req_chans_list)
-                                if req_chans_set & resp_chans_set:
-                                    overlay_chans = []
-                                    overlay_maxeirp = []
-                                    for idx, chan in enumerate(resp_chans_list):
-                                        if chan in req_chans_set:
-                                            overlay_chans.append(chan)
-                                            overlay_maxeirp.append(item["maxEirp"][idx])
-                                    item["channelCfi"] = overlay_chans
-                                    item["maxEirp"] = overlay_maxeirp
-                                    resp[field].append(item)
-                            else:
-                                resp[field].append(item)
-
-                field = "availableFrequencyInfo"
-                if field in resp:
-                    freq_info = resp[field]
-                    resp[field] = []
-                    for item in freq_info:
-                        freq_range = item["frequencyRange"]
-                        if is_inquired_freq_range((freq_range["lowFrequency"], freq_range["highFrequency"]) , freq_range_list):
-                            resp[field].append(item)
-                Logger.log(LogCategory.DEBUG, "*" * 68)
-                Logger.log(LogCategory.DEBUG, f"*  [afc-fc-ap-api] Sending an Available Spectrum Inquiry Response  *")
-                Logger.log(LogCategory.DEBUG, "*" * 68)
+                sent_response = dict(responses, version=version, availableSpectrumInquiryResponses=[resp] + items[1:])
+                log.debug("[afc-fc-ap-api] Sending an Available Spectrum Inquiry Response")
                 append_to_inquiry_file(sent_response)
-                return Response(json.dumps(sent_response), mimetype="application/json", status=200)
+                return Response(json_codec.dumpb(sent_response), mimetype="application/json", status=200)
             else:
-                Logger.log(LogCategory.ERROR, f"test vector is not found")
-                return Response(json.dumps(gen_err_resp(req_id, -1, "General Failure", version)),
+                log.error("test vector is not found")
+                return Response(json_codec.dumpb(gen_err_resp(req_id, -1, "General Failure", version)),
                                 mimetype="application/json", status=200)
         except Exception as err:
             exception_str = traceback.format_exc()
-            Logger.log(LogCategory.ERROR, f'Response Exception\n {exception_str}')
-            return Response(json.dumps(gen_err_resp(req_id, -1, "General Failure", version)),
+            log.error('Response Exception\n %s', exception_str)
+            return Response(json_codec.dumpb(gen_err_resp(req_id, -1, "General Failure", version)),
                             mimetype="application/json", status=200)
 
+def set_test_case(tc):
+    """Applies a /set-response test case setting"""
+    global vectors
+    global current_vector
+    global recv_request
+    global sent_response
+    global resp_wait_time
+    global filename_prefix
+    global phase
+    global hold_response
+    global script_test_vector
+    global country_code
+    with state_lock:
+        if "purpose" in tc:
+            phase = None
+            vectors = {}
+            current_vector = None
+            recv_request = {"headers": {}, "body": {}}
+            sent_response = {}
+            resp_wait_time = 0
+            filename_prefix = f'{tc["unitUnderTest"]}_{tc["purpose"]}'
+        if "testVector" in tc:
+            script_test_vector = tc["testVector"]
+        if "phase" in tc:
+            phase = tc["phase"]
+        if "respWaitTime" in tc:
+            resp_wait_time = tc["respWaitTime"]
+        if "holdResponse" in tc:
+            hold_response = tc["holdResponse"]
+            state_changed.notify_all()
+            log.debug('holdResponse %s', hold_response)
+        if "countryCode" in tc:
+            country_code = tc["countryCode"]
+
+def set_linked_test_case(tc):
+    """Applies the country of a /set-response setting of the AFC simulator hosted in the same process"""
+    if "countryCode" in tc:
+        set_test_case({"countryCode": tc["countryCode"]})
+
+service_links.link("afc-fc-ap-api", set_linked_test_case)
+
 # APIs for test scripts
 @api.route('/set-response')
 class SetResponse(Resource):
@@ -348,42 +329,16 @@ class SetResponse(Resource):
     @api.response(400, "Exception occurs")
     @api.expect(test_case_control, validate=True)
     def post(self):
-        global vectors
-        global recv_request
-        global sent_response
-        global resp_wait_time
-        global filename_prefix
-        global phase
-        global hold_response
-        global script_test_vector
-        global country_code
         tc = request.json
  
         try:
-            if "purpose" in tc:                
-                phase = None
-                vectors = {}
-                recv_request = {"headers": {}, "body": {}}
-                sent_response = {}
-                resp_wait_time = 0
-                filename_prefix = f'{tc["unitUnderTest"]}_{tc["purpose"]}_'
-            if "testVector" in tc:
-                script_test_vector = tc["testVector"]
-            if "phase" in tc:
-                phase = tc["phase"]
-            if "respWaitTime" in tc:
-                resp_wait_time = tc["respWaitTime"]                
-            if "holdResponse" in tc:
-                hold_response = tc["holdResponse"]
-                Logger.log(LogCategory.DEBUG, f'holdResponse {hold_response}')
-            if "countryCode" in tc:
-                country_code = tc["countryCode"]
+            set_test_case(tc)
 
             response = {"message": "Success"}
-            return Response(json.dumps(response), mimetype="application/json", status=200)
+            return Response(json_codec.dumpb(response), mimetype="application/json", status=200)
         except Exception as err:
             response = {"message": f"Exception : {err}"}
-            return Response(json.dumps(response), mimetype="application/json", status=400)
+            return Response(json_codec.dumpb(response), mimetype="application/json", status=400)
 
 @api.route('/get-status')
 class GetStatus(Resource):
@@ -393,13 +348,23 @@ class GetStatus(Resource):
         global recv_request
         global sent_response
         global valid_request
-        response = {"currentTestVector": vectors,
-                    "receivedRequestHeaders" : recv_request["headers"],
-                    "receivedRequest" : recv_request["body"],
-                    "sentResponse" : sent_response,
-                    "valid_request" : valid_request
-                    }
-        return Response(json.dumps(response), mimetype="application/json", status=200)
+        with state_lock:
+            response = {"currentTestVector": vectors,
+                        "receivedRequestHeaders" : recv_request["headers"],
+                        "receivedRequest" : recv_request["body"],
+                        "sentResponse" : sent_response,
+                        "valid_request" : valid_request
+                        }
+            response = json_codec.dumpb(response)
+        return Response(response, mimetype="application/json", status=200)
+
+@api.route('/ready')
+class Ready(Resource):
+    @api.response(200, "Ready")
+    @api.response(503, "Starting")
+    def get(self):
+        status = dict(readiness.status(), vectors=len(vector_index))
+        return Response(json_codec.dumpb(status), mimetype="application/json", status=200 if status["ready"] else 503)
 
 @api.route('/reset')
 class SetResponse(Resource):
@@ -407,6 +372,7 @@ class SetResponse(Resource):
     @api.response(400, "Exception occurs")
     def post(self):
         global vectors
+        global current_vector
         global recv_request
         global sent_response
         global resp_wait_time
@@ -415,25 +381,35 @@ class SetResponse(Resource):
         global script_test_vector
         global hold_response
         global inquiry_file
+        global inquiry_file_format
         global valid_request
-        vectors = {}
-        recv_request = {"headers": {}, "body": {}}
-        sent_response = {}
-        resp_wait_time = 0
-        phase = None
-        filename_prefix = "default"
-        script_test_vector = 0
-        hold_response = False
-        valid_request = False
-
-        try:
-            if request.json.get("inquiryFile"):
-                inquiry_file = request.json["inquiryFile"]
-            else:
-                inquiry_file = None
+        with state_lock:
+            vectors = {}
+            current_vector = None
+            recv_request = {"headers": {}, "body": {}}
+            sent_response = {}
+            resp_wait_time = 0
+            phase = None
+            filename_prefix = "default"
+            script_test_vector = 0
+            hold_response = False
+            state_changed.notify_all()
+            valid_request = False
+
+            try:
+                # Write the messages of the previous test case before switching the file
+                inquiry_log.flush(inquiry_file)
+                if request.json.get("inquiryFile"):
+                    inquiry_file = request.json["inquiryFile"]
+                else:
+                    inquiry_file = None
+                file_format = request.json.get("inquiryFileFormat") or "text"
+                if file_format not in inquiry_file_formats:
+                    raise ValueError(f"inquiryFileFormat should be one of {inquiry_file_formats}")
+                inquiry_file_format = file_format
  
-            response = {"message": "Success"}
-            return Response(json.dumps(response), mimetype="application/json", status=200)
-        except Exception as err:
-            response = {"message": f"Exception : {err}"}
-            return Response(json.dumps(response), mimetype="application/json", status=400)
+                response = {"message": "Success"}
+                return Response(json_codec.dumpb(response), mimetype="application/json", status=200)
+            except Exception as err:
+                response = {"message": f"Exception : {err}"}
+                return Response(json_codec.dumpb(response), mimetype="application/json", status=400)
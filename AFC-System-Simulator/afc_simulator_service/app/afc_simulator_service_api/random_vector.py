@@ -0,0 +1,173 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package random_vector.py : Seeded random test vectors of the SAU tests.
+
+The random test vectors of a (country, channel width, seed) are derived from a
+RandomMaskSet: a seeded ranking of the channels of the channel width and the
+seeded maximum PSD of every 20 MHz channel, for the first phase and for the
+difference_last_picks phase. The channels picked for an inquiry are the best
+ranked half of the inquired channels, so the same seed and inquiry always give
+the same test vector, and the test vectors built for an inquiry are kept with
+the mask set. The mask sets of the recent seeds are kept in a RandomMaskPool.
+
+The spectrum masks require numpy, which is imported when the first random test
+vector is built, so the simulator runs without numpy until a test case asks
+for a random test vector.
+"""
+import random
+import threading
+from collections import OrderedDict
+from afc_common.channel_plan import all_cfis, bw_to_op_class, channel_to_freq, get_subchannels
+from afc_common.debug_log import get_logger
+from afc_common.vector_index import TestVector
+
+log = get_logger("random")
+
+
+class RandomVectorUnavailable(Exception):
+    """The random test vectors can't be built, numpy isn't installed"""
+
+
+def new_seed():
+    """Returns a seed for a new random test vector"""
+    return random.randrange(1 << 32)
+
+
+class RandomMaskSet:
+    """Seeded channel ranking and 20 MHz channel PSD of a (country, channel width, seed)"""
+
+    def __init__(self, country_param, channel_width, seed):
+        self.country_param = country_param
+        self.channel_width = channel_width
+        self.seed = seed
+        rng = random.Random(seed)
+
+        cfis = country_param[channel_width]
+        ranks = list(range(len(cfis)))
+        rng.shuffle(ranks)
+        self.rank = dict(zip(cfis, ranks))
+
+        # difference_last_picks: {20 MHz channel: maxPsd}
+        self.psd = {}
+        for difference_last_picks in (False, True):
+            psd_by_chan = {}
+            for ch in all_cfis[20]:
+                if channel_width == 320:
+                    min_psd = rng.uniform(-5, 5) if difference_last_picks else rng.uniform(5, 15)
+                    psd_by_chan[ch] = round(rng.uniform(min_psd, min_psd + 10), 1)
+                else:
+                    psd_by_chan[ch] = round(rng.uniform(country_param["psd_min"], country_param["psd_max"]), 1)
+            self.psd[difference_last_picks] = psd_by_chan
+
+        self._vectors = {}
+        self._lock = threading.Lock()
+
+    def pick(self, req_cfi_bwX, last_picks, difference_last_picks):
+        """Returns the sorted channels picked among the inquired channels req_cfi_bwX
+
+        The first phase picks the best ranked half of the inquired channels, the
+        difference_last_picks phase picks the inquired channels not picked last time.
+        """
+        if len(req_cfi_bwX) < 2:
+            return sorted(req_cfi_bwX)
+        if difference_last_picks:
+            return sorted(set(req_cfi_bwX) - set(last_picks))
+        return sorted(sorted(req_cfi_bwX, key=self.rank.get)[:len(req_cfi_bwX) // 2])
+
+    def vector(self, test_vector, difference_last_picks, picks=None):
+        """Returns the TestVector of the picked channels, of all the channels of the country when picks is None"""
+        key = (test_vector, difference_last_picks, None if picks is None else tuple(picks))
+        with self._lock:
+            vector = self._vectors.get(key)
+            if vector is None:
+                responses = self.__build_responses(test_vector, difference_last_picks, picks)
+                vector = self._vectors[key] = TestVector(None, None, None, {"responses": responses})
+            return vector
+
+    def __build_responses(self, test_vector, difference_last_picks, picks):
+        if picks is None:
+            random_chan_bw20 = self.country_param[20]
+        else:
+            random_chan_bw20 = [ch for cfi in picks for ch in get_subchannels(cfi, self.channel_width)]
+        psd = self.psd[difference_last_picks]
+        psd_by_chan = {ch: psd[ch] for ch in random_chan_bw20}
+        try:
+            from afc_common.spectrum_mask import SpectrumMask
+        except ImportError as err:
+            raise RandomVectorUnavailable(f"numpy is required to generate the randomized test vectors: {err}") from err
+        mask = SpectrumMask(psd_by_chan)
+
+        log.debug("Randomized 20MHz channel mask len(%s) %s", len(psd_by_chan), psd_by_chan)
+
+        # (globalOperatingClass, channelCfi, maxEirp) of each bandwidth
+        chan_masks = [(bw_to_op_class[20], *mask.channel_max_eirp(list(psd_by_chan), 20, limit=None))]
+        for bw in (40, 80, 160, 320):
+            chan_masks.append((bw_to_op_class[bw], *mask.channel_max_eirp(self.country_param[bw], bw)))
+            log.debug("%sMHz CFI mask len(%s) %s", bw, len(chan_masks[-1][1]), dict(zip(chan_masks[-1][1], chan_masks[-1][2])))
+
+        resp = {
+            "response": {
+                "responseCode": 0,
+                "shortDescription": "SUCCESS"
+            }
+        }
+
+        if test_vector == 1 or test_vector == 3:
+            resp["availableFrequencyInfo"] = []
+            for ch, max_psd in psd_by_chan.items():
+                resp["availableFrequencyInfo"].append({
+                    "frequencyRange": {
+                        "highFrequency": channel_to_freq(ch) + 10,
+                        "lowFrequency": channel_to_freq(ch) - 10
+                    },
+                    "maxPsd": max_psd
+                })
+
+        if test_vector == 2 or test_vector == 3:
+            resp["availableChannelInfo"] = []
+            for op_class, channelCfi, maxEirp in chan_masks:
+                resp["availableChannelInfo"].append({
+                                "channelCfi": channelCfi,
+                                "globalOperatingClass": op_class,
+                                "maxEirp": maxEirp
+                            })
+
+        return {"availableSpectrumInquiryResponses": [resp]}
+
+
+class RandomMaskPool:
+    """Mask sets of the most recently used (country, channel width, seed)"""
+
+    def __init__(self, size=16):
+        self.size = size
+        self._mask_sets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, country_param, country_code, channel_width, seed):
+        """Returns the mask set of (country, channel width, seed), generating it when needed"""
+        key = (country_code, channel_width, seed)
+        with self._lock:
+            mask_set = self._mask_sets.get(key)
+            if mask_set is not None:
+                self._mask_sets.move_to_end(key)
+                return mask_set
+        mask_set = RandomMaskSet(country_param[country_code], channel_width, seed)
+        with self._lock:
+            mask_set = self._mask_sets.setdefault(key, mask_set)
+            self._mask_sets.move_to_end(key)
+            while len(self._mask_sets) > self.size:
+                self._mask_sets.popitem(last=False)
+        return mask_set
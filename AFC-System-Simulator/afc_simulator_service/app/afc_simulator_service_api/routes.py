@@ -17,80 +17,70 @@
 
 Contains all the routes that are exposed by the AFC simulator service.
 """
-import json
-import math
 import os
-import copy
+import time
 from datetime import datetime, timedelta
-import random
-from time import sleep
-from flask import request, Response, request_finished
+from flask import request, Response, request_finished, g
 from . import afc_simulator_api_blueprint
 from flask_restplus import Api, Resource, fields
-from commons.logger import Logger
-from commons.shared_enums import (
-    LogCategory,
+from afc_common.vector_index import shared_vector_index
+from afc_common.vector_bundle import parse_vector_filename, read_bundle, vector_key
+from afc_common.response_template import encode_response
+from afc_common.channel_plan import (
+    bw_to_op_class, country_plans, ruleset_to_country,
 )
+from afc_common.channel_coverage import InquiredSpectrum, inquired_cfis
+from afc_common import json_codec
+from afc_common.request_schema import validate_inquiry, location_count, inquired_channels, inquired_frequency_ranges
+from afc_common.inquiry_log import inquiry_log, inquiry_file_formats
+from afc_common import debug_log
+from afc_common.debug_log import get_logger, pretty_json
+from afc_common import metrics
+from afc_common.readiness import readiness
+from afc_common.service_links import service_links
+from afc_common.traffic_recorder import traffic_recorder
+from afc_common.wsgi_server import tls_stats
+from .session import SessionManager
+from .random_vector import RandomMaskPool, RandomVectorUnavailable, new_seed
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+log = get_logger("inquiry")
+control_log = get_logger("control")
+
+http_requests = metrics.registry.counter("afc_http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status"))
+http_request_seconds = metrics.registry.histogram("afc_http_request_duration_seconds", "HTTP request latency by route", ("route",))
+http_requests_in_flight = metrics.registry.gauge("afc_http_requests_in_flight", "HTTP requests being handled")
+inquiry_responses = metrics.registry.counter("afc_inquiry_responses_total", "Available Spectrum Inquiry Responses by responseCode", ("response_code",))
+response_serialization_seconds = metrics.registry.histogram("afc_response_serialization_seconds", "Time to filter and encode an Available Spectrum Inquiry Response")
+inquiry_batch_requests = metrics.registry.histogram("afc_inquiry_batch_requests", "Number of requests of an Available Spectrum Inquiry Request message",
+                                                    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+response_delay_seconds = metrics.registry.histogram("afc_response_delay_seconds", "Time a response is delayed by holdResponse or respWaitTime", ("reason",))
 
 json_dir_path = os.path.abspath("./QuickTrack-Tool/Test-Services/afc_simulator_service/app/test_vectors/")
-vectors = {}
-recv_request = {"headers": {}, "body": {}}
-valid_request = False
-sent_response = {}
-resp_wait_time = 0
-phase = None
-filename_prefix = "default"
-hold_response = False
-script_test_vector = 0
-inquiry_file = None
-random_picks = []
-is_random = False
-difference_last_picks = False
-only_random_power = False
-country_code = 'US'
-channel_width = 80
+vector_index = shared_vector_index(json_dir_path)
+sessions = SessionManager()
+random_masks = RandomMaskPool()
+if os.environ.get("AFC_RECORD_FILE"):
+    traffic_recorder.start(os.environ["AFC_RECORD_FILE"])
+# Routes whose exchanges are recorded, relative to the blueprint prefix
+recorded_routes = ("/availableSpectrumInquiry", "/set-response", "/set-params", "/get-status", "/reset")
+# Channels and PSD range of the random test vectors of each country
 country_param = {
-    'US': { 20: [1, 5, 9, 13, 17, 21, 25, 29, 33, 37, 41, 45, 49, 53, 57, 61, 65, 69, 73, 77, 81, 85, 89, 93, 117, 121, 125, 129, 133, 137, 141, 145, 149, 153, 157, 161, 165, 169, 173, 177, 181],
-            40: [3, 11, 19, 27, 35, 43, 51, 59, 67, 75, 83, 91, 123, 131, 139, 147, 155, 163, 171, 179],
-            80: [7, 23, 39, 55, 71, 87, 135, 151, 167],
-           160: [15, 47, 79, 143],
-           320: [31, 63],
-           "psd_min" : 8,
-           "psd_max" : 22
-          },
-    'CA': { 20: [1, 5, 9, 13, 17, 21, 25, 29, 33, 37, 41, 45, 49, 53, 57, 61, 65, 69, 73, 77, 81, 85, 89, 93, 97, 101, 105, 109, 113, 117, 121, 125, 129, 133, 137, 141, 145, 149, 153, 157, 161, 165, 169, 173, 177, 181],
-            40: [3, 11, 19, 27, 35, 43, 51, 59, 67, 75, 83, 91, 99, 107, 115, 123, 131, 139, 147, 155, 163, 171, 179],
-            80: [7, 23, 39, 55, 71, 87, 103, 119, 135, 151, 167],
-           160: [15, 47, 79, 111, 143],
-           320: [31, 63, 95, 127],
-           "psd_min" : 8,
-           "psd_max" : 22
-          }
-}
-chwdith_to_op_class = {
-    20 : 131,
-    40 : 132,
-    80 : 133,
-   160 : 134,
-   320 : 137
+    country_code: dict(plan.channels, psd_min=8, psd_max=22) for country_code, plan in country_plans.items()
 }
+chwdith_to_op_class = bw_to_op_class
 
 def rulesetId_to_countrycode(rulesetId):
-    map = {
-        'US_47_CFR_PART_15_SUBPART_E':'US',
-        'CA_RES_DBS-06':'CA'
-    }
-    rulesetId = rulesetId.upper()
-    if rulesetId in map:
-        return map[rulesetId]
-    else:
-        return None
+    return ruleset_to_country(rulesetId)
 
-certification = {
-    'US' : 'FCC',
-    'CA' : 'ISED',
-}
+certification = {country_code: plan.certification for country_code, plan in country_plans.items()}
+
+# Threads rendering the requests of a batch when the session sets batchWorkers
+max_batch_workers = 8
+batch_executor = None
+batch_executor_lock = threading.Lock()
 
 api = Api(
     app=afc_simulator_api_blueprint,
@@ -111,18 +101,91 @@ test_case_control = api.model(
         "testVector": fields.Integer(description="Test vector"),
         "phase": fields.Integer(description="Different phase of the same test vector"),
         "respWaitTime": fields.Integer(description="Wait time before sending an Available Spectrum Inquiry Response "),
+        "sessionId": fields.String(description="Test session, the default session when absent"),
+        "serialNumber": fields.String(description="deviceDescriptor serialNumber of the AFC DUT using the test session"),
+        "seed": fields.Integer(description="Seed of the random test vector, a new seed when absent except for difference_last_picks"),
+        "batchWorkers": fields.Integer(description=f"Number of threads (1 to {max_batch_workers}) rendering the responses of the requests of a batch, 1 when absent"),
     },
 )
 
-def is_inquired_freq_range(freq_range, inquired_list):
-    l, h = freq_range
-    for low, high in inquired_list:
-        if l >= low and h <= high:
-            return True
-    return False
+log_levels_control = api.model(
+    "log_levels_control",
+    {
+        "default": fields.String(description="Level of the categories without a level: DEBUG, ERROR or OFF"),
+        "categories": fields.Raw(description="Level of each category, e.g. {\"inquiry\": \"ERROR\"}"),
+    },
+)
 
-def gen_err_resp(req_id, resp_code, short_desc, version, supp_info=None):
-    global sent_response
+recording_control = api.model(
+    "recording_control",
+    {
+        "file": fields.String(description="Recording file the next exchanges are appended to (.jsonl or .jsonl.gz), recording stops when empty"),
+    },
+)
+
+def uploaded_vectors(name):
+    """Returns the [(key, data, source)] test vectors of a /vectors upload
+
+    The body is a compiled bundle (application/octet-stream, the country of the
+    files at its root in the countryCode query parameter) or a JSON object with
+    the test vectors keyed by their testCaseID and by their file name:
+        {"countryCode": "US", "vectors": [{"testCaseID": ..., "responses": ...}],
+         "files": {"default_US.json": {"responses": ...}}}
+    """
+    vectors = []
+    if request.mimetype == "application/octet-stream":
+        country = request.args.get("countryCode")
+        files = [(file, json_codec.loads(content)) for file, content in read_bundle(request.get_data())]
+    else:
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            raise ValueError("the body should be a JSON object or a test vector bundle (application/octet-stream)")
+        country = body.get("countryCode")
+        files = list((body.get("files") or {}).items())
+        for index, data in enumerate(body.get("vectors") or []):
+            key = vector_key(data, country)
+            if key is None:
+                raise ValueError(f"vectors/{index} has no testCaseID unitUnderTest, purpose and testVector")
+            vectors.append((key, data, f"{name}:vectors/{index}"))
+    for file, data in files:
+        dir_name, _, filename = file.rpartition("/")
+        key = parse_vector_filename(filename, dir_name or country)
+        if key is None:
+            raise ValueError(f"{file} doesn't follow the test vector file naming, e.g. AFCD_UAU_1_phase1.json")
+        vectors.append((key, data, f"{name}:{file}"))
+    return vectors
+
+def request_route():
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+@afc_simulator_api_blueprint.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    g.request_start_time = time.time()
+    http_requests_in_flight.inc()
+
+@afc_simulator_api_blueprint.after_request
+def record_request_metrics(response):
+    if "request_start" in g:
+        http_request_seconds.observe(time.perf_counter() - g.request_start, request_route())
+    http_requests.inc(request_route(), request.method, response.status_code)
+    return response
+
+@afc_simulator_api_blueprint.after_request
+def record_exchange(response):
+    path = request.path[len(afc_simulator_api_blueprint.url_prefix):]
+    if traffic_recorder.recording and path in recorded_routes and "request_start" in g:
+        traffic_recorder.record(g.request_start_time, time.perf_counter() - g.request_start, request.method, path,
+                                request.query_string.decode(), dict(request.headers), request.get_data(),
+                                response.status_code, response.get_data())
+    return response
+
+@afc_simulator_api_blueprint.teardown_request
+def end_request_metrics(exc):
+    if g.pop("request_start", None) is not None:
+        http_requests_in_flight.dec()
+
+def error_element(req_id, resp_code, short_desc, supp_info=None):
     response_dict = {
         "requestId": req_id,
         "rulesetId": "",
@@ -134,536 +197,388 @@ def gen_err_resp(req_id, resp_code, short_desc, version, supp_info=None):
 
     if supp_info is not None:
         response_dict["response"]["supplementalInfo"] = supp_info
+    return response_dict
 
-    sent_response = {
-        "availableSpectrumInquiryResponses": [response_dict],
+def gen_err_resp(session, req_id, resp_code, short_desc, version, supp_info=None):
+    session.sent_response = {
+        "availableSpectrumInquiryResponses": [error_element(req_id, resp_code, short_desc, supp_info)],
         "version": version
     }
-    append_to_inquiry_file(sent_response)
-    return sent_response
-
-def append_to_inquiry_file(json_data):
-    if inquiry_file:
-        if not os.path.exists(inquiry_file):
-            open(inquiry_file, 'a').close()
-        border = "###########################"
-        timestamp = "   " + datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ') + "   "
-        with open(inquiry_file, 'a') as f:
-            f.write(border + timestamp + border + '\n' + json.dumps(json_data, indent=4) + '\n\n')
-
-def get_min_maxpsd_by_bw(random_mask, chan, bw):
-    start_ch = chan-(bw/10-2)
-    end_ch = chan+(bw/10-2)
-    psd_list = [value["maxPsd"] for key,value in random_mask.items() if start_ch <= key <= end_ch ]
-    if len(psd_list) == (bw/20):
-        return min(psd_list)
+    append_to_inquiry_file(session, session.sent_response)
+    inquiry_responses.inc(resp_code)
+    return session.sent_response
+
+def append_to_inquiry_file(session, json_data):
+    inquiry_log.append(session.inquiry_file, json_data, session.inquiry_file_format)
+
+def get_random_mask_set(session):
+    return random_masks.get(country_param, session.country_code, session.channel_width, session.seed)
+
+def build_random_vector(session, req_cfi_bwX):
+    mask_set = get_random_mask_set(session)
+    if not session.only_random_power:
+        log.debug("Randomize both channels and power level")
+        session.random_picks = mask_set.pick(req_cfi_bwX, session.random_picks, session.difference_last_picks)
+        log.debug("Country Code %s seed %s Randomized %sMHz channel picks %s", session.country_code, session.seed, session.channel_width, session.random_picks)
+        vector = mask_set.vector(session.script_test_vector, session.difference_last_picks, session.random_picks)
     else:
-        return None
-
-def build_random_vector(req_cfi_bwX):
-    global vectors
-    global script_test_vector
-    global random_picks
-    global difference_last_picks
-    global only_random_power
-    random_mask = {}
-    mask_bw40 = {}
-    mask_bw80 = {}
-    mask_bw160 = {}
-    mask_bw320 = {}
-
-    cfi_bw320 = country_param[country_code][320]
-    cfi_bw160 = country_param[country_code][160]
-    cfi_bw80 = country_param[country_code][80]
-    cfi_bw40 = country_param[country_code][40]
-    chan_bw20 = country_param[country_code][20]
-
-    if not only_random_power:
-        Logger.log(LogCategory.DEBUG, "Randomize both channels and power level")
-        if not difference_last_picks:
-            # num_picks = random.randint(1, len(req_cfi_bwX) -1)  # Randomly choose the number of picks (at least one)
-            if len(req_cfi_bwX) >= 2:
-                num_picks = int(len(req_cfi_bwX)/2)
-                random_picks = random.sample(req_cfi_bwX, num_picks)  # Randomly select the CFIs
-            else:
-                random_picks = req_cfi_bwX
-            random_picks.sort()
-        else:
-            if len(req_cfi_bwX) >= 2:
-                random_picks = list(set(req_cfi_bwX) - set(random_picks))
-            else:
-                random_picks = req_cfi_bwX
-            random_picks.sort()
-
-        Logger.log(LogCategory.DEBUG, f"Country Code {country_code} Randomized {channel_width}MHz channel picks {random_picks}")
-        random_chan_bw20 = []
-        for cfi in random_picks:
-            random_chan_bw20 += list(range(cfi-int(channel_width/10 - 2), cfi+int(channel_width/10 - 2)+1, 4))
+        log.debug("Only randomize power level")
+        vector = mask_set.vector(session.script_test_vector, session.difference_last_picks)
+
+    session.vectors["responses"] = vector.data["responses"]
+    session.current_vector = vector
+
+def pregenerate_random_vectors(session):
+    """Generates the random test vectors of the inquiries of all the channels at /set-response"""
+    mask_set = get_random_mask_set(session)
+    if session.only_random_power:
+        mask_set.vector(session.script_test_vector, session.difference_last_picks)
+        return
+    all_cfi_bwX = country_param[session.country_code][session.channel_width]
+    if session.difference_last_picks:
+        picks = mask_set.pick(all_cfi_bwX, session.random_picks, True)
+        mask_set.vector(session.script_test_vector, True, picks)
     else:
-        Logger.log(LogCategory.DEBUG, "Only randomize power level")
-        random_chan_bw20 = chan_bw20.copy()
-
-    # when random_chan_bw20 is determined, randomize the power level
-    for ch in random_chan_bw20:
-        random_mask[ch] = {}
-        if channel_width == 320:
-            if not difference_last_picks:
-                min_psd = random.uniform(5, 15)
-                random_mask[ch]["maxPsd"] = psd = round(random.uniform(min_psd, min_psd + 10), 1)
-            else:
-                min_psd = random.uniform(-5, 5)
-                random_mask[ch]["maxPsd"] = psd = round(random.uniform(min_psd, min_psd + 10), 1)
-        else:
-            random_mask[ch]["maxPsd"] = psd = round(random.uniform(country_param[country_code]["psd_min"], country_param[country_code]["psd_max"]), 1)
-        random_mask[ch]["maxEirp"] = round(psd + 10 * math.log10(20), 1)
-
-    Logger.log(LogCategory.DEBUG, "")
-    Logger.log(LogCategory.DEBUG, f"Randomized 20MHz channel mask len({len(random_mask)}) {random_mask}")
-
-    # bandwidth 40 MHz
-    bw = 40
-    for ch in cfi_bw40:
-        psd = get_min_maxpsd_by_bw(random_mask, ch, bw)
-        if psd:
-            eirp = round(psd + 10 * math.log10(bw), 1)
-            mask_bw40[ch] = {}
-            mask_bw40[ch]["maxEirp"] = 36.0 if eirp > 36.0 else eirp
-    # bandwidth 80 MHz
-    bw = 80
-    for ch in cfi_bw80:
-        psd = get_min_maxpsd_by_bw(random_mask, ch, bw)
-        if psd:
-            eirp = round(psd + 10 * math.log10(bw), 1)
-            mask_bw80[ch] = {}
-            mask_bw80[ch]["maxEirp"] = 36.0 if eirp > 36.0 else eirp
-    # bandwidth 160 MHz
-    bw = 160
-    for ch in cfi_bw160:
-        psd = get_min_maxpsd_by_bw(random_mask, ch, bw)
-        if psd:
-            eirp = round(psd + 10 * math.log10(bw), 1)
-            mask_bw160[ch] = {}
-            mask_bw160[ch]["maxEirp"] = 36.0 if eirp > 36.0 else eirp
-    # bandwidth 320 MHz
-    bw = 320
-    for ch in cfi_bw320:
-        psd = get_min_maxpsd_by_bw(random_mask, ch, bw)
-        if psd:
-            eirp = round(psd + 10 * math.log10(bw), 1)
-            mask_bw320[ch] = {}
-            mask_bw320[ch]["maxEirp"] = 36.0 if eirp > 36.0 else eirp
-
-    Logger.log(LogCategory.DEBUG, "")
-    Logger.log(LogCategory.DEBUG, f"40MHz CFI mask len({len(mask_bw40)}) {mask_bw40}")
-    Logger.log(LogCategory.DEBUG, "")
-    Logger.log(LogCategory.DEBUG, f"80MHz CFI mask len({len(mask_bw80)}) {mask_bw80}")
-    Logger.log(LogCategory.DEBUG, "")
-    Logger.log(LogCategory.DEBUG, f"160MHz CFI mask len({len(mask_bw160)}) {mask_bw160}")
-
-    vectors["responses"] = {}
-    vectors["responses"]["availableSpectrumInquiryResponses"] = []
-    resp = {
-        "response": {
-            "responseCode": 0,
-            "shortDescription": "SUCCESS"
-        }
-    }
+        picks = mask_set.pick(all_cfi_bwX, [], False)
+        mask_set.vector(session.script_test_vector, False, picks)
+        # The next phase picks the other channels
+        mask_set.vector(session.script_test_vector, True, mask_set.pick(all_cfi_bwX, picks, True))
 
-    if script_test_vector == 1 or script_test_vector == 3:
-        resp["availableFrequencyInfo"] = []
-        for ch, value in random_mask.items():
-            resp["availableFrequencyInfo"].append({
-                "frequencyRange": {
-                    "highFrequency": 5950 + (ch*5) + 10,
-                    "lowFrequency": 5950 + (ch*5) - 10
-                },
-                "maxPsd": value["maxPsd"]
-            })
-
-    if script_test_vector == 2 or script_test_vector == 3:
-        resp["availableChannelInfo"] = []
-        # bandwidth 20 MHz
-        channelCfi = []
-        maxEirp = []         
-        for ch, value in random_mask.items():
-            channelCfi.append(ch)
-            maxEirp.append(value["maxEirp"])
-        resp["availableChannelInfo"].append({
-                        "channelCfi": channelCfi,
-                        "globalOperatingClass": 131,
-                        "maxEirp": maxEirp
-                    })
-        # bandwidth 40 MHz
-        channelCfi = []
-        maxEirp = []         
-        for ch, value in mask_bw40.items():
-            channelCfi.append(ch)
-            maxEirp.append(value["maxEirp"])
-        resp["availableChannelInfo"].append({
-                        "channelCfi": channelCfi,
-                        "globalOperatingClass": 132,
-                        "maxEirp": maxEirp
-                    })
-        # bandwidth 80 MHz
-        channelCfi = []
-        maxEirp = []         
-        for ch, value in mask_bw80.items():
-            channelCfi.append(ch)
-            maxEirp.append(value["maxEirp"])
-        resp["availableChannelInfo"].append({
-                        "channelCfi": channelCfi,
-                        "globalOperatingClass": 133,
-                        "maxEirp": maxEirp
-                    })
-        # bandwidth 160 MHz
-        channelCfi = []
-        maxEirp = []
-        for ch, value in mask_bw160.items():
-            channelCfi.append(ch)
-            maxEirp.append(value["maxEirp"])
-        resp["availableChannelInfo"].append({
-                        "channelCfi": channelCfi,
-                        "globalOperatingClass": 134,
-                        "maxEirp": maxEirp
-                    })
-        # bandwidth 320 MHz
-        channelCfi = []
-        maxEirp = []
-        for ch, value in mask_bw320.items():
-            channelCfi.append(ch)
-            maxEirp.append(value["maxEirp"])
-        resp["availableChannelInfo"].append({
-                        "channelCfi": channelCfi,
-                        "globalOperatingClass": 137,
-                        "maxEirp": maxEirp
-                    })
-
-    vectors["responses"]["availableSpectrumInquiryResponses"].append(resp)
-
-def get_cfi_by_inquired_channels_bw(channels, bw):
+def get_cfi_by_inquired_channels_bw(country_code, channels, bw):
     for chan in channels:
         if chan["globalOperatingClass"] == chwdith_to_op_class[bw]:
             cfi_chans = chan.get("channelCfi", country_param[country_code][bw])
-            return list(set(cfi_chans) & set(country_param[country_code][bw]))
+            return inquired_cfis(country_code, cfi_chans, bw)
 
     return []
 
-def convert_to_ch(freq):
-    return int((freq - 5950) / 5)
-
-def get_cfi_by_inquired_freq_ranges_bw(freq_ranges, bw):
-    req_cfi_bw20 = []
-    req_cfi_bwX = []
-    for freq in freq_ranges:
-        for ch in range(convert_to_ch(freq["lowFrequency"]), convert_to_ch(freq["highFrequency"]) + 1):
-            if ch % 4 == 1:
-                req_cfi_bw20.append(ch)
-
-    for cfi in country_param[country_code][bw]:
-        bwX_ch_set = set()
-        for i in range(cfi-(int(bw/10)-2), cfi+(int(bw/10)-2)+1, 4):
-            bwX_ch_set.add(i)
-        if bwX_ch_set.issubset(set(req_cfi_bw20)):
-            req_cfi_bwX.append(cfi)
-
-    Logger.log(LogCategory.DEBUG,f'Country Code {country_code} req_cfi_bw20 {req_cfi_bw20} req_cfi_bwX({bw}MHz) {req_cfi_bwX}')
+def get_cfi_by_inquired_freq_ranges_bw(country_code, freq_ranges, bw):
+    spectrum = InquiredSpectrum(freq_ranges)
+    req_cfi_bwX = spectrum.covered_cfis(country_param[country_code][bw], bw)
+
+    log.debug('Country Code %s req_cfi_bw20 %s req_cfi_bwX(%sMHz) %s', country_code, spectrum.channels(), bw, req_cfi_bwX)
     return req_cfi_bwX
 
 
+class Inquiry:
+    """An AvailableSpectrumInquiryRequest of the received message and its response"""
+
+    def __init__(self, req):
+        self.req = req
+        self.req_id = req.get("requestId", 0) if isinstance(req, dict) else 0
+        self.ruleset_id = None
+        self.oper_class_dict = {}
+        self.freq_range_list = []
+        self.vector = None
+        # (responseCode, shortDescription, supplementalInfo) of a failed request
+        self.error = None
+        # Encoded availableSpectrumInquiryResponses items of the request
+        self.element = None
+        self.response_code = None
+
+    def fail(self, resp_code, short_desc, supp_info=None):
+        self.error = (resp_code, short_desc, supp_info)
+
+def check_inquiry(session, inquiry, validation_error):
+    """Checks a request of the received message and selects its test vector, sets inquiry.error when it fails"""
+    has_channel = False
+    has_freq_range = False
+    req_id = inquiry.req_id
+
+    try:
+        if validation_error is not None:
+            resp_code, short_desc, supp_info = validation_error
+            log.error('%s %s in received Available Spectrum Request %s', short_desc, supp_info or "", req_id)
+            return inquiry.fail(resp_code, short_desc, supp_info)
+
+        req = inquiry.req
+        log.debug("requestId %s", req_id)
+        dev_desc = req['deviceDescriptor']
+        log.debug("serialNumber %s", dev_desc['serialNumber'])
+
+        for certId in dev_desc['certificationId']:
+            rulesetId = certId['rulesetId']
+            log.debug("certificationId - rulesetId %s id %s", rulesetId, certId['id'])
+            if rulesetId_to_countrycode(rulesetId) == session.country_code:
+                inquiry.ruleset_id = inquiry.ruleset_id or rulesetId
+            else:
+                err_str = f"invalid rulesetId {rulesetId} for {certification[session.country_code]} AFC DUT test"
+                log.error(err_str)
+                return inquiry.fail(-1, err_str)
+        if inquiry.ruleset_id is None:
+            log.error('No certificationId in received Available Spectrum Request %s', req_id)
+            return inquiry.fail(-1, "General Failure")
+
+        valid_location_num = location_count(req)
+        if valid_location_num != 1:
+            log.error('Invalid location object number %s', valid_location_num)
+            return inquiry.fail(-1, "General Failure")
+
+        field = "inquiredChannels"
+        req_cfi_bwX = []
+        if field in req:
+            inquiry.oper_class_dict = inquired_channels(req)
+            log.debug('Inquired globalOperatingClass list %s', inquiry.oper_class_dict)
+            if len(inquiry.oper_class_dict) > 0:
+                has_channel = True
+                if session.channel_width == 320:
+                    req_cfi_bwX_by_chan = get_cfi_by_inquired_channels_bw(session.country_code, req[field], 320)
+                elif session.channel_width == 160:
+                    req_cfi_bwX_by_chan = get_cfi_by_inquired_channels_bw(session.country_code, req[field], 160)
+                else:
+                    req_cfi_bwX_by_chan = get_cfi_by_inquired_channels_bw(session.country_code, req[field], 80)
+
+                if not req_cfi_bwX:
+                    req_cfi_bwX = req_cfi_bwX_by_chan
+
+        field = "inquiredFrequencyRange"
+        if field in req:
+            inquiry.freq_range_list = inquired_frequency_ranges(req)
+            log.debug('Inquired FrequencyRange list %s', inquiry.freq_range_list)
+            if len(inquiry.freq_range_list) > 0:
+                has_freq_range = True
+                if session.channel_width == 320:
+                    req_cfi_bwX_by_freq = get_cfi_by_inquired_freq_ranges_bw(session.country_code, req[field], 320)
+                elif session.channel_width == 160:
+                    req_cfi_bwX_by_freq = get_cfi_by_inquired_freq_ranges_bw(session.country_code, req[field], 160)
+                else:
+                    req_cfi_bwX_by_freq = get_cfi_by_inquired_freq_ranges_bw(session.country_code, req[field], 80)
+
+                if not req_cfi_bwX or len(req_cfi_bwX_by_freq) < len(req_cfi_bwX):
+                    req_cfi_bwX = req_cfi_bwX_by_freq
+
+    except KeyError as err:
+        log.error('Missing field %s in received Available Spectrum Request', err)
+        return inquiry.fail(102, "Missing Param.", {"missingParams": [str(err)]})
+
+    except Exception as err:
+        exception_str = traceback.format_exc()
+        log.error('Response Exception\n %s', exception_str)
+        return inquiry.fail(-1, "General Failure")
+
+    if (session.script_test_vector == 1 or session.script_test_vector == 3):
+        if not has_freq_range:
+            missing_field = "inquiredFrequencyRange"
+            log.error('Missing field %s in received Available Spectrum Request', missing_field)
+            return inquiry.fail(102, "Missing Param.", {"missingParams": [missing_field]})
+        elif session.is_random:
+            if len(req_cfi_bwX_by_freq) < 2 and (session.channel_width != 320):
+                err_msg = f'For testing purpose, frequencyRange should have at least two {session.channel_width}MHz channels. The inquired frequency ranges including {session.channel_width}MHz channels is {req_cfi_bwX_by_freq}'
+                log.error(err_msg)
+                return inquiry.fail(-1, err_msg)
+            elif len(req_cfi_bwX_by_freq) < 1 and (session.channel_width == 320):
+                err_msg = f'For testing purpose, frequencyRange should have at least one {session.channel_width}MHz channels. The inquired frequency ranges including {session.channel_width}MHz channels is {req_cfi_bwX_by_freq}'
+                log.error(err_msg)
+                return inquiry.fail(-1, err_msg)
+
+    if (session.script_test_vector == 2 or session.script_test_vector == 3):
+        if not has_channel:
+            missing_field = "inquiredChannels"
+            log.error('Missing field %s in received Available Spectrum Request', missing_field)
+            return inquiry.fail(102, "Missing Param.", {"missingParams": [missing_field]})
+        elif session.is_random:
+            if len(req_cfi_bwX_by_chan) < 2 and (session.channel_width != 320):
+                err_msg = f'For testing purpose, global operating class {chwdith_to_op_class[session.channel_width]} should have at least two {session.channel_width}MHz channels. The inquired {session.channel_width}MHz channels is {req_cfi_bwX_by_chan}'
+                log.error(err_msg)
+                return inquiry.fail(-1, err_msg)
+            elif len(req_cfi_bwX_by_chan) < 1 and (session.channel_width == 320):
+                err_msg = f'For testing purpose, global operating class {chwdith_to_op_class[session.channel_width]} should have at least one {session.channel_width}MHz channels. The inquired {session.channel_width}MHz channels is {req_cfi_bwX_by_chan}'
+                log.error(err_msg)
+                return inquiry.fail(-1, err_msg)
+
+    # The random test vector is built for the first valid request, the next ones get the same channels
+    if session.is_random and "responses" not in session.vectors:
+        try:
+            build_random_vector(session, req_cfi_bwX)
+        except RandomVectorUnavailable as err:
+            log.error(str(err))
+            return inquiry.fail(-1, "General Failure")
+
+    if not session.is_random:
+        vec = None
+        if session.script_test_vector:
+            vec = f"{session.script_test_vector}"
+        elif has_freq_range and has_channel:
+            vec = "3"
+        elif has_channel:
+            vec = "2"
+        elif has_freq_range:
+            vec = "1"
+
+        log.debug('test vector %s filename_prefix %s', vec, session.filename_prefix)
+        if vec:
+            if session.filename_prefix == "default":
+                test_vector = vector_index.get(session.country_code, session.filename_prefix)
+            else:
+                test_vector = vector_index.get(session.country_code, session.filename_prefix, int(vec), session.phase)
+            if test_vector:
+                log.debug('test vector file path: %s', test_vector.path)
+                session.current_vector = test_vector
+                session.vectors = test_vector.data
+            else:
+                log.error("test vector %s %s phase %s of %s is not found", session.filename_prefix, vec, session.phase, session.country_code)
+                return inquiry.fail(-1, "General Failure")
+
+    if not session.vectors or session.current_vector is None:
+        log.error("test vector is not found")
+        return inquiry.fail(-1, "General Failure")
+    inquiry.vector = session.current_vector
+
+def render_inquiry(inquiry, version, expire_time):
+    """Encodes the response items of a checked request, sets inquiry.error when it fails"""
+    try:
+        start = time.perf_counter()
+        responses = inquiry.vector.data["responses"]
+        resp = responses["availableSpectrumInquiryResponses"][0]
+        filtered = inquiry.vector.response_filter.overlay(inquiry.oper_class_dict, inquiry.freq_range_list)
+        if filtered:
+            # The inquiry filters the test vector content, encode a shallow copy of the response
+            resp = dict(resp, **filtered)
+            resp["requestId"] = inquiry.req_id
+            resp["availabilityExpireTime"] = expire_time
+            resp["rulesetId"] = inquiry.ruleset_id
+            inquiry.element = json_codec.item_separator.join(json_codec.dumpb(item) for item in [resp] + responses["availableSpectrumInquiryResponses"][1:])
+        else:
+            inquiry.element = inquiry.vector.template.render_element(inquiry.req_id, expire_time, inquiry.ruleset_id)
+        inquiry.response_code = resp.get("response", {}).get("responseCode")
+        response_serialization_seconds.observe(time.perf_counter() - start)
+    except Exception as err:
+        exception_str = traceback.format_exc()
+        log.error('Response Exception\n %s', exception_str)
+        inquiry.fail(-1, "General Failure")
+
+def get_batch_executor():
+    """Returns the thread pool rendering the requests of a batch in parallel"""
+    global batch_executor
+    with batch_executor_lock:
+        if batch_executor is None:
+            batch_executor = ThreadPoolExecutor(max_batch_workers, thread_name_prefix="inquiry-batch")
+        return batch_executor
+
+def select_inquiry_session():
+    """Returns the session of an Available Spectrum Inquiry Request
+
+    The session is selected by the sessionId query parameter, else by the
+    deviceDescriptor serialNumber bound to a session, else the default session.
+    """
+    session_id = request.args.get("sessionId")
+    if session_id:
+        return sessions.get(session_id)
+    body = request.get_json(silent=True)
+    try:
+        serial_number = body["availableSpectrumInquiryRequests"][0]["deviceDescriptor"]["serialNumber"]
+    except (KeyError, IndexError, TypeError):
+        serial_number = None
+    return sessions.find_by_serial_number(serial_number) or sessions.get()
+
+
 # API for DUT
 @api.route('/availableSpectrumInquiry')
 class AvailableSpectrum(Resource):
     @api.response(200, "Success")
     @api.response(400, "Bad Request")
     def post(self):
-        global vectors
-        global recv_request
-        global sent_response
-        global resp_wait_time
-        global phase
-        global filename_prefix
-        global hold_response
-        global valid_request
-        has_channel = False
-        has_freq_range = False
-        valid_location_num = 0
+        session = select_inquiry_session()
+        with session.lock:
+            return self.__handle_inquiry(session)
 
+    def __handle_inquiry(self, session):
         try:
             # Handling request
             # --- Prepare general failure respose ---
             version = ""
             req_id = 0
 
-            recv_request["headers"] = {k:v for k, v in request.headers.items()}
+            session.recv_request["headers"] = {k:v for k, v in request.headers.items()}
             content_type = request.headers.get('Content-Type')
             
             if (content_type == 'application/json'):
-                recv_request["body"] = request.json
-                append_to_inquiry_file(recv_request)
+                session.recv_request["body"] = request.json
+                append_to_inquiry_file(session, session.recv_request)
             else:
-                recv_request["body"] = {}
-                append_to_inquiry_file(recv_request)
-                return Response(json.dumps({"message": f"Content-Type {content_type} not supported! Please use application/json."}), mimetype="application/json", status=400)
+                session.recv_request["body"] = {}
+                append_to_inquiry_file(session, session.recv_request)
+                return Response(json_codec.dumpb({"message": f"Content-Type {content_type} not supported! Please use application/json."}), mimetype="application/json", status=400)
 
-            Logger.log(LogCategory.DEBUG, f"Received request {json.dumps(recv_request, indent=4)}")
+            # Snapshot of the request, the headers and body are replaced by the next request
+            log.debug("Received request %s", pretty_json(dict(session.recv_request)))
 
-            version = recv_request["body"]['version']
-            req = recv_request["body"]['availableSpectrumInquiryRequests'][0]
-            req_id = req["requestId"]
+            validation = validate_inquiry(session.recv_request["body"])
+            version = validation.version
+            req_id = validation.request_id
             # --- ---
 
-            if filename_prefix == "":
-                Logger.log(LogCategory.ERROR, f'test vector is not configured')
-                return Response(json.dumps(gen_err_resp(req_id, -1, "General Failure", version)),
-                                mimetype="application/json", status=200)
-
-            Logger.log(LogCategory.DEBUG, f"version {version} requestId {req_id}")
-            dev_desc = req['deviceDescriptor']
-            Logger.log(LogCategory.DEBUG, f"serialNumber {dev_desc['serialNumber']}")
-
-            if not isinstance(dev_desc['certificationId'], list):                        
-                Logger.log(LogCategory.ERROR, f'invalidParams certificationId: DATA TYPE should be array of object CertificationId')
-                return Response(json.dumps(gen_err_resp(req_id, 103, "One or more fields have an invalid value.", version, {"invalidParams": ["certificationId"]})),
+            if session.filename_prefix == "":
+                log.error('test vector is not configured')
+                return Response(json_codec.dumpb(gen_err_resp(session, req_id, -1, "General Failure", version)),
                                 mimetype="application/json", status=200)
 
-            ruleset_ids = []
-            if version == "1.4":
-                for certId in dev_desc['certificationId']:
-                    rulesetId = certId['rulesetId']
-                    Logger.log(LogCategory.DEBUG, f"certificationId - rulesetId {rulesetId} id {certId['id']}")
-                    if isinstance(rulesetId, str):
-                        if rulesetId_to_countrycode(rulesetId) == country_code:
-                            ruleset_ids.append(rulesetId)
-                        else:
-                            err_str = f"invalid rulesetId {rulesetId} for {certification[country_code]} AFC DUT test"
-                            Logger.log(LogCategory.ERROR, err_str)
-                            return Response(json.dumps(gen_err_resp(req_id, -1, err_str, version)),
+            error = validation.message_error()
+            if error is not None:
+                resp_code, short_desc, supp_info = error
+                log.error('%s %s in received Available Spectrum Request', short_desc, supp_info or "")
+                return Response(json_codec.dumpb(gen_err_resp(session, req_id, resp_code, short_desc, version, supp_info)),
                                 mimetype="application/json", status=200)
-                    else:
-                        Logger.log(LogCategory.ERROR, f'invalidParams rulesetId: DATA TYPE should be string')
-                        return Response(json.dumps(gen_err_resp(req_id, 103, "One or more fields have an invalid value.", version, {"invalidParams": ["rulesetId"]})),
-                                        mimetype="application/json", status=200)
-
-            else:
-                return Response(json.dumps(gen_err_resp(req_id, 100, "version not supported", version)),
-                                mimetype="application/json", status=200)
-                # for certId in dev_desc['certificationId']:
-                #     Logger.log(LogCategory.DEBUG, f"certificationId - nra {certId['nra']} id {certId['id']}")
-                # ruleset_ids = dev_desc['rulesetIds']
-                # Logger.log(LogCategory.DEBUG, f"rulesetIds {ruleset_ids}")
-                # if not isinstance(ruleset_ids, list):                        
-                #     Logger.log(LogCategory.ERROR, f'invalidParams rulesetIds: DATA TYPE should be array of string')
-                #     return Response(json.dumps(gen_err_resp(req_id, 103, "One or more fields have an invalid value.", version, {"invalidParams": ["rulesetIds"]})),
-                #                 mimetype="application/json", status=200)
-
-            if "location" in req:
-                if 'ellipse' in req['location']:
-                    valid_location_num += 1
-                    center = req['location']['ellipse']['center']
-                    Logger.log(LogCategory.DEBUG, f"center {center['latitude']} {center['longitude']}")
-                if 'linearPolygon' in req['location']:
-                    valid_location_num += 1
-                    Logger.log(LogCategory.DEBUG, f"linearPolygon outerBoundary {req['location']['linearPolygon']['outerBoundary']}")
-                if 'radialPolygon' in req['location']:
-                    valid_location_num += 1
-                    center = req['location']['radialPolygon']['center']
-                    Logger.log(LogCategory.DEBUG, f"center {center['latitude']} {center['longitude']}")
-                    Logger.log(LogCategory.DEBUG, f"radialPolygon outerBoundary {req['location']['radialPolygon']['outerBoundary']}")
-
-            if valid_location_num != 1:
-                Logger.log(LogCategory.ERROR, f'Invalid location object number {valid_location_num}')
-                return Response(json.dumps(gen_err_resp(req_id, -1, "General Failure", version)),
-                                mimetype="application/json", status=200)
-
-            field = "inquiredChannels"
-            oper_class_dict = {}
-            req_cfi_bwX = []
-            if field in req:
-                oper_class_dict = {item["globalOperatingClass"]: item["channelCfi"] if "channelCfi" in item else None for item in req[field]}
-                Logger.log(LogCategory.DEBUG, f'Inquired globalOperatingClass list {oper_class_dict}')
-                if len(oper_class_dict) > 0:
-                    has_channel = True
-                    if channel_width == 320:
-                        req_cfi_bwX_by_chan = get_cfi_by_inquired_channels_bw(req[field], 320)
-                    elif channel_width == 160:
-                        req_cfi_bwX_by_chan = get_cfi_by_inquired_channels_bw(req[field], 160)
-                    else:
-                        req_cfi_bwX_by_chan = get_cfi_by_inquired_channels_bw(req[field], 80)
-
-                    if not req_cfi_bwX:
-                        req_cfi_bwX = req_cfi_bwX_by_chan
-
-            field = "inquiredFrequencyRange"
-            freq_range_list = []
-            if field in req:
-                freq_range_list = [(item["lowFrequency"], item["highFrequency"]) for item in req[field]]
-                Logger.log(LogCategory.DEBUG, f'Inquired FrequencyRange list {freq_range_list}')
-                if len(freq_range_list) > 0:
-                    has_freq_range = True
-                    if channel_width == 320:
-                        req_cfi_bwX_by_freq = get_cfi_by_inquired_freq_ranges_bw(req[field], 320)
-                    elif channel_width == 160:
-                        req_cfi_bwX_by_freq = get_cfi_by_inquired_freq_ranges_bw(req[field], 160)
-                    else:
-                        req_cfi_bwX_by_freq = get_cfi_by_inquired_freq_ranges_bw(req[field], 80)
 
-                    if not req_cfi_bwX or len(req_cfi_bwX_by_freq) < len(req_cfi_bwX):
-                        req_cfi_bwX = req_cfi_bwX_by_freq
-
-        except KeyError as err:
-            Logger.log(LogCategory.ERROR, f'Missing field {err} in received Available Spectrum Request')
-            return Response(json.dumps(gen_err_resp(req_id, 102, "Missing Param.", version,
-                                                    {"missingParams": [str(err)]})),
-                            mimetype="application/json", status=200)
+            log.debug("version %s %s request(s)", version, len(validation.requests))
+            inquiry_batch_requests.observe(len(validation.requests))
+            inquiries = []
+            for index, req in enumerate(validation.requests):
+                inquiry = Inquiry(req)
+                check_inquiry(session, inquiry, validation.error(index))
+                inquiries.append(inquiry)
 
         except Exception as err:
             exception_str = traceback.format_exc()
-            Logger.log(LogCategory.ERROR, f'Response Exception\n {exception_str}')
-            return Response(json.dumps(gen_err_resp(req_id, -1, "General Failure", version)),
+            log.error('Response Exception\n %s', exception_str)
+            return Response(json_codec.dumpb(gen_err_resp(session, req_id, -1, "General Failure", version)),
                                 mimetype="application/json", status=200)
 
-        if (script_test_vector == 1 or script_test_vector == 3):
-            if not has_freq_range:
-                missing_field = "inquiredFrequencyRange"
-                Logger.log(LogCategory.ERROR, f'Missing field {missing_field} in received Available Spectrum Request')
-                return Response(json.dumps(gen_err_resp(req_id, 102, "Missing Param.", version,
-                                                        {"missingParams": [missing_field]})),
-                                mimetype="application/json", status=200)
-            elif is_random:
-                if len(req_cfi_bwX_by_freq) < 2 and (channel_width != 320):
-                    err_msg = f'For testing purpose, frequencyRange should have at least two {channel_width}MHz channels. The inquired frequency ranges including {channel_width}MHz channels is {req_cfi_bwX_by_freq}'
-                    Logger.log(LogCategory.ERROR, err_msg)
-                    return Response(json.dumps(gen_err_resp(req_id, -1, err_msg, version)),
-                                        mimetype="application/json", status=200)
-                elif len(req_cfi_bwX_by_freq) < 1 and (channel_width == 320):
-                    err_msg = f'For testing purpose, frequencyRange should have at least one {channel_width}MHz channels. The inquired frequency ranges including {channel_width}MHz channels is {req_cfi_bwX_by_freq}'
-                    Logger.log(LogCategory.ERROR, err_msg)
-                    return Response(json.dumps(gen_err_resp(req_id, -1, err_msg, version)),
-                                        mimetype="application/json", status=200)
-
-        if (script_test_vector == 2 or script_test_vector == 3):
-            if not has_channel:
-                missing_field = "inquiredChannels"
-                Logger.log(LogCategory.ERROR, f'Missing field {missing_field} in received Available Spectrum Request')
-                return Response(json.dumps(gen_err_resp(req_id, 102, "Missing Param.", version,
-                                                        {"missingParams": [missing_field]})),
-                                mimetype="application/json", status=200)
-            elif is_random:
-                if len(req_cfi_bwX_by_chan) < 2 and (channel_width != 320):
-                    err_msg = f'For testing purpose, global operating class {chwdith_to_op_class[channel_width]} should have at least two {channel_width}MHz channels. The inquired {channel_width}MHz channels is {req_cfi_bwX_by_chan}'
-                    Logger.log(LogCategory.ERROR, err_msg)
-                    return Response(json.dumps(gen_err_resp(req_id, -1, err_msg, version)),
-                                        mimetype="application/json", status=200)
-                elif len(req_cfi_bwX_by_chan) < 1 and (channel_width == 320):
-                    err_msg = f'For testing purpose, global operating class {chwdith_to_op_class[channel_width]} should have at least one {channel_width}MHz channels. The inquired {channel_width}MHz channels is {req_cfi_bwX_by_chan}'
-                    Logger.log(LogCategory.ERROR, err_msg)
-                    return Response(json.dumps(gen_err_resp(req_id, -1, err_msg, version)),
-                                        mimetype="application/json", status=200)
-
-        if is_random and "responses" not in vectors:
-            build_random_vector(req_cfi_bwX)
-
-        valid_request = True
-
-        if not is_random:
-            vec = None
-            if script_test_vector:
-                vec = f"{script_test_vector}"
-            elif has_freq_range and has_channel:
-                vec = "3"
-            elif has_channel:
-                vec = "2"
-            elif has_freq_range:
-                vec = "1"
-
-            Logger.log(LogCategory.DEBUG, f'test vector {vec} filename_prefix {filename_prefix}')
-            if vec:
-                if filename_prefix == "default":
-                    filename = filename_prefix + ".json"
-                elif phase:
-                    filename = f"{filename_prefix}_{vec}_phase{phase}.json"
-                else:
-                    filename = f"{filename_prefix}_{vec}.json"
-                test_case_file = os.path.join(json_dir_path, country_code, filename)
-                Logger.log(LogCategory.DEBUG, f'test vector file path: {test_case_file}')
-                if os.path.exists(test_case_file):
-                    with open(test_case_file, "r") as f:
-                        vectors = json.load(f)
-                else:
-                    Logger.log(LogCategory.ERROR, f"test vector {filename} is not found")
-                    return Response(json.dumps(gen_err_resp(req_id, -1, "General Failure", version)),
-                                    mimetype="application/json", status=200)
-
-        # Handling response
-        if hold_response:
-            Logger.log(LogCategory.DEBUG, "*" * 49)
-            Logger.log(LogCategory.DEBUG, f"*  Hold an Available Spectrum Inquiry Response  *")
-            Logger.log(LogCategory.DEBUG, "*" * 49)
-            while hold_response:                    
-                sleep(1)
-        if resp_wait_time > 0:
-            Logger.log(LogCategory.DEBUG, "*" * 80)
-            Logger.log(LogCategory.DEBUG, f"*  Waits for {resp_wait_time} seconds before sending an Available Spectrum Inquiry Response  *")
-            Logger.log(LogCategory.DEBUG, "*" * 80)
-            sleep(resp_wait_time)
-        try:
-            if vectors:
-                sent_response = copy.deepcopy(vectors["responses"])
-                sent_response["version"] = version
-                resp = sent_response["availableSpectrumInquiryResponses"][0]
-                resp["requestId"] = req_id
-                resp["availabilityExpireTime"] = (datetime.utcnow() + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%SZ')
-                resp["rulesetId"] = ruleset_ids[0]
-
-                field = "availableChannelInfo"
-                if field in resp:
-                    chan_info = resp[field]
-                    resp[field] = []
-                    for item in chan_info:
-                        if item["globalOperatingClass"] in oper_class_dict:
-                            resp_chans_list = item["channelCfi"]
-                            resp_chans_set = set(resp_chans_list)
-                            req_chans_list = oper_class_dict[item["globalOperatingClass"]]
-                            if req_chans_list:
-                                req_chans_set = set(req_chans_list)
-                                if req_chans_set & resp_chans_set:
-                                    overlay_chans = []
-                                    overlay_maxeirp = []
-                                    for idx, chan in enumerate(resp_chans_list):
-                                        if chan in req_chans_set:
-                                            overlay_chans.append(chan)
-                                            overlay_maxeirp.append(item["maxEirp"][idx])
-                                    item["channelCfi"] = overlay_chans
-                                    item["maxEirp"] = overlay_maxeirp
-                                    resp[field].append(item)
-                            else:
-                                resp[field].append(item)
-
-                field = "availableFrequencyInfo"
-                if field in resp:
-                    freq_info = resp[field]
-                    resp[field] = []
-                    for item in freq_info:
-                        freq_range = item["frequencyRange"]
-                        if is_inquired_freq_range((freq_range["lowFrequency"], freq_range["highFrequency"]) , freq_range_list):
-                            resp[field].append(item)
-                
-                Logger.log(LogCategory.DEBUG, "*" * 52)
-                Logger.log(LogCategory.DEBUG, "*" + " "*50 + "*")
-                Logger.log(LogCategory.DEBUG, f"*  Sending an Available Spectrum Inquiry Response  *")
-                Logger.log(LogCategory.DEBUG, "*" + " "*50 + "*")
-                Logger.log(LogCategory.DEBUG, "*" * 52)
-                append_to_inquiry_file(sent_response)
-                return Response(json.dumps(sent_response), mimetype="application/json", status=200)
+        valid_inquiries = [inquiry for inquiry in inquiries if inquiry.error is None]
+        if valid_inquiries:
+            session.valid_request = True
+            # Handling response
+            if session.hold_response:
+                log.debug("Hold an Available Spectrum Inquiry Response")
+                held_time = session.wait_hold_released()
+                response_delay_seconds.observe(held_time, "holdResponse")
+                log.debug("Released the held response after %.3f seconds", held_time)
+            if session.resp_wait_time > 0:
+                log.debug("Waits for %s seconds before sending an Available Spectrum Inquiry Response", session.resp_wait_time)
+                start = time.perf_counter()
+                session.sleep(session.resp_wait_time)
+                response_delay_seconds.observe(time.perf_counter() - start, "respWaitTime")
+
+            expire_time = (datetime.utcnow() + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%SZ')
+            workers = min(session.batch_workers, len(valid_inquiries))
+            if workers > 1:
+                # Each worker renders every workers-th inquiry, the inquiries are independent
+                list(get_batch_executor().map(
+                    lambda worker: [render_inquiry(inquiry, version, expire_time) for inquiry in valid_inquiries[worker::workers]],
+                    range(workers)))
             else:
-                Logger.log(LogCategory.ERROR, f"test vector is not found")
-                return Response(json.dumps(gen_err_resp(req_id, -1, "General Failure", version)),
-                                mimetype="application/json", status=200)
-        except Exception as err:
-            exception_str = traceback.format_exc()
-            Logger.log(LogCategory.ERROR, f'Response Exception\n {exception_str}')
-            return Response(json.dumps(gen_err_resp(req_id, -1, "General Failure", version)),
-                            mimetype="application/json", status=200)
+                for inquiry in valid_inquiries:
+                    render_inquiry(inquiry, version, expire_time)
+
+        elements = []
+        template = None
+        for inquiry in inquiries:
+            if inquiry.error is not None:
+                resp_code, short_desc, supp_info = inquiry.error
+                elements.append(json_codec.dumpb(error_element(inquiry.req_id, resp_code, short_desc, supp_info)))
+                inquiry_responses.inc(resp_code)
+            else:
+                elements.append(inquiry.element)
+                inquiry_responses.inc(inquiry.response_code)
+                template = template or inquiry.vector.template
+        if template is not None:
+            session.sent_response = template.encode(elements, version)
+        else:
+            session.sent_response = encode_response(elements, version)
+
+        log.debug("Sending an Available Spectrum Inquiry Response")
+        append_to_inquiry_file(session, session.sent_response)
+        return Response(session.sent_response, mimetype="application/json", status=200)
 
 # APIs for test scripts
 @api.route('/set-response')
@@ -672,67 +587,77 @@ class SetResponse(Resource):
     @api.response(400, "Exception occurs")
     @api.expect(test_case_control, validate=True)
     def post(self):
-        global vectors
-        global recv_request
-        global sent_response
-        global resp_wait_time
-        global filename_prefix
-        global phase
-        global hold_response
-        global script_test_vector
-        global is_random
-        global difference_last_picks
-        global only_random_power
-        global country_code
-        global channel_width
         tc = request.json
  
-        Logger.log(LogCategory.DEBUG, f"/set-response: request {tc}")
+        control_log.debug("/set-response: request %s", tc)
 
         try:
-            phase = None
-            vectors = {
-                "testCaseID": {
-                    "unitUnderTest": tc["unitUnderTest"],
-                    "purpose": tc["purpose"],
-                    "testVector": tc["testVector"]
+            session = sessions.select(tc)
+            if tc.get("serialNumber"):
+                sessions.bind_serial_number(session, tc["serialNumber"])
+            with session.lock:
+                session.phase = None
+                session.vectors = {
+                    "testCaseID": {
+                        "unitUnderTest": tc["unitUnderTest"],
+                        "purpose": tc["purpose"],
+                        "testVector": tc["testVector"]
+                    }
                 }
-            }
-            recv_request = {"headers": {}, "body": {}}
-            sent_response = {}
-            resp_wait_time = 0
-            is_random = False
-            filename_prefix = f'{tc["unitUnderTest"]}_{tc["purpose"]}'
-            script_test_vector = tc["testVector"]
-            if "phase" in tc:
-                phase = tc["phase"]
-                vectors["testCaseID"]["phase"] = tc["phase"]
-            if "respWaitTime" in tc:
-                resp_wait_time = tc["respWaitTime"]                
-            if "holdResponse" in tc:
-                hold_response = tc["holdResponse"]
-                Logger.log(LogCategory.DEBUG, f'holdResponse {hold_response}')
-            if "countryCode" in tc:
-                country_code = tc["countryCode"]
-            if "channelWidth" in tc:
-                channel_width = tc["channelWidth"]
-            if "random" in tc and tc["random"]:
-                is_random = True
-                if "onlyRandomPower" in tc:
-                    only_random_power = tc["onlyRandomPower"]
-                else:
-                    only_random_power = False
-                if "difference_last_picks" in tc and tc["difference_last_picks"]:
-                    difference_last_picks = True
-                else:
-                    difference_last_picks = False
+                session.current_vector = None
+                session.recv_request = {"headers": {}, "body": {}}
+                session.sent_response = {}
+                session.resp_wait_time = 0
+                session.is_random = False
+                session.filename_prefix = f'{tc["unitUnderTest"]}_{tc["purpose"]}'
+                session.script_test_vector = tc["testVector"]
+                if "phase" in tc:
+                    session.phase = tc["phase"]
+                    session.vectors["testCaseID"]["phase"] = tc["phase"]
+                if "respWaitTime" in tc:
+                    session.resp_wait_time = tc["respWaitTime"]                
+                session.batch_workers = max(1, min(tc.get("batchWorkers") or 1, max_batch_workers))
+                if "holdResponse" in tc:
+                    session.hold_response = tc["holdResponse"]
+                    control_log.debug('holdResponse %s', session.hold_response)
+                if "countryCode" in tc:
+                    session.country_code = tc["countryCode"]
+                if "channelWidth" in tc:
+                    session.channel_width = tc["channelWidth"]
+                if "random" in tc and tc["random"]:
+                    session.is_random = True
+                    if "onlyRandomPower" in tc:
+                        session.only_random_power = tc["onlyRandomPower"]
+                    else:
+                        session.only_random_power = False
+                    if "difference_last_picks" in tc and tc["difference_last_picks"]:
+                        session.difference_last_picks = True
+                    else:
+                        session.difference_last_picks = False
+                    if tc.get("seed") is not None:
+                        session.seed = tc["seed"]
+                    elif not session.difference_last_picks or session.seed is None:
+                        session.seed = new_seed()
+                    control_log.debug('random test vector seed %s', session.seed)
+                    pregenerate_random_vectors(session)
+                session.condition.notify_all()
+            # The services hosted in this process (afc_combined_service) take the same setting
+            linked_services = service_links.configure(tc)
 
             response = {"message": "Success"}
-            return Response(json.dumps(response), mimetype="application/json", status=200)
+            if session.is_random:
+                response["seed"] = session.seed
+            if linked_services:
+                response["linkedServices"] = linked_services
+            return Response(json_codec.dumpb(response), mimetype="application/json", status=200)
+        except RandomVectorUnavailable as err:
+            control_log.error(str(err))
+            response = {"message": f"Exception : {err}"}
+            return Response(json_codec.dumpb(response), mimetype="application/json", status=400)
         except Exception as err:
             exception_str = traceback.format_exc()
             response = {"message": f"Exception : {exception_str}"}
-            return Response(json.dumps(response), mimetype="application/json", status=400)
+            return Response(json_codec.dumpb(response), mimetype="application/json", status=400)
 
 @api.route('/set-params')
 class SetParams(Resource):
@@ -740,77 +665,176 @@ class SetParams(Resource):
     @api.response(400, "Exception occurs")
     @api.expect(test_case_control, validate=True)
     def post(self):
-        global hold_response
         tc = request.json
         try:
-            if "holdResponse" in tc:
-                hold_response = tc["holdResponse"]
-                Logger.log(LogCategory.DEBUG, f'holdResponse {hold_response}')
+            session = sessions.select(tc)
+            with session.lock:
+                if "holdResponse" in tc:
+                    session.hold_response = tc["holdResponse"]
+                    control_log.debug('holdResponse %s', session.hold_response)
+                session.condition.notify_all()
 
             response = {"message": "Success"}
-            return Response(json.dumps(response), mimetype="application/json", status=200)
+            return Response(json_codec.dumpb(response), mimetype="application/json", status=200)
         except Exception as err:
             exception_str = traceback.format_exc()
             response = {"message": f"Exception : {exception_str}"}
-            return Response(json.dumps(response), mimetype="application/json", status=400)
+            return Response(json_codec.dumpb(response), mimetype="application/json", status=400)
 
 @api.route('/get-status')
 class GetStatus(Resource):
     @api.response(200, "Success")
     def get(self):
-        global vectors
-        global recv_request
-        global sent_response
-        global valid_request
-        response = {"currentTestVector": vectors,
-                    "receivedRequestHeaders" : recv_request["headers"],
-                    "receivedRequest" : recv_request["body"],
-                    "sentResponse" : sent_response,
-                    "valid_request" : valid_request
-                    }
-        return Response(json.dumps(response), mimetype="application/json", status=200)
+        session = sessions.select(request.args)
+        with session.lock:
+            response = {"sessionId": session.session_id,
+                        "currentTestVector": session.vectors,
+                        "receivedRequestHeaders" : session.recv_request["headers"],
+                        "receivedRequest" : session.recv_request["body"],
+                        "sentResponse" : json_codec.loads(session.sent_response) if isinstance(session.sent_response, bytes) else session.sent_response,
+                        "valid_request" : session.valid_request,
+                        "seed" : session.seed if session.is_random else None
+                        }
+            response = json_codec.dumpb(response)
+        return Response(response, mimetype="application/json", status=200)
 
 @api.route('/reset')
 class SetResponse(Resource):
     @api.response(200, "Success")
     @api.response(400, "Exception occurs")
     def post(self):
-        global vectors
-        global recv_request
-        global sent_response
-        global resp_wait_time
-        global filename_prefix
-        global phase
-        global script_test_vector
-        global hold_response
-        global inquiry_file
-        global valid_request
-        global is_random
-        global difference_last_picks
-        global only_random_power
-        global channel_width
-        vectors = {}
-        recv_request = {"headers": {}, "body": {}}
-        sent_response = {}
-        resp_wait_time = 0
-        phase = None
-        filename_prefix = "default"
-        script_test_vector = 0
-        hold_response = False
-        valid_request = False
-        is_random = False
-        difference_last_picks = False
-        only_random_power = False
-        channel_width = 80
-
+        session = sessions.select(request.get_json(silent=True) or {})
         try:
-            if request.json.get("inquiryFile"):
-                inquiry_file = request.json["inquiryFile"]
-            else:
-                inquiry_file = None
+            with session.lock:
+                session.reset()
+                # Write the messages of the previous test case before switching the file
+                inquiry_log.flush(session.inquiry_file)
+                if request.json.get("inquiryFile"):
+                    session.inquiry_file = request.json["inquiryFile"]
+                else:
+                    session.inquiry_file = None
+                file_format = request.json.get("inquiryFileFormat") or "text"
+                if file_format not in inquiry_file_formats:
+                    raise ValueError(f"inquiryFileFormat should be one of {inquiry_file_formats}")
+                session.inquiry_file_format = file_format
+                session.condition.notify_all()
  
             response = {"message": "Success"}
-            return Response(json.dumps(response), mimetype="application/json", status=200)
+            return Response(json_codec.dumpb(response), mimetype="application/json", status=200)
+        except Exception as err:
+            response = {"message": f"Exception : {err}"}
+            return Response(json_codec.dumpb(response), mimetype="application/json", status=400)
+
+@api.route('/vectors')
+class Vectors(Resource):
+    @api.response(200, "Success")
+    def get(self):
+        """Test vector overlays installed with /vectors/<name>"""
+        response = {"overlays": vector_index.overlays(), "vectors": len(vector_index)}
+        return Response(json_codec.dumpb(response), mimetype="application/json", status=200)
+
+@api.route('/vectors/<string:name>')
+class VectorOverlay(Resource):
+    @api.response(200, "Success")
+    @api.response(400, "Invalid test vectors")
+    def post(self, name):
+        """Installs the uploaded test vectors as the overlay name, looked up before the test vector files
+
+        The overlay replaces the previous overlay of the same name atomically, no
+        test vector is installed when one of them is invalid.
+        """
+        try:
+            count = vector_index.install_overlay(name, uploaded_vectors(name))
+            control_log.debug("/vectors: installed %s test vector(s) as overlay %s", count, name)
+            response = {"message": "Success", "name": name, "vectors": vector_index.overlays()[name]}
+            return Response(json_codec.dumpb(response), mimetype="application/json", status=200)
+        except Exception as err:
+            response = {"message": f"Exception : {err}"}
+            return Response(json_codec.dumpb(response), mimetype="application/json", status=400)
+
+    @api.response(200, "Success")
+    @api.response(404, "No such overlay")
+    def delete(self, name):
+        """Removes the overlay name, its test vectors are answered from the files again"""
+        if not vector_index.remove_overlay(name):
+            response = {"message": f"No test vector overlay {name}"}
+            return Response(json_codec.dumpb(response), mimetype="application/json", status=404)
+        control_log.debug("/vectors: removed overlay %s", name)
+        return Response(json_codec.dumpb({"message": "Success"}), mimetype="application/json", status=200)
+
+@api.route('/recording')
+class Recording(Resource):
+    @api.response(200, "Success")
+    def get(self):
+        return Response(json_codec.dumpb(traffic_recorder.status()), mimetype="application/json", status=200)
+
+    @api.response(200, "Success")
+    @api.response(400, "Exception occurs")
+    @api.expect(recording_control, validate=True)
+    def post(self):
+        """Starts recording the exchanges to a file, or stops recording when file is empty"""
+        try:
+            if request.json.get("file"):
+                traffic_recorder.start(request.json["file"])
+                control_log.debug("Recording the exchanges to %s", request.json["file"])
+            else:
+                traffic_recorder.stop()
+            return Response(json_codec.dumpb(traffic_recorder.status()), mimetype="application/json", status=200)
+        except Exception as err:
+            response = {"message": f"Exception : {err}"}
+            return Response(json_codec.dumpb(response), mimetype="application/json", status=400)
+
+@api.route('/tls-stats')
+class TlsStats(Resource):
+    @api.response(200, "Success")
+    def get(self):
+        """TLS handshake and session resumption counts, when the simulator terminates TLS"""
+        return Response(json_codec.dumpb(tls_stats()), mimetype="application/json", status=200)
+
+@api.route('/ready')
+class Ready(Resource):
+    @api.response(200, "Ready")
+    @api.response(503, "Starting")
+    def get(self):
+        """Readiness of the simulator, with the time to ready from the process start"""
+        status = dict(readiness.status(), vectors=len(vector_index))
+        return Response(json_codec.dumpb(status), mimetype="application/json", status=200 if status["ready"] else 503)
+
+@api.route('/log-levels')
+class LogLevels(Resource):
+    @api.response(200, "Success")
+    def get(self):
+        return Response(json_codec.dumpb(debug_log.get_levels()), mimetype="application/json", status=200)
+
+    @api.response(200, "Success")
+    @api.response(400, "Exception occurs")
+    @api.expect(log_levels_control, validate=True)
+    def post(self):
+        try:
+            debug_log.set_levels(request.json.get("categories"), request.json.get("default"))
+            return Response(json_codec.dumpb(debug_log.get_levels()), mimetype="application/json", status=200)
+        except Exception as err:
+            response = {"message": f"Exception : {err}"}
+            return Response(json_codec.dumpb(response), mimetype="application/json", status=400)
+
+@api.route('/debug-events')
+class DebugEvents(Resource):
+    @api.response(200, "Success")
+    @api.response(400, "Exception occurs")
+    def get(self):
+        """Recent log events of all the categories, query parameters count, category and level"""
+        try:
+            events = debug_log.recent_events(request.args.get("count", 100, type=int),
+                                             request.args.get("category"),
+                                             debug_log.parse_level(request.args.get("level", "DEBUG")))
+            return Response(json_codec.dumpb({"events": events}), mimetype="application/json", status=200)
         except Exception as err:
             response = {"message": f"Exception : {err}"}
-            return Response(json.dumps(response), mimetype="application/json", status=400)
\ No newline at end of file
+            return Response(json_codec.dumpb(response), mimetype="application/json", status=400)
+
+@api.route('/metrics')
+class Metrics(Resource):
+    @api.response(200, "Success")
+    def get(self):
+        """Request, response and timing metrics in the Prometheus text format"""
+        return Response(metrics.registry.render(), content_type=metrics.content_type, status=200)
@@ -0,0 +1,133 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package session.py : AFC simulator test sessions.
+
+A session holds the state of the AFC simulator for one AFC DUT test: the configured
+test vector, the last received request and sent response, and the response timing
+control. Sessions are selected by session id, or by the serialNumber of the AFC DUT
+bound to the session, so that one simulator serves several AFC DUTs in parallel.
+
+The state of a session is only accessed with the session lock held. A held or
+delayed response waits on the session condition, which releases the lock, so the
+test script can still query and control the session meanwhile.
+"""
+import threading
+import time
+
+default_session_id = "default"
+
+
+class SimulatorSession:
+    """State of the AFC simulator for one AFC DUT test"""
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        # deviceDescriptor serialNumber of the AFC DUT using the session
+        self.serial_number = None
+        self.inquiry_file = None
+        self.inquiry_file_format = "text"
+        self.country_code = 'US'
+        self.random_picks = []
+        # Seed of the random test vectors, kept for the difference_last_picks phase
+        self.seed = None
+        self.lock = threading.RLock()
+        # Notified when the response timing control of the session changes
+        self.condition = threading.Condition(self.lock)
+        self.reset()
+
+    def reset(self):
+        """Resets the test vector configuration and the exchanged messages"""
+        self.vectors = {}
+        self.current_vector = None
+        self.recv_request = {"headers": {}, "body": {}}
+        self.valid_request = False
+        self.sent_response = {}
+        self.resp_wait_time = 0
+        # Threads rendering the responses of the requests of a batch
+        self.batch_workers = 1
+        self.phase = None
+        self.filename_prefix = "default"
+        self.hold_response = False
+        self.script_test_vector = 0
+        self.is_random = False
+        self.difference_last_picks = False
+        self.only_random_power = False
+        self.channel_width = 80
+
+    def wait_hold_released(self):
+        """Waits until the response is no longer held, the session lock must be held
+
+        The held requests are woken up by the notification of the condition when
+        holdResponse is cleared or the session is reset. Returns the hold duration.
+        """
+        start = time.monotonic()
+        self.condition.wait_for(lambda: not self.hold_response)
+        return time.monotonic() - start
+
+    def sleep(self, seconds):
+        """Waits for seconds without holding the session lock, the session lock must be held"""
+        deadline = time.monotonic() + seconds
+        remaining = seconds
+        while remaining > 0:
+            self.condition.wait(remaining)
+            remaining = deadline - time.monotonic()
+
+
+class SessionManager:
+    """Simulator sessions by session id
+
+    The default session serves the AFC DUTs and test scripts that don't select a session.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {default_session_id: SimulatorSession(default_session_id)}
+
+    def get(self, session_id=None):
+        """Returns the session of the id, creating it when needed"""
+        session_id = session_id or default_session_id
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = SimulatorSession(session_id)
+            return session
+
+    def find_by_serial_number(self, serial_number):
+        """Returns the session bound to the AFC DUT serialNumber or None"""
+        if serial_number is None:
+            return None
+        with self._lock:
+            for session in self._sessions.values():
+                if session.serial_number == serial_number:
+                    return session
+        return None
+
+    def select(self, params):
+        """Returns the session selected by the sessionId or serialNumber of the control request parameters"""
+        session_id = params.get("sessionId")
+        if not session_id:
+            session = self.find_by_serial_number(params.get("serialNumber"))
+            if session:
+                return session
+        return self.get(session_id)
+
+    def bind_serial_number(self, session, serial_number):
+        """Binds an AFC DUT serialNumber to the session, unbinding it from any other session"""
+        with self._lock:
+            for other in self._sessions.values():
+                if other is not session and other.serial_number == serial_number:
+                    other.serial_number = None
+            session.serial_number = serial_number
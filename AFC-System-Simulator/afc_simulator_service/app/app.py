@@ -17,32 +17,47 @@
 
 Package that launches the device manager service, Module responsible for communication with DUT.
 """
+import argparse
 import sys
 import os
 from flask import Flask
 
 sys.path.append(os.path.abspath("./QuickTrack-Tool/Test-Services"))
-from afc_simulator_service_api import afc_simulator_api_blueprint
 from commons.microservices_helper import MicroserviceHelper
+from afc_common.wsgi_server import add_server_arguments, serve
 
 service_name = "PY_AFC_SIMULATOR"
 
+def create_app():
+    """Returns the Flask app of the AFC simulator
+
+    Called by the process serving the requests, a gunicorn worker imports the service after the fork.
+    """
+    from afc_simulator_service_api import afc_simulator_api_blueprint
+
+    app = Flask(__name__)
+    app.config["ENV"] = os.environ.get("ENV_MODE")
+    app.config.swagger_ui_doc_expansion = "list"  # Initial expansion state
+    app.register_blueprint(afc_simulator_api_blueprint)
+    return app
+
 def run_app():
     """Start AFC simulator microservice
 
     Starts a local flask server on available port and loads the AFC simulator app
     """
+    parser = argparse.ArgumentParser(description="AFC simulator service")
+    add_server_arguments(parser, 5000)
+    args = parser.parse_args()
+
     #To hide warning message "Do not use the development server in a production environment"
     cli = sys.modules['flask.cli']
     cli.show_server_banner = lambda *x: None
 
-    app = Flask(__name__)
-    app.config["ENV"] = os.environ.get("ENV_MODE")
-    service_port = 5000
-    app.config.swagger_ui_doc_expansion = "list"  # Initial expansion state
+    service_port = args.port
     MicroserviceHelper(service_name, service_port)
-    app.register_blueprint(afc_simulator_api_blueprint)
-    app.run(host="0.0.0.0", port=service_port)
+    serve(create_app, "0.0.0.0", service_port, args.server, args.workers, args.threads,
+          args.tls_cert, args.tls_key, args.tls_tickets)
 
 
 if __name__ == "__main__":
@@ -1,131 +1,256 @@
-import os
-import json
+"""@package analyze_test_vectors.py : Lint of the AFC test vectors.
+
+Checks the test vectors of the test vector directories (the files at the root
+and under the country sub-directories, by default the ones of the AFC simulator
+and of the AFC simulator for fixed client connected SP AP) in a process pool:
+    structure     : missing or malformed response fields (error)
+    cfi           : channelCfi which isn't a channel of the globalOperatingClass bandwidth (error)
+    ruleset       : channel not available in the ruleset of the test vector country (warning)
+    freq-channel  : 20 MHz channels in the frequency ranges but not in channelCfi, or the reverse (warning)
+    bandwidth     : 40/80/160/320 MHz channels whose 20 MHz channels are all in the frequency ranges
+                    but which aren't in channelCfi, or the reverse (warning)
+    psd-eirp      : maxEirp above the EIRP of the lowest maxPsd of the channel (warning)
+The channel checks apply to the responses with both availableFrequencyInfo and
+availableChannelInfo.
 
+The findings are printed as text, JSON or JUnit XML (--format, --output). The
+findings of each file are cached by file hash in .lint-cache.json, the unchanged
+test vectors are not checked again. The exit status is 1 when there are errors.
+
+Usage: python3 analyze_test_vectors.py [test_vector_dir ...] [--format text|json|junit] [--output file]
+                                       [--disable psd-eirp] [--jobs 4]
+"""
+import argparse
+import hashlib
+import json
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import quoteattr, escape
+
+# afc_common is in the AFC-System-Simulator folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../.."))
+from afc_common.channel_plan import (
+    all_cfis,
+    country_plans,
+    freq_to_channel,
+    get_subchannels,
+    op_class_to_bw,
+    psd_to_eirp,
+)
+from afc_common.vector_bundle import list_vector_files, parse_vector_filename, validate_vector
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+default_dirs = (script_dir, os.path.join(script_dir, "../../../afc_fc_ap_service/app/test_vectors"))
+cache_filename = ".lint-cache.json"
+# Changing the checks invalidates the cached findings
+lint_version = 1
+
+rules = ("structure", "cfi", "ruleset", "freq-channel", "bandwidth", "psd-eirp")
+severities = {
+    "structure": "error",
+    "cfi": "error",
+    "ruleset": "warning",
+    "freq-channel": "warning",
+    "bandwidth": "warning",
+    "psd-eirp": "warning",
+}
+# Channel 2 (5935 MHz, globalOperatingClass 136) is outside the 20 MHz channel raster
+excluded_channels = {2}
+
+
+def finding(rule, message, channels=None):
+    item = {"rule": rule, "severity": severities[rule], "message": message}
+    if channels:
+        item["channels"] = sorted(channels)
+    return item
+
+
+def frequency_channels(freq_info):
+    """Returns {20 MHz channel: maxPsd} of the availableFrequencyInfo, the lowest maxPsd of overlapping ranges"""
+    psd = {}
+    for item in freq_info:
+        low, high = item["frequencyRange"]["lowFrequency"], item["frequencyRange"]["highFrequency"]
+        # 20 MHz channels whose whole bandwidth is in the range
+        for freq in range(int(low) + 10, int(high) - 9, 20):
+            channel = freq_to_channel(freq)
+            if channel > 0:
+                psd[channel] = min(item["maxPsd"], psd.get(channel, item["maxPsd"]))
+    return psd
+
+
+def lint_response(resp, country, options):
+    """Returns the channel findings of an availableSpectrumInquiryResponses item"""
+    findings = []
+    chan_info = resp.get("availableChannelInfo") or []
+    # bandwidth -> {CFI: maxEirp}
+    channels = {}
+    for item in chan_info:
+        bw = op_class_to_bw.get(item["globalOperatingClass"])
+        if bw is None:
+            findings.append(finding("cfi", f"unknown globalOperatingClass {item['globalOperatingClass']}"))
+            continue
+        cfis = channels.setdefault(bw, {})
+        cfis.update(zip(item["channelCfi"], item["maxEirp"]))
+        invalid = set(item["channelCfi"]) - set(all_cfis[bw]) - excluded_channels
+        for cfi in invalid:
+            del cfis[cfi]
+        if invalid:
+            findings.append(finding("cfi", f"channelCfi not {bw} MHz channels of globalOperatingClass "
+                                           f"{item['globalOperatingClass']}", invalid))
+
+    plan = country_plans.get(country)
+    if plan is not None:
+        for bw, cfis in sorted(channels.items()):
+            unavailable = set(cfis) - set(plan.channels.get(bw, ())) - excluded_channels
+            if unavailable:
+                findings.append(finding("ruleset", f"{bw} MHz channels not available in {plan.ruleset_id}", unavailable))
+
+    if "availableFrequencyInfo" not in resp or not chan_info:
+        return findings
+    psd = frequency_channels(resp["availableFrequencyInfo"])
+    for bw, cfis in sorted(channels.items()):
+        complete = {cfi for cfi in all_cfis[bw] if all(sub in psd for sub in get_subchannels(cfi, bw))}
+        listed = set(cfis) - excluded_channels
+        rule = "freq-channel" if bw == 20 else "bandwidth"
+        if complete - listed:
+            findings.append(finding(rule, f"{bw} MHz channels in availableFrequencyInfo but not in channelCfi", complete - listed))
+        if listed - complete:
+            findings.append(finding(rule, f"{bw} MHz channels in channelCfi but not in availableFrequencyInfo", listed - complete))
+        above = {cfi for cfi in listed & complete
+                 if cfis[cfi] > psd_to_eirp(min(psd[sub] for sub in get_subchannels(cfi, bw)), bw) + options["eirp_tolerance"]}
+        if above:
+            findings.append(finding("psd-eirp", f"{bw} MHz maxEirp above the EIRP of the maxPsd "
+                                                f"(+{options['eirp_tolerance']} dB)", above))
+    return findings
+
+
+def lint_file(path, country, options):
+    """Returns the findings of a test vector file"""
+    try:
+        with open(path, "rb") as f:
+            data = json.loads(f.read())
+    except (OSError, ValueError) as err:
+        return [finding("structure", f"can't be parsed: {err}")]
+    key = parse_vector_filename(os.path.basename(path), country)
+    errors = validate_vector(data, key)
+    if errors:
+        return [finding("structure", error) for error in errors]
+    findings = []
+    for resp in data["responses"]["availableSpectrumInquiryResponses"]:
+        if resp["response"]["responseCode"] == 0:
+            findings.extend(lint_response(resp, key[0] if key else country, options))
+    return [item for item in findings if item["rule"] not in options["disabled"]]
 
-# Set the path for the directory and file
-directory_path = "./analysis"
-
-
-# Check if the directory exists and create it if it doesn't
-if not os.path.exists(directory_path):
-    os.makedirs(directory_path)
-
-vectors_folder_path = './'
-
-def get_cfi_from_freq_range(high, low):
-    return (((high + low)/2) - 5950)/5
-
-def get_cfi_from_op_channel(op_channel, bw):
-    cfi_bw = { 
-        40: (3, 11, 19, 27, 35, 43, 51, 59, 67, 75, 83, 91, 99, 107, 115, 123, 131, 139, 147, 155, 163, 171, 179, 187, 195, 203, 211, 219, 227),
-        80: (7, 23, 39, 55, 71, 87, 103, 119, 135, 151, 167, 183, 199, 215),
-    160: (15, 47, 79, 111, 143, 175, 207)
-    }
-    if (op_channel % 4) != 1:
-        return 0
-    for cfi in cfi_bw[bw]:
-        if (cfi - bw/10) < op_channel < (cfi + bw/10):
-            return cfi
-
-    return 0
-
-def get_full_chanset_from_cfi(cfi, bw):
-    start = int(cfi - (bw/10 - 2))
-    step = 4
-    end = int(cfi + (bw/10 - 2))
-
-    numbers = set(range(start, end+1, step))
-
-    return numbers
-
-def check_bw_from_freq_range(bw, file, cfi_dict):
-    file.write(f"\n###### Check {bw}MHz from freq ranges: ######\n")
-    avai_freq = []
-    for key, value in cfi_dict.items():
-        if len(value) != int(bw/20):
-            file.write(f"{str(int(key)).ljust(3)} : {value}\n")
-        else:
-            file.write(f"{str(int(key)).ljust(3)} : {value} - OK\n")
-            avai_freq.append(int(key))
-    avai_chan = [key for key, value in vector.items() if 'bw' in value and value['bw'] == bw]
-    file.write(f"\n~~~ Available {bw}MHz from\n")
-    if '_3' in filename or '_1' in filename:
-        file.write(f"freq ranges: {avai_freq}")
-        if '_3' in filename:
-            file.write(f" - No {set(avai_chan)-set(avai_freq)}\n")
-        else:
-            file.write("\n")
-    if '_3' in filename or '_2' in filename:                        
-        file.write(f"channelCfi : {avai_chan}\n")
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def lint(dirs, options, jobs, cache_path=None):
+    """Returns {file: findings} of the test vectors of dirs, and the number of files checked"""
+    fingerprint = json.dumps([lint_version, options], sort_keys=True, default=sorted)
+    cache = {}
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cache = json.load(f)
+        if cache.get("fingerprint") != fingerprint:
+            cache = {}
+    cached_files = cache.get("files", {})
+
+    results, pending, files = {}, [], {}
+    for root_dir in dirs:
+        for path, country in sorted(list_vector_files(root_dir)):
+            if parse_vector_filename(os.path.basename(path), country) is None:
+                continue
+            name = os.path.relpath(path)
+            if name.startswith(os.pardir):
+                name = os.path.abspath(path)
+            digest = file_hash(path)
+            files[name] = {"sha256": digest}
+            cached = cached_files.get(name)
+            if cached and cached["sha256"] == digest:
+                results[name] = cached["findings"]
+            else:
+                pending.append((name, path, country))
+
+    if pending:
+        with ProcessPoolExecutor(jobs) as executor:
+            futures = [(name, executor.submit(lint_file, path, country, options)) for name, path, country in pending]
+            for name, future in futures:
+                results[name] = future.result()
+
+    if cache_path:
+        for name in files:
+            files[name]["findings"] = results[name]
+        with open(cache_path, "w") as f:
+            json.dump({"fingerprint": fingerprint, "files": files}, f, indent=1, sort_keys=True)
+    return dict(sorted(results.items())), len(pending)
+
+
+def format_text(results):
+    lines = []
+    for name, findings in results.items():
+        for item in findings:
+            channels = f" {item['channels']}" if item.get("channels") else ""
+            lines.append(f"{name}: {item['severity']} [{item['rule']}] {item['message']}{channels}")
+    return "\n".join(lines) + ("\n" if lines else "")
+
+
+def format_json(results):
+    return json.dumps({"files": [{"file": name, "findings": findings} for name, findings in results.items()]}, indent=1) + "\n"
+
+
+def format_junit(results):
+    """One test case per file, a failure per error finding, the warnings in system-out"""
+    failures = sum(any(item["severity"] == "error" for item in findings) for findings in results.values())
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             f'<testsuite name="test-vectors" tests="{len(results)}" failures="{failures}">']
+    for name, findings in results.items():
+        lines.append(f'  <testcase classname="test_vectors" name={quoteattr(name)}>')
+        for item in findings:
+            text = escape(item["message"] + (f" {item['channels']}" if item.get("channels") else ""))
+            if item["severity"] == "error":
+                lines.append(f'    <failure type={quoteattr(item["rule"])} message={quoteattr(item["message"])}>{text}</failure>')
+        warnings = [item for item in findings if item["severity"] != "error"]
+        if warnings:
+            lines.append("    <system-out>" + escape(format_text({name: warnings})) + "</system-out>")
+        lines.append("  </testcase>")
+    lines.append("</testsuite>")
+    return "\n".join(lines) + "\n"
+
+
+formats = {"text": format_text, "json": format_json, "junit": format_junit}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lint of the AFC test vectors")
+    parser.add_argument("dirs", nargs="*", default=list(default_dirs), help="test vector directories")
+    parser.add_argument("--format", choices=formats, default="text", help="output format")
+    parser.add_argument("--output", help="file the findings are written to, the standard output by default")
+    parser.add_argument("--disable", nargs="*", choices=rules, default=[], help="rules not checked")
+    parser.add_argument("--eirp-tolerance", type=float, default=0.1, help="dB of maxEirp above the EIRP of the maxPsd")
+    parser.add_argument("--jobs", type=int, default=None, help="number of lint processes, the number of CPUs by default")
+    parser.add_argument("--cache", default=os.path.join(script_dir, cache_filename), help="findings cache file")
+    parser.add_argument("--no-cache", action="store_true", help="check all the test vectors")
+    args = parser.parse_args()
+
+    options = {"disabled": sorted(args.disable), "eirp_tolerance": args.eirp_tolerance}
+    results, checked = lint(args.dirs, options, args.jobs, None if args.no_cache else args.cache)
+    report = formats[args.format](results)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
     else:
-        file.write("\n")
-
-for filename in os.listdir(vectors_folder_path):
-    if filename.endswith('.json'):
-        file_path = os.path.join(vectors_folder_path, filename)
-        print(f"\n-----------  {filename}  -----------")
-        with open(file_path) as f:
-            json_content = json.load(f)
-            # do something with the json_content
-            # print(json_content)
-            vector = {}
-            cfi40 = {}
-            cfi80 = {}
-            cfi160 = {}
-            resp = json_content["responses"]["availableSpectrumInquiryResponses"][0]
-            if 'availableFrequencyInfo' in resp:
-                for availableFrequencyInfo in resp["availableFrequencyInfo"]:
-                    highFrequency = availableFrequencyInfo["frequencyRange"]["highFrequency"]
-                    lowFrequency = availableFrequencyInfo["frequencyRange"]["lowFrequency"]
-                    maxPsd = availableFrequencyInfo["maxPsd"]
-                    cfi = get_cfi_from_freq_range(highFrequency, lowFrequency)
-                    if cfi > 0:
-                        vector.setdefault(int(cfi), {})["maxPsd"] = maxPsd
-                        cfi40.setdefault(get_cfi_from_op_channel(cfi, 40), []).append(int(cfi))
-                        cfi80.setdefault(get_cfi_from_op_channel(cfi, 80), []).append(int(cfi))
-                        cfi160.setdefault(get_cfi_from_op_channel(cfi, 160), []).append(int(cfi))
-            
-            if 'availableChannelInfo' in resp:
-                for availableChannelInfo in resp["availableChannelInfo"]:
-                    channelCfi = availableChannelInfo["channelCfi"]
-                    for index, cfi in enumerate(channelCfi):                        
-                        vector.setdefault(int(cfi), {})["maxEirp"] = availableChannelInfo["maxEirp"][index]
-                        if availableChannelInfo["globalOperatingClass"] == 131:
-                            bw = 20
-                        elif availableChannelInfo["globalOperatingClass"] == 132:
-                            bw = 40
-                        elif availableChannelInfo["globalOperatingClass"] == 133:
-                            bw = 80
-                        elif availableChannelInfo["globalOperatingClass"] == 134:
-                            bw = 160
-                        else:
-                            bw = 20
-                        vector.setdefault(int(cfi), {})["bw"] = bw
-
-            # print(vector)
-            analysis_file_path = f'{directory_path}/{filename.replace(".json", ".txt")}'
-            with open(analysis_file_path, "w") as file:
-                missing_chancfi = []
-                missing_freq_range = []
-                for key, value in vector.items():
-                    if key !=2 and ('bw' not in value or value["bw"] == 20) and '_3' in filename:
-                        if 'maxEirp' in value and 'maxPsd' not in value:
-                            missing_freq_range.append(key)
-                        if 'maxEirp' not in value and 'maxPsd' in value:
-                            missing_chancfi.append(key)
-                        # file.write(f"{str(int(key)).ljust(3)} : {value} - In channelCfi but not in freq range\n")                    
-                    file.write(f"{str(int(key)).ljust(3)} : {value}\n")
-                if '_3' in filename:
-                    file.write(f"\nIn freq range but not in channelCfi:\n {missing_chancfi}\n")
-                    file.write(f"Not in freq range but in channelCfi:\n {missing_freq_range}\n")
-
-                if '_RSA_' in filename:
-                    ######################################################################
-                    check_bw_from_freq_range(40, file, cfi40)
-                    ######################################################################
-                    check_bw_from_freq_range(80, file, cfi80)
-                    ######################################################################
-                    check_bw_from_freq_range(160, file, cfi160)
+        sys.stdout.write(report)
+
+    counts = {severity: sum(item["severity"] == severity for findings in results.values() for item in findings)
+              for severity in ("error", "warning")}
+    print(f"{len(results)} test vectors ({checked} checked, {len(results) - checked} cached): "
+          f"{counts['error']} errors, {counts['warning']} warnings", file=sys.stderr)
+    sys.exit(1 if counts["error"] else 0)
 
 
+if __name__ == "__main__":
+    main()
@@ -1,90 +1,216 @@
-from openpyxl import load_workbook
+"""@package test-vectors-to-json.py : Conversion of the compliance test vector workbook to JSON.
+
+Streams the rows of every "Expected Availability Responses" worksheet of the
+workbook (a worksheet with availableFrequencyInfo, availableChannelInfo and
+response columns) and writes a test vector file per test case row, the rows of
+a test case without Test Case ID being its next phases. The columns are found
+by their header names. A worksheet whose title ends with a country code, e.g.
+"Expected Availability Responses (CA)", is written to that country sub-directory.
+
+The content hash of the rows of each test case is kept in .test-vectors-cache.json:
+the test cases whose rows didn't change since the last run are not converted
+again (--force converts all of them).
+
+Usage: python3 test-vectors-to-json.py ["AFC Device (DUT) Compliance Test Vectors v1.0.xlsx"]
+                                       [--output-dir .] [--force]
+"""
+import argparse
+import hashlib
 import json
+import os
 import re
+import sys
+from openpyxl import load_workbook
 
-vectors = {"vectors": []}
+default_workbook = "AFC Device (DUT) Compliance Test Vectors v1.0.xlsx"
+cache_filename = ".test-vectors-cache.json"
+# Changing the conversion invalidates the cached hashes
+converter_version = 2
+# Rows of the column headers
+header_rows = 5
+# The rows are streamed until this number of consecutive empty rows
+max_empty_rows = 50
+country_title_pattern = re.compile(r"[ _(-]([A-Z]{2})\)?$")
 
-wb = load_workbook("AFC Device (DUT) Compliance Test Vectors v1.0.xlsx")
 
-ws = wb.worksheets[4]
+def find_columns(headers):
+    """Returns the response columns (0-based) of the header rows of a worksheet, None when it has none
 
-for row in range(7, 25):
-    vec = {}
-    tc_id = {}
-    response = {}
-    tc_id_row = row
-    phase = 0
+    availableFrequencyInfo and availableChannelInfo span the columns up to the next header of their row.
+    """
+    group_row = next((row for row in headers if "availableFrequencyInfo" in row and "availableChannelInfo" in row), None)
+    code_row = next((row for row in headers if "responseCode" in row), None)
+    if group_row is None or code_row is None:
+        return None
 
-    if ws[f'A{row}'].value and not ws[f'A{row + 1}'].value:
-       phase = 1
-    elif not ws[f'A{row}'].value:
-       phase = 2
-       tc_id_row = row - 1
+    def group(name):
+        start = group_row.index(name)
+        end = next((idx for idx in range(start + 1, len(group_row)) if group_row[idx] is not None), len(group_row))
+        return start, end
 
-    # Test Case ID as index
-    tc_id["unitUnderTest"] = ws[f'A{tc_id_row}'].value
-    tc_id["purpose"] = ws[f'B{tc_id_row}'].value
-    tc_id["testVector"] = ws[f'C{tc_id_row}'].value
-    if phase:
-        tc_id["phase"] = phase
-        filename = f"{ws[f'A{tc_id_row}'].value}_{ws[f'B{tc_id_row}'].value}_{ws[f'C{tc_id_row}'].value}_phase{phase}.json"
-    else:
-        filename = f"{ws[f'A{tc_id_row}'].value}_{ws[f'B{tc_id_row}'].value}_{ws[f'C{tc_id_row}'].value}.json"
-    vec["testCaseID"] = tc_id
-    
-    ###
-    vec["description"] = ws[f'D{tc_id_row}'].value
-    response["availableSpectrumInquiryResponses"] = []
-    vec["responses"] = response
-    InquiryResponse = {}
-    response["availableSpectrumInquiryResponses"].append(InquiryResponse)
-    InquiryResponse["response"] = {
-                                   "responseCode": ws[f'EW{row}'].value,
-                                   "shortDescription": ws[f'EX{row}'].value
-                                  }
-
-    # availableFrequencyInfo
-    # r6: Column H ~ EF
-    data = [ws.cell(row=row,column=i).value for i in range(8,137)]
-    print(f'row - {row}')
-    print(data)
-    for i in range(0, len(data), 3):
+    return {
+        "frequency": group("availableFrequencyInfo"),
+        "channel": group("availableChannelInfo"),
+        "responseCode": code_row.index("responseCode"),
+        "shortDescription": code_row.index("shortDescription"),
+    }
+
+
+def frequency_info(data):
+    """Returns the availableFrequencyInfo of the (lowFrequency, highFrequency, maxPsd) cells, None when empty"""
+    items = None
+    for i in range(0, len(data) - 2, 3):
         if data[i]:
-            if not InquiryResponse.get("availableFrequencyInfo"):
-                InquiryResponse["availableFrequencyInfo"] = []
+            if not items:
+                items = []
             if data[i+2] != 'NULL':
-                print(data[i+2])
-                InquiryResponse["availableFrequencyInfo"].append({
-                                    "frequencyRange": {
-                                        "highFrequency": data[i+1],
-                                        "lowFrequency": data[i]
-                                    },
-                                    "maxPsd": data[i+2]
-                                })    
-
-
-    # availableChannelInfo
-    # cell EG ~ EU
-    data = [ws.cell(row=row,column=i).value for i in range(137,152)]
-    print(data)
-    for i in range(0, len(data), 3):
+                items.append({
+                    "frequencyRange": {
+                        "highFrequency": data[i+1],
+                        "lowFrequency": data[i]
+                    },
+                    "maxPsd": data[i+2]
+                })
+    return items
+
+
+def channel_info(data):
+    """Returns the availableChannelInfo of the (globalOperatingClass, channelCfi, maxEirp) cells, None when empty"""
+    items = None
+    for i in range(0, len(data) - 2, 3):
         if data[i]:
-            print(f'gobalOperatingClass {data[i]}')
-            if not InquiryResponse.get("availableChannelInfo"):
-                InquiryResponse["availableChannelInfo"] = []
+            if not items:
+                items = []
             channelCfi = re.findall('([^,"\t\n ]+)', str(data[i+1]))
-            print(f"channelCfi {channelCfi} len {len(channelCfi)}")
             maxEirp = re.findall('([^,"\t\n ]+)', str(data[i+2]))
-            print(f"maxEirp    {maxEirp} len {len(maxEirp)}")
             if len(maxEirp) == 1 and (maxEirp[0] == 'NULL' or maxEirp[0] == 'None'):
                 continue
-            InquiryResponse["availableChannelInfo"].append({
-                                 "channelCfi":  [int(item) for idx, item in enumerate(channelCfi) if item and item != "NULL" and len(maxEirp) > idx and maxEirp[idx] and maxEirp[idx] != 'NULL' ],
-                                "globalOperatingClass": data[i],
-                                "maxEirp": [float(item) for item in maxEirp if item and item != "NULL"]
-                            })    
-    #vec["row"] = row # debug
-    #vec["tc_id_row"] = tc_id_row # debug
-    with open(filename, "w") as f:
-        json.dump(vec, f, indent=4)
+            items.append({
+                "channelCfi": [int(item) for idx, item in enumerate(channelCfi)
+                               if item and item != "NULL" and len(maxEirp) > idx and maxEirp[idx] and maxEirp[idx] != 'NULL'],
+                "globalOperatingClass": data[i],
+                "maxEirp": [float(item) for item in maxEirp if item and item != "NULL"]
+            })
+    return items
+
+
+def test_vector(tc_row, row, columns, phase):
+    """Returns the file name and the test vector of a test case row"""
+    tc_id = {"unitUnderTest": tc_row[0], "purpose": tc_row[1], "testVector": tc_row[2]}
+    filename = f"{tc_row[0]}_{tc_row[1]}_{tc_row[2]}"
+    if phase:
+        tc_id["phase"] = phase
+        filename += f"_phase{phase}"
+
+    inquiry_response = {
+        "response": {
+            "responseCode": row[columns["responseCode"]],
+            "shortDescription": row[columns["shortDescription"]]
+        }
+    }
+    items = frequency_info(row[slice(*columns["frequency"])])
+    if items is not None:
+        inquiry_response["availableFrequencyInfo"] = items
+    items = channel_info(row[slice(*columns["channel"])])
+    if items is not None:
+        inquiry_response["availableChannelInfo"] = items
+    return filename + ".json", {
+        "testCaseID": tc_id,
+        "description": tc_row[3],
+        "responses": {"availableSpectrumInquiryResponses": [inquiry_response]},
+    }
+
+
+def test_cases(rows, columns):
+    """Yields the rows of each test case, [Test Case ID row, next phase rows...], of the streamed worksheet rows"""
+    case = []
+    empty_rows = 0
+    for row in rows:
+        if not any(value is not None for value in row):
+            empty_rows += 1
+            if empty_rows >= max_empty_rows:
+                break
+            continue
+        empty_rows = 0
+        if row[0]:
+            if case:
+                yield case
+            case = [row]
+        elif case:
+            case.append(row)
+    if case:
+        yield case
+
+
+def row_hash(title, case):
+    content = json.dumps([converter_version, title, case], default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def convert_worksheet(ws, output_dir, cache, force):
+    """Writes the test vectors of a worksheet, returns the (converted, unchanged) counts"""
+    rows = ws.iter_rows(values_only=True)
+    headers = [list(row) for _, row in zip(range(header_rows), rows)]
+    columns = find_columns(headers)
+    if columns is None:
+        return None
+    match = country_title_pattern.search(ws.title)
+    if match:
+        output_dir = os.path.join(output_dir, match.group(1))
+        os.makedirs(output_dir, exist_ok=True)
+
+    converted = unchanged = 0
+    for case in test_cases(rows, columns):
+        # The rows without response are test cases without test vector (no response sent)
+        case = [row for row in case if row[columns["responseCode"]] is not None]
+        if not case:
+            continue
+        tc_row = case[0]
+        for phase, row in enumerate(case, 1):
+            filename, vec = test_vector(tc_row, row, columns, phase if len(case) > 1 else 0)
+            path = os.path.join(output_dir, filename)
+            cache_key = os.path.relpath(path, cache["dir"])
+            digest = row_hash(ws.title, [tc_row, row])
+            if not force and cache["rows"].get(cache_key) == digest and os.path.exists(path):
+                unchanged += 1
+                continue
+            with open(path, "w") as f:
+                json.dump(vec, f, indent=4)
+            cache["rows"][cache_key] = digest
+            converted += 1
+    return converted, unchanged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conversion of the compliance test vector workbook to JSON")
+    parser.add_argument("workbook", nargs="?", default=default_workbook, help="test vector workbook (.xlsx)")
+    parser.add_argument("--output-dir", default=".", help="directory of the test vector files")
+    parser.add_argument("--force", action="store_true", help="convert the unchanged test cases as well")
+    args = parser.parse_args()
+
+    cache_path = os.path.join(args.output_dir, cache_filename)
+    cache = {"dir": args.output_dir, "rows": {}}
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cache["rows"] = json.load(f)
+
+    wb = load_workbook(args.workbook, read_only=True)
+    try:
+        sheets = 0
+        for ws in wb.worksheets:
+            counts = convert_worksheet(ws, args.output_dir, cache, args.force)
+            if counts is not None:
+                sheets += 1
+                print(f"{ws.title}: {counts[0]} test vectors converted, {counts[1]} unchanged")
+    finally:
+        wb.close()
+    if not sheets:
+        print(f"No expected availability responses worksheet in {args.workbook}")
+        sys.exit(1)
+
+    with open(cache_path, "w") as f:
+        json.dump(cache["rows"], f, indent=1, sort_keys=True)
+
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package bench_json_codec.py : Micro-benchmark of the JSON codec backends.
+
+Compares the standard json module with orjson (when installed) on the largest
+test vectors and on synthetic RF measurement reports, for decoding, compact
+encoding (responses) and pretty encoding (logs and reports).
+
+Usage: python3 bench_json_codec.py [--vectors 3] [--packets 100 1000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from afc_common import json_codec
+
+vectors_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../afc_simulator_service/app/test_vectors")
+
+
+def largest_vectors(count):
+    paths = []
+    for root, _, files in os.walk(vectors_dir):
+        paths.extend(os.path.join(root, name) for name in files if name.endswith(".json"))
+    paths.sort(key=os.path.getsize, reverse=True)
+    return paths[:count]
+
+def synthetic_rf_report(num_packets, rng, bandwidth=160, central_freq=6025):
+    data = []
+    for _ in range(num_packets):
+        data.append({
+            "maxEirp": round(rng.uniform(10, 36), 2),
+            "maxPSD": round(rng.uniform(-5, 23), 2),
+            "freqPsdPerMHz": [
+                {"freqMhz": freq, "psdDbmMHz": [round(rng.uniform(-20, 23), 2) for _ in range(bandwidth)]}
+                for freq in (central_freq - bandwidth, central_freq, central_freq + bandwidth)
+            ],
+        })
+    return {"rfMeasurementReport": {"centralFreq": central_freq, "channelWidth": bandwidth, "data": data}}
+
+def backends():
+    yield "json", json.loads, json.dumps, lambda obj: json.dumps(obj, indent=4)
+    if json_codec.orjson is not None:
+        yield "orjson", json_codec.loads, json_codec.dumpb, lambda obj: json_codec.dumpb(obj, pretty=True)
+
+def bench(name, obj, repeat):
+    encoded = json.dumps(obj)
+    results = []
+    for backend, loads, dumps, dumps_pretty in backends():
+        assert loads(encoded) == obj
+        results.append((backend, [
+            timeit.timeit(lambda: loads(encoded), number=repeat),
+            timeit.timeit(lambda: dumps(obj), number=repeat),
+            timeit.timeit(lambda: dumps_pretty(obj), number=repeat),
+        ]))
+    for backend, times in results:
+        print(f"{name[-32:]:<32} {len(encoded) // 1024:>7} {backend:>7} " + " ".join(f"{1000 * t / repeat:>10.3f}" for t in times))
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the JSON codec backends")
+    parser.add_argument("--vectors", type=int, default=3, help="number of test vectors, the largest ones")
+    parser.add_argument("--packets", type=int, nargs="+", default=[100, 1000],
+                        help="numbers of packets of the synthetic RF measurement reports")
+    parser.add_argument("--repeat", type=int, default=20, help="number of operations per measurement")
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    if json_codec.orjson is None:
+        print("orjson is not installed, measuring json only")
+    print(f"{'document':<32} {'KiB':>7} {'backend':>7} {'loads':>10} {'dumps':>10} {'pretty':>10}   (ms per operation)")
+    for path in largest_vectors(args.vectors):
+        with open(path, "rb") as f:
+            bench(os.path.relpath(path, vectors_dir), json.load(f), args.repeat)
+    for num_packets in args.packets:
+        bench(f"rf report {num_packets} packets", synthetic_rf_report(num_packets, rng), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
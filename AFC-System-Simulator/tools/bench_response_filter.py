@@ -0,0 +1,121 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package bench_response_filter.py : Micro-benchmark of the inquiry response filtering.
+
+Compares the indexed ResponseFilter with the former per-item linear scan of the
+inquired frequency ranges and per-request channelCfi sets, on synthetic test
+vectors with thousands of frequency ranges and channels.
+
+Usage: python3 bench_response_filter.py [--ranges 1000 2000 5000] [--inquired 50] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from afc_common.response_filter import ResponseFilter
+
+
+def linear_frequency_info(freq_info, freq_range_list):
+    filtered = []
+    for item in freq_info:
+        l, h = item["frequencyRange"]["lowFrequency"], item["frequencyRange"]["highFrequency"]
+        for low, high in freq_range_list:
+            if l >= low and h <= high:
+                filtered.append(item)
+                break
+    return filtered
+
+def linear_channel_info(chan_info, oper_class_dict):
+    filtered = []
+    for item in chan_info:
+        if item["globalOperatingClass"] in oper_class_dict:
+            resp_chans_set = set(item["channelCfi"])
+            req_chans_list = oper_class_dict[item["globalOperatingClass"]]
+            if req_chans_list:
+                req_chans_set = set(req_chans_list)
+                if req_chans_set & resp_chans_set:
+                    overlay_chans = []
+                    overlay_maxeirp = []
+                    for idx, chan in enumerate(item["channelCfi"]):
+                        if chan in req_chans_set:
+                            overlay_chans.append(chan)
+                            overlay_maxeirp.append(item["maxEirp"][idx])
+                    filtered.append(dict(item, channelCfi=overlay_chans, maxEirp=overlay_maxeirp))
+            else:
+                filtered.append(item)
+    return filtered
+
+def synthetic_response(num_ranges, rng):
+    freq_info = []
+    low = 5925
+    for _ in range(num_ranges):
+        width = rng.choice((1, 2, 5, 10, 20))
+        freq_info.append({"frequencyRange": {"lowFrequency": low, "highFrequency": low + width},
+                          "maxPsd": round(rng.uniform(-5, 23), 1)})
+        low += width
+    chan_info = []
+    for op_class in (131, 132, 133, 134, 137):
+        cfis = list(range(1, num_ranges * 4, 4))
+        chan_info.append({"globalOperatingClass": op_class, "channelCfi": cfis,
+                          "maxEirp": [round(rng.uniform(10, 36), 1) for _ in cfis]})
+    return {"availableFrequencyInfo": freq_info, "availableChannelInfo": chan_info}, low
+
+def synthetic_inquiry(num_inquired, high_limit, num_ranges, rng):
+    freq_range_list = []
+    for _ in range(num_inquired):
+        low = rng.randint(5925, high_limit)
+        freq_range_list.append((low, low + rng.randint(20, 500)))
+    oper_class_dict = {op_class: rng.sample(range(1, num_ranges * 4, 4), num_ranges // 2) for op_class in (131, 133, 137)}
+    oper_class_dict[134] = None
+    return freq_range_list, oper_class_dict
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the inquiry response filtering")
+    parser.add_argument("--ranges", type=int, nargs="+", default=[100, 1000, 5000],
+                        help="numbers of availableFrequencyInfo items and channels per operating class")
+    parser.add_argument("--inquired", type=int, default=50, help="number of inquired frequency ranges")
+    parser.add_argument("--repeat", type=int, default=20, help="number of filtered inquiries per measurement")
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    print(f"{'ranges':>8} {'linear freq':>12} {'indexed freq':>13} {'linear chan':>12} {'indexed chan':>13}   (ms per inquiry)")
+    for num_ranges in args.ranges:
+        inquiry_response, high_limit = synthetic_response(num_ranges, rng)
+        freq_range_list, oper_class_dict = synthetic_inquiry(args.inquired, high_limit, num_ranges, rng)
+        response_filter = ResponseFilter(inquiry_response)
+
+        # Both implementations answer the same
+        indexed_freq = response_filter.frequency_info(freq_range_list)
+        indexed_chan = response_filter.channel_info(oper_class_dict)
+        assert (inquiry_response["availableFrequencyInfo"] if indexed_freq is None else indexed_freq) == \
+            linear_frequency_info(inquiry_response["availableFrequencyInfo"], freq_range_list)
+        assert (inquiry_response["availableChannelInfo"] if indexed_chan is None else indexed_chan) == \
+            linear_channel_info(inquiry_response["availableChannelInfo"], oper_class_dict)
+
+        results = [
+            timeit.timeit(lambda: linear_frequency_info(inquiry_response["availableFrequencyInfo"], freq_range_list), number=args.repeat),
+            timeit.timeit(lambda: response_filter.frequency_info(freq_range_list), number=args.repeat),
+            timeit.timeit(lambda: linear_channel_info(inquiry_response["availableChannelInfo"], oper_class_dict), number=args.repeat),
+            timeit.timeit(lambda: response_filter.channel_info(oper_class_dict), number=args.repeat),
+        ]
+        print(f"{num_ranges:>8} " + " ".join(f"{1000 * r / args.repeat:>12.3f}" for r in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package compile_vectors.py : Compilation of the test vector directories into bundles.
+
+Validates every test vector file of the test vector directories (the files at
+the root and under the country sub-directories) and writes the bundle of each
+directory (test_vectors/vectors.bundle), memory-mapped by the AFC simulator
+services at startup. A file which can't be parsed, a test vector with a missing
+or inconsistent field and two files of the same test vector fail the
+compilation: the errors are printed, no bundle is written and the exit status
+is 1.
+
+By default the test vectors of the AFC simulator and of the AFC simulator for
+fixed client connected SP AP are compiled.
+
+Usage: python3 compile_vectors.py [test_vector_dir ...] [--check]
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from afc_common import json_codec
+from afc_common.response_filter import ResponseFilter
+from afc_common.response_template import ResponseTemplate
+from afc_common.vector_bundle import (
+    bundle_filename,
+    list_vector_files,
+    parse_vector_filename,
+    validate_vector,
+    write_bundle,
+)
+
+simulator_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+default_dirs = (
+    os.path.join(simulator_dir, "afc_simulator_service/app/test_vectors"),
+    os.path.join(simulator_dir, "afc_fc_ap_service/app/test_vectors"),
+)
+
+
+def compile_dir(root_dir):
+    """Returns the bundled files [(name, stat, content)] and the errors of a test vector directory"""
+    files, errors, names_by_key = [], [], {}
+    for path, country in sorted(list_vector_files(root_dir)):
+        key = parse_vector_filename(os.path.basename(path), country)
+        if key is None:
+            continue
+        name = os.path.relpath(path, root_dir).replace(os.sep, "/")
+        if key in names_by_key:
+            errors.append(f"{name}: same test vector {key} as {names_by_key[key]}")
+            continue
+        names_by_key[key] = name
+        try:
+            with open(path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                content = f.read()
+            data = json_codec.loads(content)
+        except (OSError, ValueError) as err:
+            errors.append(f"{name}: {err}")
+            continue
+        vector_errors = validate_vector(data, key)
+        if not vector_errors:
+            try:
+                ResponseTemplate(data["responses"])
+                ResponseFilter(data["responses"]["availableSpectrumInquiryResponses"][0])
+            except Exception as err:
+                vector_errors.append(f"response can't be encoded: {type(err).__name__}: {err}")
+        errors.extend(f"{name}: {error}" for error in vector_errors)
+        files.append((name, stat, content))
+    return files, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compilation of the test vector directories into bundles")
+    parser.add_argument("dirs", nargs="*", default=list(default_dirs), help="test vector directories")
+    parser.add_argument("--check", action="store_true", help="validate the test vectors without writing the bundles")
+    args = parser.parse_args()
+
+    compiled, failed = [], False
+    for root_dir in args.dirs:
+        files, errors = compile_dir(root_dir)
+        for error in errors:
+            print(f"{root_dir}: {error}")
+        failed = failed or bool(errors)
+        compiled.append((root_dir, files))
+    if failed:
+        print("Invalid test vectors, no bundle written")
+        sys.exit(1)
+
+    for root_dir, files in compiled:
+        size = sum(len(content) for _, _, content in files)
+        if args.check:
+            print(f"{root_dir}: {len(files)} test vectors valid")
+            continue
+        write_bundle(os.path.join(root_dir, bundle_filename), files)
+        print(f"{root_dir}: {len(files)} test vectors, {size} bytes -> {bundle_filename}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package load_test.py : Load and latency benchmark of the Available Spectrum Inquiry endpoints.
+
+Sends generated Available Spectrum Inquiry Requests v1.4 to the AFC simulator
+and/or the AFC fixed client SP AP service from a number of threads, each with a
+persistent HTTP connection, at a configurable total rate, and reports the
+throughput, the p50/p95/p99 latency, the HTTP statuses and the response codes.
+
+The requests cover the ellipse, linearPolygon and radialPolygon locations,
+channel only, frequency only and mixed inquiries, and the US and CA rulesets.
+The services answer with the configured test vector, which is set first when
+--purpose and --test-vector are given.
+
+The results are written as JSON with --output, and compared with the results of
+a previous run with --baseline.
+
+Usage: python3 load_test.py [--service simulator fc_ap] [--threads 8] [--rate 200] [--duration 30]
+                            [--purpose RSA --test-vector 3] [--output results.json] [--baseline previous.json]
+"""
+import argparse
+import http.client
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from urllib.parse import urlsplit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from afc_common import json_codec
+from afc_common.channel_plan import bw_to_op_class, rulesets
+from tool_lib import Connection, percentile
+
+services = {
+    "simulator": "http://localhost:5000/afc-simulator-api",
+    "fc_ap": "http://localhost:5001/afc-fc-ap-api",
+}
+shapes = ("channel", "frequency", "mixed")
+location_types = ("ellipse", "linearPolygon", "radialPolygon")
+# Location of the requests of each country
+country_centers = {"US": (40.7506, -73.9935), "CA": (45.4215, -75.6972)}
+country_rulesets = {plan.country_code: ruleset_id for ruleset_id, plan in rulesets.items()}
+
+
+def build_location(location_type, country, rng):
+    latitude, longitude = country_centers[country]
+    latitude += rng.uniform(-0.05, 0.05)
+    longitude += rng.uniform(-0.05, 0.05)
+    if location_type == "ellipse":
+        location = {"ellipse": {"center": {"latitude": latitude, "longitude": longitude},
+                                "majorAxis": 100, "minorAxis": 50, "orientation": 70}}
+    elif location_type == "linearPolygon":
+        location = {"linearPolygon": {"outerBoundary": [
+            {"latitude": latitude + dlat, "longitude": longitude + dlon}
+            for dlat, dlon in ((0.0005, -0.0005), (0.0005, 0.0005), (-0.0005, 0.0005), (-0.0005, -0.0005))
+        ]}}
+    else:
+        location = {"radialPolygon": {"center": {"latitude": latitude, "longitude": longitude}, "outerBoundary": [
+            {"angle": angle, "length": rng.randint(30, 80)} for angle in range(0, 360, 45)
+        ]}}
+    location["elevation"] = {"height": rng.randint(3, 30), "heightType": "AGL", "verticalUncertainty": 5}
+    location["indoorDeployment"] = rng.choice((0, 1, 2))
+    return location
+
+
+def build_request(request_id, shape, location_type, country, rng):
+    """Returns an Available Spectrum Inquiry Request message"""
+    plan = rulesets[country_rulesets[country]]
+    req = {
+        "requestId": str(request_id),
+        "deviceDescriptor": {
+            "serialNumber": f"LOADTEST{request_id % 100:04d}",
+            "certificationId": [{"rulesetId": plan.ruleset_id, "id": "TESTCERT0001"}],
+        },
+        "location": build_location(location_type, country, rng),
+        "minDesiredPower": 18,
+    }
+    if shape in ("frequency", "mixed"):
+        req["inquiredFrequencyRange"] = [
+            {"lowFrequency": 5925, "highFrequency": 6425},
+            {"lowFrequency": 6525, "highFrequency": 6875},
+        ]
+    if shape in ("channel", "mixed"):
+        req["inquiredChannels"] = []
+        for bw in (20, 40, 80, 160, 320):
+            item = {"globalOperatingClass": bw_to_op_class[bw]}
+            # Some inquiries ask for all the channels of the operating class
+            if rng.random() < 0.7:
+                cfis = plan.channels[bw]
+                item["channelCfi"] = sorted(rng.sample(cfis, rng.randint(1, len(cfis))))
+            req["inquiredChannels"].append(item)
+    return {"version": "1.4", "availableSpectrumInquiryRequests": [req]}
+
+
+class LoadRun:
+    """Requests sent to one service and their results"""
+
+    def __init__(self, url, requests, args):
+        self.url = url
+        self.requests = requests
+        self.args = args
+        self.latencies = []
+        self.statuses = Counter()
+        self.response_codes = Counter()
+        self.errors = Counter()
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def __next_slot(self):
+        """Returns (index, send time) of the next request, None when the run is over"""
+        with self._lock:
+            index = self._next
+            self._next += 1
+        if self.args.requests and index >= self.args.requests:
+            return None
+        now = time.perf_counter()
+        send_time = self.start + index / self.args.rate if self.args.rate else now
+        # A service slower than the rate ends the run at the duration as well
+        if max(send_time, now) - self.start >= self.args.duration:
+            return None
+        return index, send_time
+
+    def __worker(self):
+        conn = Connection(self.url, self.args.timeout)
+        latencies, statuses, codes, errors = [], Counter(), Counter(), Counter()
+        while True:
+            slot = self.__next_slot()
+            if slot is None:
+                break
+            index, send_time = slot
+            delay = send_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            body = self.requests[index % len(self.requests)]
+            sent = time.perf_counter()
+            try:
+                status, content = conn.request("POST", body=body, headers={"Content-Type": "application/json"})
+            except Exception as err:
+                errors[type(err).__name__] += 1
+                continue
+            latencies.append(time.perf_counter() - sent)
+            statuses[status] += 1
+            try:
+                codes[json_codec.loads(content)["availableSpectrumInquiryResponses"][0]["response"]["responseCode"]] += 1
+            except (ValueError, KeyError, IndexError, TypeError):
+                codes["invalid"] += 1
+        with self._lock:
+            self.latencies.extend(latencies)
+            self.statuses.update(statuses)
+            self.response_codes.update(codes)
+            self.errors.update(errors)
+
+    def run(self):
+        threads = [threading.Thread(target=self.__worker, daemon=True) for _ in range(self.args.threads)]
+        self.start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - self.start
+        return self.summary()
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        completed = len(latencies)
+
+        def ms(value):
+            return None if value is None else round(1000 * value, 3)
+
+        return {
+            "url": self.url,
+            "requests": completed + sum(self.errors.values()),
+            "completed": completed,
+            "elapsed_s": round(self.elapsed, 3),
+            "throughput_rps": round(completed / self.elapsed, 1) if self.elapsed else 0,
+            "latency_ms": {
+                "mean": ms(sum(latencies) / completed) if completed else None,
+                "p50": ms(percentile(latencies, 0.50)),
+                "p95": ms(percentile(latencies, 0.95)),
+                "p99": ms(percentile(latencies, 0.99)),
+                "max": ms(latencies[-1]) if latencies else None,
+            },
+            "http_status": {str(k): v for k, v in sorted(self.statuses.items(), key=str)},
+            "response_codes": {str(k): v for k, v in sorted(self.response_codes.items(), key=str)},
+            "errors": dict(self.errors),
+        }
+
+
+def configure(base_url, args):
+    """Sets the test vector of a service"""
+    parts = urlsplit(base_url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=args.timeout)
+    setting = {"unitUnderTest": "AFCD", "purpose": args.purpose, "testVector": args.test_vector}
+    if args.phase:
+        setting["phase"] = args.phase
+    if len(args.countries) == 1:
+        setting["countryCode"] = args.countries[0]
+    conn.request("POST", parts.path + "/set-response", body=json_codec.dumpb(setting),
+                 headers={"Content-Type": "application/json"})
+    res = conn.getresponse()
+    content = res.read()
+    conn.close()
+    if res.status != 200:
+        raise RuntimeError(f"{base_url}/set-response failed, status code {res.status}: {content[:200]}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_summary(name, summary, baseline=None):
+    latency = summary["latency_ms"]
+    print(f"{name}: {summary['completed']}/{summary['requests']} requests in {summary['elapsed_s']} s, "
+          f"{summary['throughput_rps']} req/s")
+    print(f"  latency ms  mean {latency['mean']}  p50 {latency['p50']}  p95 {latency['p95']}  "
+          f"p99 {latency['p99']}  max {latency['max']}")
+    print(f"  http status {summary['http_status']}  response codes {summary['response_codes']}  errors {summary['errors']}")
+    if baseline:
+        base_latency = baseline["latency_ms"]
+        deltas = []
+        for key in ("p50", "p95", "p99"):
+            if latency[key] is not None and base_latency.get(key):
+                deltas.append(f"{key} {100 * (latency[key] - base_latency[key]) / base_latency[key]:+.1f}%")
+        if baseline.get("throughput_rps"):
+            deltas.append(f"throughput {100 * (summary['throughput_rps'] - baseline['throughput_rps']) / baseline['throughput_rps']:+.1f}%")
+        print(f"  vs baseline {', '.join(deltas)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load and latency benchmark of the Available Spectrum Inquiry endpoints")
+    parser.add_argument("--service", nargs="+", choices=tuple(services), default=["simulator"],
+                        help="services to load, one after the other")
+    parser.add_argument("--url", action="append", default=[], metavar="NAME=URL",
+                        help="base URL of a service, e.g. simulator=http://host:5000/afc-simulator-api")
+    parser.add_argument("--threads", type=int, default=8, help="number of concurrent connections")
+    parser.add_argument("--rate", type=float, default=0, help="total requests per second, 0 for as fast as possible")
+    parser.add_argument("--duration", type=float, default=30, help="maximum duration of the run of a service in seconds")
+    parser.add_argument("--requests", type=int, default=0, help="number of requests per service, 0 for no limit")
+    parser.add_argument("--shapes", nargs="+", choices=shapes, default=list(shapes), help="inquiry shapes")
+    parser.add_argument("--locations", nargs="+", choices=location_types, default=list(location_types),
+                        help="location types")
+    parser.add_argument("--countries", nargs="+", choices=tuple(country_rulesets), default=["US"],
+                        help="rulesets of the requests, of the test vector country")
+    parser.add_argument("--distinct", type=int, default=200, help="number of distinct requests sent in turn")
+    parser.add_argument("--purpose", help="set the test vector of the services first: test purpose, e.g. RSA")
+    parser.add_argument("--test-vector", type=int, default=3, help="test vector set with --purpose")
+    parser.add_argument("--phase", type=int, help="test vector phase set with --purpose")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generated requests")
+    parser.add_argument("--timeout", type=float, default=30, help="request timeout in seconds")
+    parser.add_argument("--label", help="label of the run saved with the results, e.g. a branch name")
+    parser.add_argument("--output", help="JSON file the results are written to")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare with")
+    args = parser.parse_args()
+
+    urls = dict(services)
+    for item in args.url:
+        name, _, url = item.partition("=")
+        urls[name] = url.rstrip("/")
+
+    rng = random.Random(args.seed)
+    requests = [
+        json_codec.dumpb(build_request(index, rng.choice(args.shapes), rng.choice(args.locations),
+                                       rng.choice(args.countries), rng))
+        for index in range(args.distinct)
+    ]
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "rb") as f:
+            baseline = json_codec.load(f)["results"]
+
+    started = datetime.utcnow()
+    results = {}
+    for name in args.service:
+        if args.purpose:
+            configure(urls[name], args)
+        results[name] = LoadRun(urls[name] + "/availableSpectrumInquiry", requests, args).run()
+        print_summary(name, results[name], baseline.get(name) if baseline else None)
+
+    if args.output:
+        report = {
+            "label": args.label,
+            "commit": git_commit(),
+            "started": started.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            f.write(json_codec.dumps(report, pretty=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package replay.py : Replay of a recording of the AFC simulator exchanges.
+
+Sends the requests of a recording file, written by the AFC simulator in
+recording mode (AFC_RECORD_FILE or POST /afc-simulator-api/recording), to an
+AFC simulator and compares each response with the recorded one. The
+availabilityExpireTime and the received request headers, which change from
+one run to the other, are ignored (--ignore).
+
+By default the requests are sent in the recording order on one connection, as
+fast as possible. With --timing original the requests are sent at their
+recorded start times (scaled by --speed), from several connections, so held
+responses and concurrent inquiries overlap as they did when recorded.
+
+The random test vectors set without a seed are set again with the seed of the
+recorded response, so that the replayed random responses can be compared.
+
+Reports the mismatches and the replay latency of each route against the
+recorded handling time (measured by the server, the replay latency includes the
+network round trip).
+
+Usage: python3 replay.py recording.jsonl.gz [--url http://localhost:5000/afc-simulator-api]
+                         [--timing original --speed 2] [--output results.json]
+"""
+import argparse
+import gzip
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from afc_common import json_codec
+from tool_lib import Connection, percentile
+
+default_ignored_fields = ("availabilityExpireTime", "receivedRequestHeaders")
+# Headers set by the HTTP connection of the replay
+connection_headers = ("host", "content-length", "connection", "keep-alive", "transfer-encoding")
+
+
+def read_records(path):
+    """Returns the records of a recording file in the recording order"""
+    with (gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")) as f:
+        return [json_codec.loads(line) for line in f if line.strip()]
+
+
+def replayed_request(record):
+    """Returns the body of the replayed request of a record"""
+    body = record["request"]
+    if record["path"] != "/set-response":
+        return body
+    try:
+        setting = json_codec.loads(body)
+        seed = json_codec.loads(record["response"]).get("seed")
+    except (ValueError, AttributeError):
+        return body
+    if seed is not None and setting.get("random") and setting.get("seed") is None:
+        setting["seed"] = seed
+        return json_codec.dumps(setting)
+    return body
+
+
+def differences(recorded, replayed, ignored, path=""):
+    """Yields the paths where two JSON documents differ"""
+    if isinstance(recorded, dict) and isinstance(replayed, dict):
+        for key in sorted(set(recorded) | set(replayed), key=str):
+            if key in ignored:
+                continue
+            if key not in recorded or key not in replayed:
+                yield f"{path}/{key}"
+            else:
+                yield from differences(recorded[key], replayed[key], ignored, f"{path}/{key}")
+    elif isinstance(recorded, list) and isinstance(replayed, list):
+        if len(recorded) != len(replayed):
+            yield f"{path} (length {len(recorded)} != {len(replayed)})"
+        for index, (recorded_item, replayed_item) in enumerate(zip(recorded, replayed)):
+            yield from differences(recorded_item, replayed_item, ignored, f"{path}/{index}")
+    elif recorded != replayed:
+        yield path or "/"
+
+
+def compare(record, status, content, ignored):
+    """Returns the differences of a replayed response with the recorded one"""
+    diffs = []
+    if status != record["status"]:
+        diffs.append(f"status {record['status']} != {status}")
+    try:
+        recorded, replayed = json_codec.loads(record["response"]), json_codec.loads(content)
+    except ValueError:
+        if record["response"].encode() != content:
+            diffs.append("body")
+        return diffs
+    diffs.extend(differences(recorded, replayed, ignored))
+    return diffs
+
+
+def send(conn, record):
+    """Sends the request of a record on a Connection, returns (status, content)"""
+    headers = {k: v for k, v in record["headers"].items() if k.lower() not in connection_headers}
+    path = record["path"] + (f"?{record['query']}" if record["query"] else "")
+    body = replayed_request(record) if record["request"] else None
+    return conn.request(record["method"], path, body=body.encode() if body else None, headers=headers)
+
+
+class Replay:
+    """Replayed records and their results"""
+
+    def __init__(self, records, args):
+        self.records = records
+        self.args = args
+        self.ignored = set(args.ignore)
+        self.latencies = defaultdict(list)
+        self.mismatches = []
+        self.errors = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def __connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = Connection(self.args.url, self.args.timeout)
+        return conn
+
+    def __send(self, record):
+        sent = time.perf_counter()
+        try:
+            status, content = send(self.__connection(), record)
+        except Exception as err:
+            with self._lock:
+                self.errors.append({"seq": record["seq"], "path": record["path"], "error": f"{type(err).__name__}: {err}"})
+            return
+        latency = time.perf_counter() - sent
+        diffs = compare(record, status, content, self.ignored)
+        with self._lock:
+            self.latencies[record["path"]].append(latency)
+            if diffs:
+                self.mismatches.append({"seq": record["seq"], "path": record["path"], "differences": diffs})
+
+    def run(self):
+        self.start = time.perf_counter()
+        if self.args.timing == "original":
+            records = sorted(self.records, key=lambda record: record["start"])
+            first = records[0]["start"] if records else 0
+            with ThreadPoolExecutor(self.args.threads) as executor:
+                for record in records:
+                    delay = self.start + (record["start"] - first) / self.args.speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    executor.submit(self.__send, record)
+        else:
+            for record in self.records:
+                self.__send(record)
+        self.elapsed = time.perf_counter() - self.start
+        self.mismatches.sort(key=lambda mismatch: mismatch["seq"])
+        return self.summary()
+
+    def summary(self):
+        recorded = defaultdict(list)
+        for record in self.records:
+            recorded[record["path"]].append(record["duration"])
+
+        def ms(values, fraction):
+            value = percentile(sorted(values), fraction)
+            return None if value is None else round(1000 * value, 3)
+
+        replayed = sum(len(latencies) for latencies in self.latencies.values())
+        return {
+            "url": self.args.url,
+            "timing": self.args.timing,
+            "records": len(self.records),
+            "replayed": replayed,
+            "elapsed_s": round(self.elapsed, 3),
+            "throughput_rps": round(replayed / self.elapsed, 1) if self.elapsed else 0,
+            "routes": {
+                path: {
+                    "count": len(recorded[path]),
+                    "recorded_ms": {"p50": ms(recorded[path], 0.50), "p95": ms(recorded[path], 0.95)},
+                    "replayed_ms": {"p50": ms(self.latencies[path], 0.50), "p95": ms(self.latencies[path], 0.95)},
+                }
+                for path in sorted(recorded)
+            },
+            "mismatches": self.mismatches,
+            "errors": self.errors,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay of a recording of the AFC simulator exchanges")
+    parser.add_argument("recording", help="recording file (.jsonl or .jsonl.gz)")
+    parser.add_argument("--url", default="http://localhost:5000/afc-simulator-api", help="base URL of the AFC simulator API")
+    parser.add_argument("--timing", choices=("none", "original"), default="none",
+                        help="none: in the recording order as fast as possible, original: at the recorded times")
+    parser.add_argument("--speed", type=float, default=1.0, help="speed-up factor of the original timing")
+    parser.add_argument("--threads", type=int, default=16, help="maximum concurrent requests of the original timing")
+    parser.add_argument("--paths", nargs="+", help="replay only these routes, e.g. /availableSpectrumInquiry")
+    parser.add_argument("--ignore", nargs="*", default=list(default_ignored_fields),
+                        help="JSON fields ignored by the comparison")
+    parser.add_argument("--max-diffs", type=int, default=10, help="number of mismatches printed")
+    parser.add_argument("--timeout", type=float, default=300, help="request timeout in seconds")
+    parser.add_argument("--output", help="JSON file the results are written to")
+    args = parser.parse_args()
+
+    records = [record for record in read_records(args.recording) if not args.paths or record["path"] in args.paths]
+    summary = Replay(records, args).run()
+
+    print(f"{summary['replayed']}/{summary['records']} requests replayed in {summary['elapsed_s']} s, "
+          f"{summary['throughput_rps']} req/s")
+    for path, route in summary["routes"].items():
+        print(f"  {path:<26} {route['count']:>6}  recorded ms p50 {route['recorded_ms']['p50']} p95 {route['recorded_ms']['p95']}"
+              f"  replayed ms p50 {route['replayed_ms']['p50']} p95 {route['replayed_ms']['p95']}")
+    print(f"{len(summary['mismatches'])} mismatches, {len(summary['errors'])} errors")
+    for mismatch in summary["mismatches"][:args.max_diffs]:
+        print(f"  #{mismatch['seq']} {mismatch['path']}: {', '.join(mismatch['differences'][:5])}")
+    for error in summary["errors"][:args.max_diffs]:
+        print(f"  #{error['seq']} {error['path']}: {error['error']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(json_codec.dumps(summary, pretty=True))
+    sys.exit(1 if summary["mismatches"] or summary["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package tls_client.py : Connection overhead benchmark of the AFC simulator over TLS.
+
+Sends Available Spectrum Inquiry Requests to an AFC simulator terminating TLS
+(app.py --tls-cert server.pem --tls-key server.key) as a DUT re-inquiring
+periodically would, in three connection modes:
+    full      : a new connection and a full TLS handshake per inquiry
+    resume    : a new connection per inquiry, resuming the previous TLS session
+    keepalive : all the inquiries on one kept-alive connection, reconnecting
+                with session resumption when the server closes the connection
+and reports the connection (TCP and TLS handshake) and request latencies of each
+mode, with the handshake and resumption counts of the server (/tls-stats).
+
+Usage: python3 tls_client.py [--url https://localhost:5000/afc-simulator-api] [--ca afc_ca.pem]
+                             [--modes full resume keepalive] [--requests 100]
+"""
+import argparse
+import os
+import socket
+import ssl
+import sys
+import time
+from urllib.parse import urlsplit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from afc_common import json_codec
+from tool_lib import percentile
+
+modes = ("full", "resume", "keepalive")
+
+inquiry = {
+    "version": "1.4",
+    "availableSpectrumInquiryRequests": [{
+        "requestId": "0",
+        "deviceDescriptor": {
+            "serialNumber": "TLS-CLIENT",
+            "certificationId": [{"rulesetId": "US_47_CFR_PART_15_SUBPART_E", "id": "TLS-CLIENT"}],
+        },
+        "location": {
+            "ellipse": {"center": {"latitude": 40.7506, "longitude": -73.9935},
+                        "majorAxis": 100, "minorAxis": 50, "orientation": 70},
+            "elevation": {"height": 15, "heightType": "AGL", "verticalUncertainty": 5},
+            "indoorDeployment": 2,
+        },
+        "inquiredFrequencyRange": [{"lowFrequency": 5925, "highFrequency": 6425}],
+        "inquiredChannels": [{"globalOperatingClass": 131}, {"globalOperatingClass": 133}],
+    }],
+}
+
+
+class TlsConnection:
+    """HTTP/1.1 connection over TLS, reading the responses by Content-Length"""
+
+    def __init__(self, context, host, port, timeout, session=None):
+        start = time.perf_counter()
+        sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock = context.wrap_socket(sock, server_hostname=host, session=session)
+        self.connect_time = time.perf_counter() - start
+        self.reader = self.sock.makefile("rb")
+        # Set when the server closes the connection after the response
+        self.closing = False
+
+    def request(self, method, host, path, body=b"", keep_alive=True):
+        headers = [f"{method} {path} HTTP/1.1", f"Host: {host}", f"Content-Length: {len(body)}",
+                   "Connection: " + ("keep-alive" if keep_alive else "close")]
+        if body:
+            headers.append("Content-Type: application/json")
+        self.sock.sendall(("\r\n".join(headers) + "\r\n\r\n").encode() + body)
+        status = int(self.reader.readline().split()[1])
+        length = 0
+        while True:
+            line = self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+            elif name.strip().lower() == "connection" and value.strip().lower() == "close":
+                self.closing = True
+        return status, self.reader.read(length)
+
+    @property
+    def session(self):
+        return self.sock.session
+
+    @property
+    def session_reused(self):
+        return self.sock.session_reused
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+
+def server_stats(context, host, port, path, timeout):
+    conn = TlsConnection(context, host, port, timeout)
+    try:
+        status, content = conn.request("GET", host, path + "/tls-stats", keep_alive=False)
+        return json_codec.loads(content) if status == 200 else {}
+    finally:
+        conn.close()
+
+
+def run_mode(mode, context, host, port, path, args):
+    """Returns the connection and request latencies and the resumed sessions of a mode"""
+    body = json_codec.dumpb(inquiry)
+    connects, latencies, resumed, statuses = [], [], 0, {}
+    conn = None
+    session = None
+    for index in range(args.requests):
+        if conn is None:
+            conn = TlsConnection(context, host, port, args.timeout, session if mode != "full" else None)
+            connects.append(conn.connect_time)
+            resumed += conn.session_reused
+        keep_alive = mode == "keepalive" and index < args.requests - 1
+        start = time.perf_counter()
+        status, _ = conn.request("POST", host, path + "/availableSpectrumInquiry", body, keep_alive)
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+        if not keep_alive or conn.closing:
+            # The TLS 1.3 session tickets are received with the response
+            session = conn.session
+            conn.close()
+            conn = None
+        if args.interval:
+            time.sleep(args.interval)
+    return connects, latencies, resumed, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Connection overhead benchmark of the AFC simulator over TLS")
+    parser.add_argument("--url", default="https://localhost:5000/afc-simulator-api", help="base URL of the AFC simulator API")
+    parser.add_argument("--ca", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../afc_ca.pem"),
+                        help="CA certificate of the server certificate")
+    parser.add_argument("--insecure", action="store_true", help="don't verify the server certificate")
+    parser.add_argument("--modes", nargs="+", choices=modes, default=list(modes), help="connection modes")
+    parser.add_argument("--requests", type=int, default=100, help="number of inquiries per mode")
+    parser.add_argument("--interval", type=float, default=0, help="seconds between two inquiries")
+    parser.add_argument("--tls-version", choices=("1.2", "1.3"), help="maximum TLS version")
+    parser.add_argument("--timeout", type=float, default=30, help="socket timeout in seconds")
+    args = parser.parse_args()
+
+    parts = urlsplit(args.url)
+    host, port, path = parts.hostname, parts.port or 443, parts.path.rstrip("/")
+    context = ssl.create_default_context(cafile=None if args.insecure else args.ca)
+    if args.insecure:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    if args.tls_version:
+        context.maximum_version = ssl.TLSVersion.TLSv1_2 if args.tls_version == "1.2" else ssl.TLSVersion.TLSv1_3
+
+    def ms(values, fraction):
+        value = percentile(sorted(values), fraction)
+        return "-" if value is None else f"{1000 * value:.3f}"
+
+    print(f"{'mode':<10} {'connections':>11} {'resumed':>8} {'connect p50':>12} {'p95':>8} "
+          f"{'request p50':>12} {'p95':>8} {'total ms':>9}   status")
+    for mode in args.modes:
+        before = server_stats(context, host, port, path, args.timeout)
+        start = time.perf_counter()
+        connects, latencies, resumed, statuses = run_mode(mode, context, host, port, path, args)
+        elapsed = time.perf_counter() - start
+        after = server_stats(context, host, port, path, args.timeout)
+        print(f"{mode:<10} {len(connects):>11} {resumed:>8} {ms(connects, 0.5):>12} {ms(connects, 0.95):>8} "
+              f"{ms(latencies, 0.5):>12} {ms(latencies, 0.95):>8} {1000 * elapsed:>9.1f}   {statuses}")
+        if after.get("enabled"):
+            # The /tls-stats request made after the run is a full handshake
+            deltas = {key: after[key] - before.get(key, 0) for key in ("handshakes", "resumedHandshakes", "fullHandshakes")}
+            print(f"{'':<10} server {deltas}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+"""@package tool_lib.py : Helpers shared by the benchmark and replay tools.
+
+percentile computes the latency percentiles reported by the tools, and
+Connection is the persistent HTTP connection of a client thread of
+load_test.py and replay.py.
+"""
+import http.client
+from urllib.parse import urlsplit
+
+
+def percentile(sorted_values, fraction):
+    """Returns the nearest-rank percentile of sorted values"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class Connection:
+    """Persistent HTTP connection of a client thread, reconnecting after a failed request"""
+
+    def __init__(self, url, timeout):
+        parts = urlsplit(url)
+        self.host, self.port, self.path = parts.hostname, parts.port or 80, parts.path.rstrip("/")
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path="", body=None, headers=None):
+        """Sends a request to path under the URL of the connection, returns (status, content)"""
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            self.conn.request(method, self.path + path, body=body, headers=headers or {})
+            res = self.conn.getresponse()
+            return res.status, res.read()
+        except Exception:
+            self.conn.close()
+            self.conn = None
+            raise
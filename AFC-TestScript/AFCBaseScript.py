@@ -14,8 +14,6 @@
 # OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
 # SOFTWARE.
 
-import math
-import json
 import os
 import re
 import traceback
@@ -29,6 +27,8 @@ from IndigoTestScripts.Programs.AFC.afc_enums import AFCParams, GeoArea, Deploym
 from IndigoTestScripts.Programs.AFC.afc_lib import AFCLib
 from IndigoTestScripts.Programs.AFC.rf_measurement_validation import RfMeasurementValidation
 from IndigoTestScripts.Programs.AFC.spectrum_analyzer_lib import SpectrumAnalyzerLib
+import IndigoTestScripts.Programs.AFC.afc_common_path
+from afc_common import channel_plan, json_codec
 
 class AFCBaseScript(TestScript):
     def __init__(self, dut_type):
@@ -51,6 +51,9 @@ class AFCBaseScript(TestScript):
 
         if stop_ocsp:
             InstructionLib.stop_ocsp_server(8888)
+        # Wait for the AFC simulator services started or restarted before the test case
+        if not AFCLib.wait_afc_ready():
+            raise RuntimeError("AFC simulator services are not ready")
         # Reset AFC simulator Test Vector
         AFCLib.reset_afc("setup")
         InstructionLib.set_band(self.operational_band)
@@ -195,7 +198,7 @@ class AFCBaseScript(TestScript):
             if cfi == 0:
                 InstructionLib.log_error(f"AFC DUT's operating channel {op_channel} is not correct primary 20 MHz channel")
                 return False, False
-        op_freq = int(5950 + cfi*5)
+        op_freq = channel_plan.channel_to_freq(cfi)
         sp_limit_psd = RfMeasurementValidation(sent_resp , {}).get_sp_limit_by_freq(op_freq, op_bandwidth)
 
         if op_bandwidth == 20:
@@ -239,7 +242,7 @@ class AFCBaseScript(TestScript):
             if cfi == 0:
                 InstructionLib.log_error(f"DUT's operating channel {op_channel} is not correct primary 20 MHz channel")
                 return False
-        op_freq = int(5950 + cfi*5)
+        op_freq = channel_plan.channel_to_freq(cfi)
         sp_limit_eirp = RfMeasurementValidation(sent_resp , {}).get_sp_limit_by_chan(cfi)
 
         if op_bandwidth == 20:
@@ -283,7 +286,7 @@ class AFCBaseScript(TestScript):
             if cfi == 0:
                 InstructionLib.log_error(f"DUT's operating channel {op_channel} is not correct primary 20 MHz channel")
                 return False, False
-        op_freq = int(5950 + cfi*5)
+        op_freq = channel_plan.channel_to_freq(cfi)
         sp_limit_psd,  sp_limit_eirp = RfMeasurementValidation(sent_resp , {}).get_sp_limit_by_both(cfi, op_bandwidth)
 
         if op_bandwidth == 20:
@@ -485,43 +488,17 @@ class AFCBaseScript(TestScript):
                 if freq_range["frequencyRange"]["lowFrequency"] < freq and freq_range["frequencyRange"]["highFrequency"] > freq:
                     psd = freq_range["maxPsd"]
                     bw = __class__.get_bw_from_cfi(channel) 
-                    power = psd + 10 * math.log10(bw)
                     # SP mode max EIRP: 36
-                    if power > 36:
-                        power = 36
+                    power = channel_plan.psd_to_eirp(psd, bw)
         return power
 
     @staticmethod
     def get_bw_from_cfi(cfi):
-        cfi_list = [7, 23, 39, 55, 71, 87, 135, 151, 167]
-        cfi_160m_list = [15, 47, 79, 111, 143, 175, 207]
-        if cfi in cfi_160m_list:
-            return 160
-        for index in cfi_list:
-            if cfi == index:
-                return 80
-            elif cfi == index - 4 or cfi == index + 4:
-                return 40
-            elif cfi == 123 or cfi == 179:
-                return 40
-
-        return 20
+        return channel_plan.get_bw_from_cfi(cfi)
 
     @staticmethod
     def get_cfi_from_op_channel(op_channel, bw):
-        cfi_bw = { 
-            40: (3, 11, 19, 27, 35, 43, 51, 59, 67, 75, 83, 91, 99, 107, 115, 123, 131, 139, 147, 155, 163, 171, 179, 187, 195, 203, 211, 219, 227),
-            80: (7, 23, 39, 55, 71, 87, 103, 119, 135, 151, 167, 183, 199, 215),
-           160: (15, 47, 79, 111, 143, 175, 207),
-           320: (31, 63, 95, 127)
-        }
-        if (op_channel % 4) != 1:
-            return 0
-        for cfi in cfi_bw[bw]:
-            if (cfi - bw/10) < op_channel < (cfi + bw/10):
-                return cfi
-
-        return 0
+        return channel_plan.get_cfi_from_op_channel(op_channel, bw)
 
     @staticmethod
     def save_rf_measurement_report(report_json, file_name):
@@ -533,7 +510,7 @@ class AFCBaseScript(TestScript):
             for index, report in enumerate(report_json):
                 if not report:
                     continue
-                json_object = json.dumps(report, indent=4)
+                json_object = json_codec.dumps(report, pretty=True)
                 if len(report_json) > 1:
                     report_file = f"[{index}]{file_name}"
                 else:
@@ -0,0 +1,40 @@
+# Copyright (c) 2022 Wi-Fi Alliance                                                
+
+# Permission to use, copy, modify, and/or distribute this software for any         
+# purpose with or without fee is hereby granted, provided that the above           
+# copyright notice and this permission notice appear in all copies.                
+
+# THE SOFTWARE IS PROVIDED 'AS IS' AND THE AUTHOR DISCLAIMS ALL                    
+# WARRANTIES WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED                    
+# WARRANTIES OF MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL                     
+# THE AUTHOR BE LIABLE FOR ANY SPECIAL, DIRECT, INDIRECT, OR                       
+# CONSEQUENTIAL DAMAGES OR ANY DAMAGES WHATSOEVER RESULTING                        
+# FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN ACTION OF                       
+# CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT                       
+# OF OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS                          
+# SOFTWARE.
+
+# This file will be copied to: /usr/local/bin/WFA-QuickTrack-Tool/IndigoTestScripts/Programs/AFC/
+"""@package afc_common_path.py : Import path of the afc_common package.
+
+The AFC test scripts share the afc_common package with the AFC simulator
+services. It is installed with the simulator services in
+/usr/local/bin/WFA-QuickTrack-Tool/QuickTrack-Tool/Test-Services (AFC-System-Simulator
+in this repository): importing this module adds that folder to sys.path.
+"""
+import os
+import sys
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+afc_common_dirs = (
+    # Installed: IndigoTestScripts/Programs/AFC and QuickTrack-Tool/Test-Services
+    os.path.join(script_dir, "../../../QuickTrack-Tool/Test-Services"),
+    # Repository: AFC-TestScript and AFC-System-Simulator
+    os.path.join(script_dir, "../AFC-System-Simulator"),
+)
+
+for path in afc_common_dirs:
+    path = os.path.abspath(path)
+    if os.path.isdir(os.path.join(path, "afc_common")) and path not in sys.path:
+        sys.path.append(path)
+        break
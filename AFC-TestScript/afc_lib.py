@@ -17,16 +17,30 @@
 # This file will be copied to: /usr/local/bin/WFA-QuickTrack-Tool/IndigoTestScripts/Programs/AFC/
 import requests
 from urllib3.exceptions import InsecureRequestWarning
-import json
 import os
 import subprocess
+import time
 import shutil
 from IndigoTestScripts.helpers.instruction_lib import InstructionLib
 from commons.shared_enums import SettingsName
+import IndigoTestScripts.Programs.AFC.afc_common_path
+from afc_common import json_codec
+from afc_common.debug_log import DEBUG, get_logger, pretty_json
+
+
+def instruction_lib_sink(level, message):
+    """Logs a message with the InstructionLib of the test script"""
+    if level > DEBUG:
+        InstructionLib.log_error(message)
+    else:
+        InstructionLib.log_debug(message)
+
+
+log = get_logger("afc_lib", sink=instruction_lib_sink)
 
 class AFCLib:
     @staticmethod
-    def set_afc_response(purpose, test_vector, phase=None, resp_wait_time=0, hold_response=False, random=False, only_random_power=False, difference_last_picks=False, channel_width=80):
+    def set_afc_response(purpose, test_vector, phase=None, resp_wait_time=0, hold_response=False, random=False, only_random_power=False, difference_last_picks=False, channel_width=80, seed=None):
         setting = {
             "unitUnderTest": "AFCD",
             "testVector": test_vector,
@@ -53,6 +67,9 @@ class AFCLib:
             if phase == 2:
                 setting["difference_last_picks"] = True
 
+        if setting.get("random") and seed is not None:
+            setting["seed"] = seed
+
         country_code = InstructionLib.get_setting(SettingsName.AFCD_COUNTRY_CODE)
         setting["countryCode"] = country_code
 
@@ -61,6 +78,12 @@ class AFCLib:
         if res.status_code != 200:
             InstructionLib.log_error(f"afc-simulator-api: Set afc response failed, status code: {res.status_code}")
             return None
+        seed = res.json().get("seed")
+        if seed is not None:
+            InstructionLib.log_debug(f"afc-simulator-api: random test vector seed {seed}")
+        # Set by the AFC simulator when it hosts the fixed client service as well (afc_combined_service)
+        if "afc-fc-ap-api" in res.json().get("linkedServices", []):
+            return None
 
         fc_ap_setting = {"countryCode" : country_code}
         res = requests.post(url="http://localhost:5001/afc-fc-ap-api/set-response", json=fc_ap_setting, verify=False)
@@ -88,10 +111,62 @@ class AFCLib:
             InstructionLib.log_error(f"Get current test status failed, status code: {res.status_code}")
             return None
         else:
-            json_response =  json.loads(res.text)
-            InstructionLib.log_debug(f"current test status : {json.dumps(json_response, indent=4)}")
+            json_response = json_codec.loads(res.content)
+            log.debug("current test status : %s", pretty_json(json_response))
             return json_response
 
+    @staticmethod
+    def upload_afc_vectors(name, vectors, country_code=None):
+        """Installs test vectors (dicts with testCaseID) in the AFC simulator as the overlay name
+
+        The overlay replaces the previous one of the same name and is answered
+        before the test vector files until remove_afc_vectors(name).
+        """
+        setting = {"vectors": vectors}
+        if country_code:
+            setting["countryCode"] = country_code
+
+        requests.packages.urllib3.disable_warnings(category=InsecureRequestWarning)
+        res = requests.post(url=f"http://localhost:5000/afc-simulator-api/vectors/{name}", json=setting, verify=False)
+        if res.status_code != 200:
+            InstructionLib.log_error(f"Upload afc test vectors failed, status code: {res.status_code} {res.json().get('message')}")
+            return None
+        return res.json()["vectors"]
+
+    @staticmethod
+    def remove_afc_vectors(name):
+        requests.packages.urllib3.disable_warnings(category=InsecureRequestWarning)
+        res = requests.delete(url=f"http://localhost:5000/afc-simulator-api/vectors/{name}", verify=False)
+        if res.status_code != 200:
+            InstructionLib.log_error(f"Remove afc test vectors failed, status code: {res.status_code}")
+            return None
+
+    @staticmethod
+    def wait_afc_ready(timeout=60, interval=0.5):
+        """Waits until the AFC simulator services answer ready, returns False on timeout
+
+        A service without /ready (404, deployed before it was added) is ready once it answers.
+        """
+        requests.packages.urllib3.disable_warnings(category=InsecureRequestWarning)
+        deadline = time.time() + timeout
+        for url in ("http://localhost:5000/afc-simulator-api/ready", "http://localhost:5001/afc-fc-ap-api/ready"):
+            while True:
+                try:
+                    res = requests.get(url=url, verify=False, timeout=interval + 1)
+                    if res.status_code == 200:
+                        log.debug("%s ready, time to ready %s s", url, res.json().get("timeToReady"))
+                        break
+                    if res.status_code == 404:
+                        log.debug("%s not found, the service predates /ready", url)
+                        break
+                except requests.exceptions.RequestException:
+                    pass
+                if time.time() >= deadline:
+                    InstructionLib.log_error(f"AFC simulator is not ready after {timeout} seconds: {url}")
+                    return False
+                time.sleep(interval)
+        return True
+
     @staticmethod
     def reset_afc(type):
         setting = {}
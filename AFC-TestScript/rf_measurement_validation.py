@@ -16,10 +16,10 @@
 
 # This file will be copied to: /usr/local/bin/WFA-QuickTrack-Tool/IndigoTestScripts/Programs/AFC/
 import math
-from commons.logger import Logger
-from commons.shared_enums import (
-    LogCategory,
-)
+import IndigoTestScripts.Programs.AFC.afc_common_path
+from afc_common.debug_log import get_logger
+
+log = get_logger("rf_validation")
 
 
 class RfMeasurementValidation:
@@ -57,7 +57,7 @@ class RfMeasurementValidation:
             adjacent_valid = self.__validate_psd_adjacent_frequencies()                
             return power_valid, adjacent_valid
         except Exception as err:            
-            Logger.log(LogCategory.ERROR, f'validate_rf_measurement_by_freq Exception: {err}')
+            log.error('validate_rf_measurement_by_freq Exception: %s', err)
             return False, False
 
     def validate_rf_measurement_by_chan(self):
@@ -66,7 +66,7 @@ class RfMeasurementValidation:
                 return False
             return self.__validate_transmit_power_by_chan()
         except Exception as err:            
-            Logger.log(LogCategory.ERROR, f'validate_rf_measurement_by_chan Exception: {err}')
+            log.error('validate_rf_measurement_by_chan Exception: %s', err)
             return False
 
     def validate_rf_measurement_by_both(self):
@@ -80,44 +80,44 @@ class RfMeasurementValidation:
             adjacent_valid = self.__validate_psd_adjacent_frequencies()
             return True, adjacent_valid
         except Exception as err:            
-            Logger.log(LogCategory.ERROR, f'validate_rf_measurement_by_both Exception: {err}')
+            log.error('validate_rf_measurement_by_both Exception: %s', err)
             return False, False
 
     def validate_lpi_transmit_power(self):
         try:
             if not self.packets:
-                Logger.log(LogCategory.ERROR, f'No data in rfMeasurementReport')
+                log.error('No data in rfMeasurementReport')
                 return False
             for pkt in self.packets:
                 if pkt["maxPSD"] > 5.0:
-                    Logger.log(LogCategory.ERROR, f'Packet maxPSD {pkt["maxPSD"]} is above LPI limits 5 dBm/MHz PSD')
+                    log.error('Packet maxPSD %s is above LPI limits 5 dBm/MHz PSD', pkt["maxPSD"])
                     return False
             return True
         except Exception as err:
-            Logger.log(LogCategory.ERROR, f'validate_lpi_transmit_power Exception: {err}')
+            log.error('validate_lpi_transmit_power Exception: %s', err)
             return False
 
     def validate_fc_transmit_power(self, criteria_psd):
         try:
             if not self.packets:
-                Logger.log(LogCategory.ERROR, f'No data in rfMeasurementReport')
+                log.error('No data in rfMeasurementReport')
                 return False
             for pkt in self.packets:
                 if pkt["maxPSD"] > criteria_psd:
-                    Logger.log(LogCategory.ERROR, f'Packet maxPSD {pkt["maxPSD"]} is above limits {criteria_psd} dBm/MHz PSD')
+                    log.error('Packet maxPSD %s is above limits %s dBm/MHz PSD', pkt["maxPSD"], criteria_psd)
                     return False
             return True
         except Exception as err:
-            Logger.log(LogCategory.ERROR, f'validate_fc_transmit_power Exception: {err}')
+            log.error('validate_fc_transmit_power Exception: %s', err)
             return False
 
     def __validate_psd_adjacent_frequencies(self):
         if not self.resp_avail_freq_info and self.packets:
-            Logger.log(LogCategory.ERROR, f'No available availableFrequencyInfo in availableSpectrumInquiryResponses.')
+            log.error('No available availableFrequencyInfo in availableSpectrumInquiryResponses.')
             return False
 
         if not self.packets:
-            Logger.log(LogCategory.ERROR, f'No data in rfMeasurementReport')
+            log.error('No data in rfMeasurementReport')
             return False
 
         for pkt in self.packets:
@@ -144,55 +144,55 @@ class RfMeasurementValidation:
             allowed_max_psd = min([psd for l,h,psd in match_freq_ranges])
             if not self.center_freq_allowed_max_psd and (self.center_freq == freq):
                 self.center_freq_allowed_max_psd = allowed_max_psd
-                Logger.log(LogCategory.DEBUG, f'self.center_freq {self.center_freq} allowed_max_psd {allowed_max_psd}')
+                log.debug('self.center_freq %s allowed_max_psd %s', self.center_freq, allowed_max_psd)
         #Logger.log(LogCategory.DEBUG, f'__validate_psd: freq {freq} chwidth {chwidth} permitted max psd {allowed_max_psd} ')
 
         for psd in psdDbmMHz:
             if psd > allowed_max_psd:
-                Logger.log(LogCategory.ERROR, f'packet psdDbmMHz {psd} is greater than permitted PSD {allowed_max_psd}')
+                log.error('packet psdDbmMHz %s is greater than permitted PSD %s', psd, allowed_max_psd)
                 return False
         return True
 
     def __validate_transmit_power_by_freq(self):                               
         if not self.resp_avail_freq_info and self.packets:
-            Logger.log(LogCategory.ERROR, f'No available availableFrequencyInfo in availableSpectrumInquiryResponses.')
+            log.error('No available availableFrequencyInfo in availableSpectrumInquiryResponses.')
             return False
 
         if not self.packets:
-            Logger.log(LogCategory.ERROR, f'No data in rfMeasurementReport')
+            log.error('No data in rfMeasurementReport')
             return False
 
         match_freq_ranges = self.__get_match_freq_ranges(self.center_freq, self.chwidth)
         if not match_freq_ranges:
-            Logger.log(LogCategory.ERROR, f'freq {self.center_freq} chwidth {self.chwidth}: can not find matched frequence ranges in availableSpectrumInquiryResponses.')
+            log.error('freq %s chwidth %s: can not find matched frequence ranges in availableSpectrumInquiryResponses.', self.center_freq, self.chwidth)
             return False
 
         allowed_max_psd = min([psd for l,h,psd in match_freq_ranges])
-        Logger.log(LogCategory.DEBUG, f'allowed_max_psd {allowed_max_psd}')
+        log.debug('allowed_max_psd %s', allowed_max_psd)
         for pkt in self.packets:
             if pkt["maxPSD"] > allowed_max_psd:
-                Logger.log(LogCategory.ERROR, f'packet maxPSD {pkt["maxPSD"]} is greater than permitted max PSD {allowed_max_psd}')
+                log.error('packet maxPSD %s is greater than permitted max PSD %s', pkt["maxPSD"], allowed_max_psd)
                 return False
 
         return True
 
     def __validate_transmit_power_by_chan(self):
         if not self.resp_avail_chan_info and self.packets:
-            Logger.log(LogCategory.ERROR, f'No available availableChannelInfo in availableSpectrumInquiryResponses.')
+            log.error('No available availableChannelInfo in availableSpectrumInquiryResponses.')
             return False
 
         if not self.packets:
-            Logger.log(LogCategory.ERROR, f'No data in rfMeasurementReport')
+            log.error('No data in rfMeasurementReport')
             return False
 
         max_eirp = get_channel_max_eirp(self.center_chan, self.resp_avail_chan_info)
         if not max_eirp:
-            Logger.log(LogCategory.ERROR, f'channelCfi {self.center_chan} is not avaliable in availableChannelInfo of availableSpectrumInquiryResponses.')
+            log.error('channelCfi %s is not avaliable in availableChannelInfo of availableSpectrumInquiryResponses.', self.center_chan)
             return False
 
         for pkt in self.packets:
             if pkt["maxEirp"] > max_eirp:
-                Logger.log(LogCategory.ERROR, f'packet EIRP {pkt["maxEirp"]} is greater than Max EIRP {max_eirp}')
+                log.error('packet EIRP %s is greater than Max EIRP %s', pkt["maxEirp"], max_eirp)
                 return False
         
         return True
@@ -207,9 +207,9 @@ class RfMeasurementValidation:
         
         if freq not in self.debug_printed_freq:
             self.debug_printed_freq.add(freq)
-            Logger.log(LogCategory.DEBUG, f'--------------------------------------------------------------')
-            Logger.log(LogCategory.DEBUG, f'freq {freq} chwidth {chwidth} freq_range {freq_range}')
-            Logger.log(LogCategory.DEBUG, f'match_freq_range {match_freq_range}')
+            log.debug('--------------------------------------------------------------')
+            log.debug('freq %s chwidth %s freq_range %s', freq, chwidth, freq_range)
+            log.debug('match_freq_range %s', match_freq_range)
         return match_freq_range
     
     def get_sp_limit_by_freq(self, freq, chwidth):
@@ -222,7 +222,7 @@ class RfMeasurementValidation:
     def get_sp_limit_by_chan(self, channel):
         max_eirp = get_channel_max_eirp(channel, self.resp_avail_chan_info)
         if not max_eirp:
-            Logger.log(LogCategory.ERROR, f'channelCfi {channel} is not avaliable in availableChannelInfo of availableSpectrumInquiryResponses..')
+            log.error('channelCfi %s is not avaliable in availableChannelInfo of availableSpectrumInquiryResponses..', channel)
             return None
         return max_eirp
 
@@ -243,7 +243,7 @@ def get_channel_max_eirp(channel, resp_chan_info):
         if channel in item["channelCfi"]:
             idx = item["channelCfi"].index(channel)
             max_eirp = item["maxEirp"][idx]            
-            Logger.log(LogCategory.DEBUG, f"channel {channel} idx {idx} max_eirp {max_eirp}")
+            log.debug("channel %s idx %s max_eirp %s", channel, idx, max_eirp)
             return max_eirp
 
     return None
@@ -25,12 +25,14 @@ import traceback
 from IndigoTestScripts.helpers.instruction_lib import InstructionLib
 from commons.shared_enums import SettingsName
 from commons.logger import Logger
+import IndigoTestScripts.Programs.AFC.afc_common_path
+from afc_common import channel_plan
 from commons.shared_enums import (
     LogCategory,
 )
 
 # (channel, bandwidth)
-all_channels_6g = [(15, 160), (47, 160), (79, 160), (111, 160), (143, 160), (175, 160)]
+all_channels_6g = [(cfi, 160) for cfi in channel_plan.all_cfis[160] if cfi <= 175]
 
 class SpectrumAnalyzer:
 
@@ -187,7 +189,7 @@ class SpectrumAnalyzer:
         else:
             test_report = {
                 "rfMeasurementReport": {
-                    "centralFreq": (5950+ 5*channel),
+                    "centralFreq": channel_plan.channel_to_freq(channel),
                     "channelWidth": bandwidth,
                     "data": []
                 }
@@ -285,14 +287,15 @@ class SpectrumAnalyzer:
         if self.trigger_source == "RFDQ":
             config.set('set', 'rfdq_packet_length_us', f'{self.packet_duration}')
             config.set('set', 'rfdq_margin_us', f'{self.rfdq_margin_us}')            
-            scan_list = f"{self.__convert_ch_to_freq(channel)}"
-            lower_chan = channel - (bandwidth/10)*2
-            higher_chan = channel + (bandwidth/10)*2
+            # The channel and its lower and higher adjacent channels of the same bandwidth
+            scan_list = [self.__convert_ch_to_freq(channel)]
+            lower_chan = channel - bandwidth // 5
+            higher_chan = channel + bandwidth // 5
             if lower_chan > 0:
-                scan_list = scan_list + f", {self.__convert_ch_to_freq(lower_chan)}"
+                scan_list.append(self.__convert_ch_to_freq(lower_chan))
             if higher_chan < 185:
-                scan_list = scan_list + f", {self.__convert_ch_to_freq(higher_chan)}"
-            config.set('set', 'freq_mhz_scan_list', f'{scan_list}')
+                scan_list.append(self.__convert_ch_to_freq(higher_chan))
+            config.set('set', 'freq_mhz_scan_list', ", ".join(map(str, scan_list)))
             config.set('set', 'channel', '')
             config.set('set', 'freq_mhz', f'{self.__convert_ch_to_freq(channel)}')
         else:
@@ -371,5 +374,5 @@ class SpectrumAnalyzer:
         return pkts
 
     def __convert_ch_to_freq(self, channel):
-        return int(5950 + channel*5)
+        return channel_plan.channel_to_freq(channel)
 